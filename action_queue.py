@@ -0,0 +1,172 @@
+"""
+Provides the queue of the fixer actions requested during the evaluation
+round.
+
+Fixers marked as deferred are not run when requested. The
+requests are collected and run together at the end of the round, which has
+following benefits:
+  - identical requests (i.e. two rules locking the screen, or killing the
+    same process) are merged and run only once
+  - fixers can provide an idempotency key, describing the requested change
+    together with the observed state. If the action was already applied
+    with the same key, it is suppressed, hence the fixers repeated by the
+    rules in every round only run when the state actually changes
+  - actions of the fixers marked as parallel_safe are run concurrently
+"""
+
+import collections
+import threading
+
+from decisions import FIXER
+from logger import LoggerMixin
+from plugins import HashableDict
+
+
+class Action(object):
+    """
+    A requested fixer invocation.
+    """
+
+    __slots__ = ('identifier', 'instance_id', 'args', 'kwargs', 'rule')
+
+    def __init__(self, identifier, instance_id, args, kwargs, rule):
+        self.identifier = identifier
+        self.instance_id = instance_id
+        self.args = args
+        self.kwargs = kwargs
+        self.rule = rule
+
+
+class ActionQueue(LoggerMixin):
+    """
+    Collects the fixer actions and runs them at the end of the round.
+    """
+
+    # Fixers might request other fixers, those are run in the following
+    # passes, up to this limit
+    MAX_PASSES = 10
+
+    def __init__(self, context):
+        self.context = context
+
+        # Only the thread running the evaluation rounds may enqueue actions,
+        # other threads would race with run() and miss the current rule
+        self.owner = threading.current_thread()
+
+        self.pending = collections.OrderedDict()
+
+        # instance id -> idempotency key of the last applied action
+        self.applied = {}
+
+        self.requested = 0
+        self.merged = 0
+        self.suppressed = 0
+        self.executed = 0
+
+    def owns_thread(self):
+        return threading.current_thread() is self.owner
+
+    def enqueue(self, identifier, instance_id, args, kwargs):
+        if not self.owns_thread():
+            raise RuntimeError("Fixer actions can only be enqueued from the "
+                               "thread running the evaluation.")
+
+        self.requested += 1
+
+        try:
+            key = (instance_id, args, HashableDict(kwargs))
+            hash(key)
+        except TypeError:
+            # Unhashable arguments, the action cannot be merged
+            key = object()
+
+        if key in self.pending:
+            self.merged += 1
+            return
+
+        self.pending[key] = Action(identifier, instance_id, args, kwargs,
+                                   self.context.rule)
+
+    def idempotency_key(self, instance, action):
+        # pylint: disable=broad-except
+        try:
+            return instance.idempotency_key(*action.args, **action.kwargs)
+        except Exception:
+            self.log_exception()
+
+    def execute(self, instance, action, results):
+        # pylint: disable=broad-except
+        try:
+            results[action] = instance.evaluate(*action.args, **action.kwargs)
+        except Exception:
+            self.log_exception()
+
+    def run(self):
+        """
+        Runs the pending actions. The actions of the fixers that are not
+        parallel_safe are run in the order they were requested.
+        """
+
+        for _ in range(self.MAX_PASSES):
+            if not self.pending:
+                break
+
+            actions = list(self.pending.values())
+            self.pending.clear()
+            self.run_actions(actions)
+
+    def run_actions(self, actions):
+        cache = self.context.fixers
+        serial, parallel, keys = [], [], {}
+
+        for action in actions:
+            instance = cache.get_plugin_instance(action.instance_id,
+                                                 action.identifier)
+            key = self.idempotency_key(instance, action)
+
+            if key is not None and self.applied.get(action.instance_id) == key:
+                self.suppressed += 1
+                continue
+
+            keys[action] = key
+            if instance.parallel_safe:
+                parallel.append((instance, action))
+            else:
+                serial.append((instance, action))
+
+        results = {}
+
+        threads = [threading.Thread(target=self.execute,
+                                    args=(instance, action, results))
+                   for instance, action in parallel[1:]]
+
+        for thread in threads:
+            thread.start()
+
+        for instance, action in parallel[:1] + serial:
+            self.execute(instance, action, results)
+
+        for thread in threads:
+            thread.join()
+
+        for action in actions:
+            if action not in keys:
+                continue
+
+            self.executed += 1
+            result = results.get(action, 'failed')
+
+            # Failed actions are not considered applied
+            if action in results and keys[action] is not None:
+                self.applied[action.instance_id] = keys[action]
+
+            self.context.trace.record(action.rule, FIXER, action.identifier,
+                                      action.args, action.kwargs, result)
+
+    def counters(self):
+        return {
+            'fixer_actions_requested': self.requested,
+            'fixer_actions_merged': self.merged,
+            'fixer_actions_suppressed': self.suppressed,
+            'fixer_actions_executed': self.executed,
+        }
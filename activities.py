@@ -1,9 +1,9 @@
-import datetime
 import itertools
 import psutil
 
 import config
 import util
+from flow_planner import FlowPlanner
 from plugins import Plugin, PluginMount, ContextProxyMixin
 
 # Define own our commands so that we don't kill ourselves under
@@ -109,17 +109,31 @@ class ActivityApplicationEnforcementMixin(object):
                     ]))
 
                 # If the active window is a terminal emulator, perform
-                # selective blacklisting of the spawned applications
+                # selective blacklisting of the spawned applications. Each
+                # process is judged only once per activity.
+                verdicts = self.context.verdicts
+
                 for process in emulator_processes:
                     try:
-                        command = ' '.join(process.cmdline())
-                        if any([forbidden in command
-                                for forbidden in self.blacklisted_commands]):
+                        if verdicts.get(process, self.identifier,
+                                        self.is_blacklisted):
                             process.kill()
                     except psutil.NoSuchProcess:
                         # If process ended in the mean time, ignore it
                         pass
 
+                verdicts.prune()
+
+    def is_blacklisted(self, process):
+        """
+        Returns True if the command line of the process contains any of
+        the blacklisted commands.
+        """
+
+        command = ' '.join(process.cmdline())
+        return any([forbidden in command
+                    for forbidden in self.blacklisted_commands])
+
 
 class AcitivityStartupCommandsMixin(object):
 
@@ -132,7 +146,7 @@ class AcitivityStartupCommandsMixin(object):
 
         # Execute the startup commands
         for command in self.startup_commands:
-            util.run_async(command)
+            util.run_detached(command)
 
 
 class ActivityOverlayMixin(object):
@@ -186,7 +200,7 @@ class ActivityTrackingOverlayMixin(object):
         if value is None:
             return
 
-        key = datetime.datetime.now().strftime("%Y-%m-%d")
+        key = self.context.clock.today.isoformat()
 
         self.fix(
             'track',
@@ -218,16 +232,29 @@ class ActivityProgressNotificationMixin(object):
         # activity only
         self.checkpoints_to_notify = list(self.progress_checkpoints)
 
+    def next_checkpoint(self):
+        """
+        Returns the moment when the closest checkpoint is reached, or None if
+        there are no remaining checkpoints.
+        """
+
+        if not self.checkpoints_to_notify or self.expired is None:
+            return None
+
+        remaining = self.checkpoints_to_notify[0] * self.expired.duration
+        return self.context.clock.moment(self.expired.expiration_point -
+                                         remaining)
+
     def run(self):
         # If there are no remaining checkpoints, we have nothing
         # to do
-        if not self.checkpoints_to_notify:
+        if not self.checkpoints_to_notify or self.expired is None:
             return
 
-        relative_remaining = self.expired.remaining / self.expired.duration
         closest_checkpoint = self.checkpoints_to_notify[0]
+        remaining = closest_checkpoint * self.expired.duration
 
-        if relative_remaining < closest_checkpoint:
+        if self.expired.remaining < remaining:
             # Pop the list of remaining checkpoints
             self.checkpoints_to_notify = self.checkpoints_to_notify[1:]
 
@@ -276,6 +303,20 @@ class Activity(ActivityTimetrackingMixin,
         for setup_method in self.setup_methods:
             setup_method(self)
 
+    def next_change(self):
+        """
+        Returns the next moment when the activity needs to act (expire or
+        notify about the progress), or None.
+        """
+
+        changes = [self.expired.next_change()
+                   if self.expired is not None else None]
+
+        if ActivityProgressNotificationMixin.active(self):
+            changes.append(self.next_checkpoint())
+
+        return util.earliest(*changes)
+
     def run(self):
         # Check if the activity should still live
         if self.expired:
@@ -326,48 +367,24 @@ class Flow(ContextProxyMixin, Plugin):
         self.info('\n'.join(map(repr, self.plan)))
 
     def generate_plan(self):
-        if not self.time_limit:
-            return self.activities
-
-        planned_activities = [ActivitySpec(*a) for a in self.activities]
-        time_deficit = None
-
-        while True:
-            planned_activities = [a for a in planned_activities if not a.skipped]
-            time_required = sum([a.duration * a.shrinking for a in planned_activities])
-
-            if time_required == 0:
-                raise Exception("Not enough time to initialize the flow.")
+        plan = [ActivitySpec(*a) for a in self.activities]
 
-            # Note: time_deficit may be negative, corresponding to
-            # prolonging intervals after a activity has been skipped
-            time_deficit = time_required - self.time_limit
-
-            # Allow deviations from desired time of magnitude 0.3s
-            if abs(time_deficit) <= 0.005:
-                break
-
-            # First try to shrink durations to erase the time deficit
-            something_shrinked = False
-            shrink_factor = 1 - (float(time_deficit) / time_required)
-
-            for activity in planned_activities:
-                proposed_shrinking = activity.shrinking * shrink_factor
-
-                if proposed_shrinking >= activity.max_shrinking:
-                    activity.shrinking = proposed_shrinking
-                    something_shrinked = True
+        if not self.time_limit:
+            return plan
 
-            # If we're not able to shrink any duration, we need to start skipping
-            if not something_shrinked:
-                # Skip activity with lowest priority
-                # (in case of tie, lower max shrinking activity is skipped)
+        shrinkings = self.context.backend(FlowPlanner).plan(
+            self.identifier,
+            [(a.duration, a.max_shrinking, a.priority) for a in plan],
+            self.time_limit
+        )
 
-                activity = min(planned_activities,
-                               key=lambda a: (a.priority, a.max_shrinking))
+        for activity, shrinking in zip(plan, shrinkings):
+            if shrinking is None:
                 activity.skipped = True
+            else:
+                activity.shrinking = shrinking
 
-        return planned_activities
+        return [a for a in plan if not a.skipped]
 
     @property
     def current_activity(self):
@@ -381,7 +398,7 @@ class Flow(ContextProxyMixin, Plugin):
         if self.current_activity_index is None:
             self.current_activity_index = 0
             self.start(self.current_activity)
-        elif self.current_activity_index + 1 < len(self.activities):
+        elif self.current_activity_index + 1 < len(self.plan):
             self.current_activity_index += 1
             self.start(self.current_activity)
         else:
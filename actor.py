@@ -2,8 +2,6 @@
 
 import os
 import sys
-import importlib
-import imp
 
 import gobject
 import dbus
@@ -11,7 +9,11 @@ import dbus.service
 import dbus.mainloop.glib
 
 from context import Context
+from manifest import MANIFEST
+from process_manager import PROCESSES
 from plugins import Rule
+from reloader import RuleReloader, module_name
+from rule_index import RuleIndex
 from trackers import Tracker
 from util import Expiration
 
@@ -77,19 +79,57 @@ class ActorDBusProxy(dbus.service.Object):
     def Report(self, identifier):
         return self.actor.context.reporters.get(identifier)
 
+    @dbus.service.method("org.freedesktop.Actor", in_signature='')
+    def TasksChanged(self):
+        # Imported here, so that tasklib is loaded only if actually used
+        from taskwarrior_backend import TaskWarriorBackend
+        self.actor.context.backend(TaskWarriorBackend).invalidate()
+
+    @dbus.service.method("org.freedesktop.Actor", in_signature='s',
+                         out_signature='a{sv}')
+    def Stats(self, ident):
+        # Imported here, so that numpy is loaded only if actually used
+        from analytics_backend import AnalyticsBackend
+        series = self.actor.context.backend(AnalyticsBackend).series(ident)
+        return series.summary()
+
+    @dbus.service.method("org.freedesktop.Actor", in_signature='i',
+                         out_signature='as')
+    def Why(self, seconds):
+        return self.actor.context.trace.report(seconds)
+
+    @dbus.service.method("org.freedesktop.Actor", in_signature='',
+                         out_signature='a{sv}')
+    def Counters(self):
+        counters = self.actor.context.counters()
+        counters.update(self.actor.counters())
+        counters.update(MANIFEST.counters())
+        counters.update(PROCESSES.counters())
+        return counters
+
 
 class Actor(LoggerMixin):
 
+    # Interval of the evaluation rounds, in seconds
+    POLL_INTERVAL = 2
+
+    # Longest sleep when no polling is required (i.e. Actor is paused)
+    MAX_SLEEP = 300
+
     def __init__(self):
         self.rules = []
         self.trackers = []
 
+        self.timeout_id = None
+        self.wakeups = 0
+        self.boundary_wakeups = 0
+
         # Start dbus mainloop
         dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
 
-        # Load the plugins
-        self.import_plugins()
+        # Plugins are loaded on first use, see the PluginManifest
         self.context = Context()
+        self.rule_index = RuleIndex(self.context)
 
         # Load the Actor configuration
         self.load_configuration()
@@ -107,25 +147,6 @@ class Actor(LoggerMixin):
 
     # Initialization related methods
 
-    def import_plugins(self):
-        import reporters
-        import checkers
-        import fixers
-        categories = [reporters, checkers, fixers]
-
-        # pylint: disable=broad-except
-        for category in categories:
-            for module in category.__all__:
-                try:
-                    module_id = "{0}.{1}".format(category.__name__, module)
-                    importlib.import_module(module_id)
-                    self.debug(module_id + " loaded successfully.")
-                except Exception as exc:
-                    self.warning(
-                        "The {0} {1} module could not be loaded: {2} "
-                        .format(module, category.__name__[:-1], str(exc)))
-                    self.log_exception()
-
     def load_configuration(self):
         # Create the config directory, if it does not exist
         if not os.path.exists(CONFIG_DIR):
@@ -133,32 +154,73 @@ class Actor(LoggerMixin):
 
         # Load the rule files. They will be automatically
         # added to the Rule pluginmount.
-        rules = [os.path.join(CONFIG_DIR, path)
-                 for path in os.listdir(CONFIG_DIR)
-                 if path.endswith('.py')]
+        self.reloader = RuleReloader(CONFIG_DIR)
+        rules = self.reloader.rule_files()
 
-        # pylint: disable=broad-except
         for path in rules:
-            try:
-                module_id = os.path.basename(path.rstrip('.py'))
-                imp.load_source(module_id, path)
-            except Exception as exc:
-                self.warning(
-                    "Rule file {0} cannot be loaded, following error was "
-                    "encountered: {1}".format(path, str(exc))
-                )
-                self.log_exception()
-
-        # pylint: disable=no-member
-        for rule_class in Rule.plugins:
-            self.rules.append(rule_class(self.context))
+            self.reloader.load(path)
 
-        for tracker_class in Tracker.plugins:
-            self.trackers.append(tracker_class(self.context))
+        self.instantiate()
 
         if not rules:
             self.warning("No rules available")
 
+    def instantiate(self):
+        """
+        Creates the instances of the rules and trackers which were not
+        instantiated yet. The existing instances are kept, with their state.
+        """
+
+        rules = dict((type(rule), rule) for rule in self.rules)
+        trackers = dict((type(tracker), tracker) for tracker in self.trackers)
+
+        # pylint: disable=no-member
+        self.rules = [rules.get(rule_class) or rule_class(self.context)
+                      for rule_class in Rule.plugins]
+        self.trackers = [trackers.get(tracker_class) or
+                         tracker_class(self.context)
+                         for tracker_class in Tracker.plugins]
+
+        self.rule_index.update(self.rules)
+
+    def reload_configuration(self):
+        """
+        Reloads the rule files changed since the last round. The rules and
+        trackers defined in them are replaced, together with the plugin
+        instances they used; the rest of the state is kept.
+        """
+
+        paths = self.reloader.changed_files()
+        modules = set(module_name(path) for path in paths
+                      if self.reloader.load(path))
+
+        if not modules:
+            return
+
+        caches = (self.context.reporters, self.context.checkers,
+                  self.context.fixers)
+
+        for instance in self.rules + self.trackers:
+            if type(instance).__module__ not in modules:
+                continue
+
+            for cache in caches:
+                cache.drop_instances(instance.identifier)
+
+        for module in modules:
+            for cache in caches:
+                cache.drop_module(module)
+
+        # Forget the instances of the replaced classes
+        self.rules = [rule for rule in self.rules
+                      if type(rule).__module__ not in modules]
+        self.trackers = [tracker for tracker in self.trackers
+                         if type(tracker).__module__ not in modules]
+        self.instantiate()
+
+        self.info("Rule files reloaded: {0}".format(
+            ', '.join(sorted(modules))))
+
     # Interface related methods
 
     def set_activity(self, identifier, time_limit=None):
@@ -168,6 +230,7 @@ class Actor(LoggerMixin):
 
         if self.context.flow is None:
             self.context.set_activity(identifier, time_limit)
+            self.reschedule()
         else:
             self.info("Activity %s cannot be set, flow in progress."
                       % identifier)
@@ -179,6 +242,7 @@ class Actor(LoggerMixin):
 
         if self.context.flow is None:
             self.context.unset_activity()
+            self.reschedule()
         else:
             self.info("Activity cannot be unset, flow in progress.")
 
@@ -190,6 +254,7 @@ class Actor(LoggerMixin):
         self.info("Force forwarding to next activity.")
         if self.context.flow is not None:
             self.context.flow.start_next_activity()
+            self.reschedule()
         else:
             self.error("Next activity cannot be started, no flow in progress.")
 
@@ -200,6 +265,7 @@ class Actor(LoggerMixin):
 
         if self.context.flow is None:
             self.context.set_flow(identifier, time_limit)
+            self.reschedule()
         else:
             self.info("Cannot set flow %s. flow already in progress" % identifier)
 
@@ -209,28 +275,37 @@ class Actor(LoggerMixin):
         """
 
         self.context.unset_flow()
+        self.reschedule()
 
     def pause(self, minutes):
         self.pause_expired = Expiration(minutes)
         self.info('Pausing Actor for {0} minutes.'.format(minutes))
+        self.reschedule()
 
     # Runtime related methods
 
     def check_everything(self):
+        # Clear the cached values and take the time snapshot of this round
+        self.context.clear_cache()
+
         if not self.pause_expired:
             return True
         elif self.pause_expired.just_expired():
             self.info('Actor is resumed.')
 
-        # Clear the cached values
-        self.context.clear_cache()
+        # Only the rules whose activation guards hold are run
+        rules = self.rule_index.active_rules()
+        self.context.trace.rules(rule.identifier for rule in rules)
 
-        for rule in self.rules:
+        for rule in rules:
+            self.context.rule = rule.identifier
             try:
                 rule.run()
             except Exception as e:
                 self.handle_exception()
 
+        self.context.rule = None
+
         for tracker in self.trackers:
             try:
                 tracker.run()
@@ -250,12 +325,113 @@ class Actor(LoggerMixin):
             except Exception as e:
                 self.handle_exception()
 
+        # Write out the batched changes
+        self.context.flush()
+
         return True
 
+    def polling_required(self):
+        """
+        Returns True if there is something to be evaluated periodically,
+        rather than only at the time boundaries, i.e. the rules evaluated
+        a reporter or checker that is not time-based during the last round.
+        """
+
+        if not self.pause_expired:
+            return False
+
+        return any([self.context.polled, self.trackers,
+                    self.context.activity is not None,
+                    self.context.flow is not None])
+
+    def next_delay(self):
+        """
+        Returns the number of seconds until the next evaluation round, and
+        whether the round is scheduled at a time boundary.
+        """
+
+        clock = self.context.clock
+        clock.update()
+
+        if self.pause_expired:
+            boundary = self.context.next_change()
+        else:
+            # Nothing is evaluated until the pause expires
+            boundary = self.pause_expired.next_change()
+
+        if self.polling_required():
+            delay = self.POLL_INTERVAL
+        else:
+            delay = self.MAX_SLEEP
+
+        if boundary is not None:
+            until_boundary = (boundary - clock.now).total_seconds()
+            if until_boundary <= delay:
+                return max(until_boundary, 0), True
+
+        return delay, False
+
+    def wakeup(self, at_boundary=False):
+        self.wakeups += 1
+
+        if at_boundary:
+            self.boundary_wakeups += 1
+
+        try:
+            # Rule files are swapped between the rounds, never within one
+            self.reload_configuration()
+        except Exception:
+            self.handle_exception()
+
+        try:
+            self.check_everything()
+        finally:
+            self.schedule()
+
+        # Plugins used by the rules are loaded during the first round
+        if self.wakeups == 1:
+            for line in MANIFEST.report():
+                self.info(line)
+
+        # The round is scheduled again by the schedule method
+        return False
+
+    def schedule(self):
+        """
+        Schedules the next evaluation round. Rounds happen every
+        POLL_INTERVAL seconds, and additionally exactly at the moments when
+        a time-based check changes its value or an activity expires.
+        """
+
+        delay, at_boundary = self.next_delay()
+
+        # Round up, so that we never wake up before the boundary
+        self.timeout_id = gobject.timeout_add(int(delay * 1000) + 1,
+                                              self.wakeup, at_boundary)
+
+    def reschedule(self):
+        """
+        Replaces the scheduled evaluation round, since the state changed
+        (i.e. the activity was set using the D-Bus interface).
+        """
+
+        if self.timeout_id is not None:
+            gobject.source_remove(self.timeout_id)
+            self.schedule()
+
+    def counters(self):
+        counters = {
+            'wakeups': self.wakeups,
+            'boundary_wakeups': self.boundary_wakeups,
+        }
+        counters.update(self.rule_index.counters())
+
+        return counters
+
     def main(self):
         # Start the main loop
         loop = gobject.MainLoop()
-        gobject.timeout_add(2000, self.check_everything)
+        self.schedule()
         self.info("AcTor started.")
         loop.run()
 
@@ -0,0 +1,300 @@
+"""
+Provides analytics over the values recorded by the trackers.
+
+The records of each tracker are converted into a daily time series, kept in
+two compact columns: the days (as date ordinals) and the values. The columns
+are NumPy arrays if NumPy is available, and array.array objects otherwise.
+The series is rebuilt only when the tracker records a new value.
+
+Numeric values are used as they are, 'Yes' and 'No' values (recorded by the
+BoolTrackers) count as 1 and 0. Multiple records within a single day are
+averaged. Other values are ignored.
+"""
+
+import array
+import bisect
+import datetime
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from plugins import Backend
+from track_backend import TrackBackend
+
+BOOLEAN_VALUES = {
+    'yes': 1.0,
+    'no': 0.0,
+}
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+def parse_value(value):
+    """
+    Converts the recorded value into a float, or returns None if that is
+    not possible.
+    """
+
+    try:
+        return float(value)
+    except ValueError:
+        return BOOLEAN_VALUES.get(value.strip().lower())
+
+
+def parse_day(key):
+    """
+    Converts the key of a record ('%Y-%m-%d' optionally followed by the time)
+    into the date ordinal, or returns None for other keys.
+    """
+
+    try:
+        return datetime.date(int(key[0:4]), int(key[5:7]),
+                             int(key[8:10])).toordinal()
+    except ValueError:
+        return None
+
+
+def today():
+    return datetime.date.today().toordinal()
+
+
+def sum_values(values):
+    if numpy is not None:
+        return float(values.sum())
+    else:
+        return float(sum(values))
+
+
+class Series(object):
+    """
+    A daily time series, sorted by days.
+    """
+
+    def __init__(self, days, values):
+        if numpy is not None:
+            self.days = numpy.array(days, dtype=numpy.int32)
+            self.values = numpy.array(values, dtype=numpy.float64)
+        else:
+            self.days = array.array('l', days)
+            self.values = array.array('d', values)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds the series from the (key, value) records.
+        """
+
+        daily = dict()
+
+        for key, value in records:
+            day, value = parse_day(key), parse_value(value)
+            if day is None or value is None:
+                continue
+
+            total, count = daily.get(day, (0.0, 0))
+            daily[day] = (total + value, count + 1)
+
+        days = sorted(daily)
+        return cls(days, [daily[day][0] / daily[day][1] for day in days])
+
+    def __len__(self):
+        return len(self.days)
+
+    def window(self, days=None, end=None):
+        """
+        Returns the values recorded in the given number of days, ending with
+        the given day (today by default). All values are returned if days
+        is None.
+        """
+
+        end = end or today()
+        start = end - days + 1 if days is not None else None
+
+        if numpy is not None:
+            last = numpy.searchsorted(self.days, end, side='right')
+            first = (numpy.searchsorted(self.days, start, side='left')
+                     if start is not None else 0)
+        else:
+            last = bisect.bisect_right(self.days, end)
+            first = (bisect.bisect_left(self.days, start)
+                     if start is not None else 0)
+
+        return self.values[first:last]
+
+    def total(self, days=None, end=None):
+        return sum_values(self.window(days, end))
+
+    def average(self, days=None, end=None):
+        """
+        Returns the average of the daily values in the given window, or None
+        if there are no values.
+        """
+
+        values = self.window(days, end)
+
+        if len(values):
+            return sum_values(values) / len(values)
+
+    def streak(self, threshold=None, end=None):
+        """
+        Returns the number of consecutive days with a recorded value (at least
+        the threshold, if given) up to the given day. The given day does not
+        break the streak if it has not been recorded yet.
+        """
+
+        end = end or today()
+        position = bisect.bisect_right(self.days, end) - 1
+
+        if position >= 0 and self.days[position] < end:
+            end -= 1
+
+        streak = 0
+        while (position >= 0 and self.days[position] == end - streak and
+               (threshold is None or self.values[position] >= threshold)):
+            streak += 1
+            position -= 1
+
+        return streak
+
+    def longest_streak(self, threshold=None):
+        """
+        Returns the length of the longest streak of consecutive days with a
+        recorded value (at least the threshold, if given).
+        """
+
+        if numpy is not None:
+            days = (self.days if threshold is None
+                    else self.days[self.values >= threshold])
+            if not len(days):
+                return 0
+
+            breaks = numpy.flatnonzero(numpy.diff(days) != 1) + 1
+            bounds = numpy.concatenate(([0], breaks, [len(days)]))
+            return int(numpy.diff(bounds).max())
+
+        longest = current = 0
+        previous = None
+
+        for day, value in zip(self.days, self.values):
+            if threshold is not None and value < threshold:
+                current = 0
+            elif previous is not None and day == previous + 1 and current:
+                current += 1
+            else:
+                current = 1
+
+            previous = day
+            longest = max(longest, current)
+
+        return longest
+
+    def weekday_averages(self):
+        """
+        Returns the list of the average values per weekday, starting with
+        Monday. Weekdays without any values have None average.
+        """
+
+        if numpy is not None:
+            weekdays = (self.days - 1) % 7
+            totals = numpy.bincount(weekdays, self.values, minlength=7)
+            counts = numpy.bincount(weekdays, minlength=7)
+            return [float(total) / count if count else None
+                    for total, count in zip(totals, counts)]
+
+        totals = [0.0] * 7
+        counts = [0] * 7
+
+        for day, value in zip(self.days, self.values):
+            totals[(day - 1) % 7] += value
+            counts[(day - 1) % 7] += 1
+
+        return [total / count if count else None
+                for total, count in zip(totals, counts)]
+
+    def histogram(self, bins=10):
+        """
+        Returns the counts of the values in the given number of equally wide
+        bins, and the list of the bin edges.
+        """
+
+        if not len(self):
+            return [], []
+
+        if numpy is not None:
+            counts, edges = numpy.histogram(self.values, bins=bins)
+            return counts.tolist(), edges.tolist()
+
+        low, high = min(self.values), max(self.values)
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+
+        width = (high - low) / bins
+        counts = [0] * bins
+
+        for value in self.values:
+            counts[min(int((value - low) / width), bins - 1)] += 1
+
+        return counts, [low + width * index for index in range(bins + 1)]
+
+    def summary(self):
+        """
+        Returns a dictionary of the commonly used statistics. Statistics that
+        are not defined are omitted.
+        """
+
+        summary = {
+            'records': len(self),
+            'average_7': self.average(7),
+            'average_30': self.average(30),
+            'average_365': self.average(365),
+            'average_all': self.average(),
+            'streak': self.streak(),
+            'longest_streak': self.longest_streak(),
+        }
+
+        if len(self):
+            summary['first'] = datetime.date.fromordinal(
+                int(self.days[0])).isoformat()
+            summary['last'] = datetime.date.fromordinal(
+                int(self.days[-1])).isoformat()
+
+        for weekday, average in zip(WEEKDAYS, self.weekday_averages()):
+            summary['average_' + weekday] = average
+
+        return dict((key, value) for key, value in summary.items()
+                    if value is not None)
+
+
+class AnalyticsBackend(Backend):
+    """
+    Keeps the time series of the trackers, rebuilt only after the tracker
+    records a new value.
+    """
+
+    def __init__(self, context):
+        super(AnalyticsBackend, self).__init__(context)
+
+        self.cache = {}
+        self.builds = 0
+        self.queries = 0
+
+    def series(self, ident):
+        self.queries += 1
+
+        store = self.context.backend(TrackBackend).store(ident)
+        cached = self.cache.get(ident)
+
+        if cached is None or cached[0] != store.version:
+            self.builds += 1
+            series = Series.from_records(store.index.items())
+            cached = self.cache[ident] = (store.version, series)
+
+        return cached[1]
+
+    def counters(self):
+        return {
+            'analytics_series_built': self.builds,
+            'analytics_queries': self.queries,
+        }
@@ -0,0 +1,64 @@
+from plugins import Checker
+from cost_backend import CostBackend
+
+
+class AllOfChecker(Checker):
+    """
+    Evaluates to True if all the operands evaluate to True. The operands
+    are evaluated lazily, cheap and likely False operands first.
+
+    Expects the operands as positional arguments, created by the
+    cost_backend.check function. Only stateless checkers can be used.
+    """
+
+    identifier = 'all_of'
+    conjunction = True
+
+    # The operands are evaluated through the cache, hence judged on their own
+    time_based = True
+
+    def evaluate_operand(self, operand):
+        return self.check(operand.identifier, *operand.args,
+                          **operand.kwargs)
+
+    def run(self, *operands):
+        # pylint: disable=arguments-differ
+
+        backend = self.context.backend(CostBackend)
+        ordered = backend.order(operands, self.conjunction)
+
+        for position, operand in enumerate(ordered):
+            result = backend.evaluate(operand, self.evaluate_operand, operand)
+
+            # The outcome is decided
+            if bool(result) != self.conjunction:
+                backend.skip(len(ordered) - position - 1)
+                return result
+
+        return self.conjunction
+
+
+class AnyOfChecker(AllOfChecker):
+    """
+    Evaluates to the result of the first operand that evaluates to True, or
+    to False. The operands are evaluated lazily, cheap and likely True
+    operands first.
+    """
+
+    identifier = 'any_of'
+    conjunction = False
+
+
+class NotChecker(Checker):
+    """
+    Negates the result of the given operand.
+    """
+
+    identifier = 'not'
+    time_based = True
+
+    def run(self, operand):
+        # pylint: disable=arguments-differ
+
+        return not self.check(operand.identifier, *operand.args,
+                              **operand.kwargs)
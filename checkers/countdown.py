@@ -1,5 +1,4 @@
 from plugins import Checker
-import datetime
 
 
 class CountdownChecker(Checker):
@@ -15,20 +14,21 @@ class CountdownChecker(Checker):
         super(CountdownChecker, self).__init__(context)
 
         self.countdown_start = None
-        self.delta = datetime.timedelta(seconds=delay)
+        self.delta = delay
 
     def start(self):
         if self.countdown_start is None:
-            self.countdown_start = datetime.datetime.now()
+            self.countdown_start = self.context.clock.monotonic
 
     def reset(self, delay=None):
         self.countdown_start = None
 
         if delay:
-            self.delta = datetime.timedelta(seconds=delay)
+            self.delta = delay
 
     def run(self):
         if self.countdown_start is None:
             return False
         else:
-            return datetime.datetime.now() - self.countdown_start > self.delta
+            elapsed = self.context.clock.monotonic - self.countdown_start
+            return elapsed > self.delta
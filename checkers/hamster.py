@@ -16,8 +16,8 @@ class HamsterActivityDailyDurationChecker(Checker):
     def run(self, activity, limit):
         # pylint: disable=arguments-differ
 
-        duration = self.context.report('hamster_activity_daily_duration',
-                                       activity=activity)
+        duration = self.report('hamster_activity_daily_duration',
+                               activity=activity)
 
         return duration > limit
 
@@ -37,12 +37,7 @@ class HamsterCategoryDailyDurationChecker(Checker):
     def run(self, category, limit):
         # pylint: disable=arguments-differ
 
-        category_duration = 0
-
-        activities = self.context.report('hamster_activity_daily_duration')
-
-        for activity, duration in activities.iteritems():
-            if activity.endswith(category):
-                category_duration += duration
+        category_duration = self.report('hamster_category_daily_duration',
+                                        category=category)
 
         return category_duration > limit
@@ -1,5 +1,4 @@
 from plugins import Checker
-import datetime
 
 
 class HealthChecker(Checker):
@@ -18,10 +17,10 @@ class HealthChecker(Checker):
     identifier = 'health'
     stateless = False
 
-    def __init__(self, maximum, reset_daily=True):
-        super(HealthChecker, self).__init__()
+    def __init__(self, context, maximum, reset_daily=True):
+        super(HealthChecker, self).__init__(context)
 
-        self.today = datetime.date.today()
+        self.today = self.context.clock.today
         self.maximum = maximum
         self.health = maximum
         self.reset_daily = reset_daily
@@ -40,8 +39,8 @@ class HealthChecker(Checker):
         if not self.reset_daily:
             return
 
-        if datetime.date.today() > self.today:
-            self.today = datetime.date.today()
+        if self.context.clock.today > self.today:
+            self.today = self.context.clock.today
             self.reset()
 
     def run(self):
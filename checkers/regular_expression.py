@@ -1,6 +1,5 @@
-import re
-
 from plugins import Checker
+from regex_backend import RegexBackend
 
 
 class RegularExpressionChecker(Checker):
@@ -18,4 +17,27 @@ class RegularExpressionChecker(Checker):
     def run(self, regexp, string):
         # pylint: disable=arguments-differ
 
-        return bool(re.search(regexp, string or ''))
+        backend = self.context.backend(RegexBackend)
+        return bool(backend.search(regexp, string or ''))
+
+
+class RegularExpressionSetChecker(Checker):
+    """
+    Evaluates whether the input contains an occurence of any of the patterns
+    searched for. Returns the list of the matching patterns (hence evaluates
+    to False if none of them matches).
+
+    The patterns are matched in a single pass over the input, which makes
+    this checker preferable to many regular_expression checks.
+
+    Expects following keyword arguments:
+      - regexps - Tuple of regular expressions
+      - string - Input string tested to match the regular expressions
+    """
+
+    identifier = 'regular_expression_set'
+
+    def run(self, regexps, string):
+        # pylint: disable=arguments-differ
+
+        return self.context.backend(RegexBackend).matching(regexps, string)
@@ -1,7 +1,8 @@
-import datetime
-
 from plugins import Checker
-from util import convert_timestamp
+from util import seconds_since_midnight
+
+# Parsed bounds of the windows, in seconds since midnight
+WINDOWS = {}
 
 
 class TimeIntervalChecker(Checker):
@@ -11,22 +12,31 @@ class TimeIntervalChecker(Checker):
 
     The start and end points are to be specified by datetime.time object
     or string of '%H.%M' form.
+
+    The bounds are parsed only once, and registered in the interval index
+    of the context, which lets Actor wake up exactly at the boundaries.
     """
 
     identifier = 'time_interval'
+    time_based = True
 
     def run(self, start, end):
         # pylint: disable=arguments-differ
 
-        start = convert_timestamp(start)
-        end = convert_timestamp(end)
+        window = WINDOWS.get((start, end))
 
-        # If the start of the interval is later than the end, add one day
-        if start > end:
-            end = end + datetime.timedelta(days=1)
+        if window is None:
+            window = WINDOWS[(start, end)] = (seconds_since_midnight(start),
+                                              seconds_since_midnight(end))
+
+        self.context.intervals.add(*window)
 
-        time = self.report('time')
-        time_shifted = time + datetime.timedelta(days=1)
+        start, end = window
+        time = seconds_since_midnight(self.report('time'))
 
-        return any([start <= time < end,
-                    start <= time_shifted < end])
+        # If the start of the interval is later than the end, the interval
+        # spans over the midnight
+        if start > end:
+            return start <= time or time < end
+        else:
+            return start <= time < end
@@ -0,0 +1,41 @@
+from analytics_backend import AnalyticsBackend
+from plugins import Checker
+
+
+class TrackedAverageChecker(Checker):
+    """
+    Checks whether the average of the values recorded by the given tracker
+    in the last 'days' days lies within the given bounds. Returns False if
+    there are no values in the window.
+
+    Example: check('tracked_average', 'mood', days=7, below=3)
+    """
+
+    identifier = 'tracked_average'
+
+    def run(self, ident, days=7, below=None, above=None):
+        # pylint: disable=arguments-differ
+
+        series = self.context.backend(AnalyticsBackend).series(ident)
+        average = series.average(days)
+
+        if average is None:
+            return False
+
+        return all([below is None or average < below,
+                    above is None or average > above])
+
+
+class TrackedStreakChecker(Checker):
+    """
+    Checks whether the given tracker has been recording values (at least the
+    threshold, if given) for at least 'days' consecutive days.
+    """
+
+    identifier = 'tracked_streak'
+
+    def run(self, ident, days, threshold=None):
+        # pylint: disable=arguments-differ
+
+        series = self.context.backend(AnalyticsBackend).series(ident)
+        return series.streak(threshold) >= days
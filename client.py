@@ -6,6 +6,30 @@ import sys
 from plugins import DBusMixin
 from util import dbus_error_handler
 
+DURATION_UNITS = {
+    's': 1,
+    'm': 60,
+    'h': 3600,
+    'd': 86400,
+}
+
+
+def parse_duration(value):
+    """
+    Converts the duration of the form 10m (or 30s, 2h, 1d) into seconds.
+    Numbers without a unit are considered to be minutes.
+    """
+
+    unit = value[-1:].lower()
+
+    try:
+        if unit in DURATION_UNITS:
+            return int(float(value[:-1]) * DURATION_UNITS[unit])
+        else:
+            return int(float(value) * 60)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Invalid duration: %s" % value)
+
 
 class CLIClient(DBusMixin):
 
@@ -21,7 +45,11 @@ class CLIClient(DBusMixin):
         'flow-stop',
         'flow-status',
         'pause',
-        'report')
+        'report',
+        'counters',
+        'stats',
+        'why',
+        'tasks-changed')
 
     @dbus_error_handler
     def command_activity_start(self, identifier, time_limit):
@@ -63,6 +91,27 @@ class CLIClient(DBusMixin):
         result = self.interface.Report(identifier)
         print(u"{0}: {1}".format(identifier, result))
 
+    @dbus_error_handler
+    def command_counters(self):
+        counters = self.interface.Counters()
+        for name in sorted(counters):
+            print(u"{0}: {1}".format(name, counters[name]))
+
+    @dbus_error_handler
+    def command_stats(self, ident):
+        stats = self.interface.Stats(ident)
+        for name in sorted(stats):
+            print(u"{0}: {1}".format(name, stats[name]))
+
+    @dbus_error_handler
+    def command_why(self):
+        for line in self.interface.Why(self.since):
+            print(line)
+
+    @dbus_error_handler
+    def command_tasks_changed(self):
+        self.interface.TasksChanged()
+
     @dbus_error_handler
     def command_pause(self, minutes):
         self.interface.Pause(int(minutes))
@@ -72,8 +121,12 @@ class CLIClient(DBusMixin):
         parser = argparse.ArgumentParser("CLI interface to Actor daemon")
         parser.add_argument('command', type=str, choices=self.commands)
         parser.add_argument('options', nargs='*', type=str)
+        parser.add_argument('--since', type=parse_duration, default='10m',
+                            help="time span for the 'why' command, "
+                                 "i.e. 30s, 10m, 2h or 1d")
 
         args = parser.parse_args()
+        self.since = args.since
         return args
 
     def run_command(self, command, options):
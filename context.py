@@ -1,8 +1,13 @@
+import config
+
 from plugins import (Reporter, Checker, Fixer, NoSuchPlugin,
                      PluginCache, PluginFactory)
+from action_queue import ActionQueue
+from decisions import DecisionTrace
 from logger import LoggerMixin
 from activities import Activity, Flow
 from timetracking import Timetracking
+from util import CLOCK, IntervalIndex, VerdictCache, earliest
 
 
 class Context(LoggerMixin):
@@ -12,6 +17,12 @@ class Context(LoggerMixin):
     - List of rule and tracker instances
     - Current activity and flow
     - Timetracking interface
+    - Cache of the application enforcement verdicts
+    - Index of the time windows used by the checks
+    - Snapshot of the current time, updated once per evaluation round
+    - Trace of the decisions made by the rules
+    - Queue of the fixer actions requested in the current round
+    - Shared backend instances
     """
 
     def __init__(self):
@@ -21,6 +32,17 @@ class Context(LoggerMixin):
         self.activity = None
         self.flow = None
 
+        # Identifier of the rule being evaluated, for logging purposes
+        self.rule = None
+
+        # Number of the current evaluation round, and its time
+        self.tick = 0
+        self.clock = CLOCK
+
+        # Whether the last round evaluated a plugin that is not time-based,
+        # assumed until the first round is done
+        self.polled = True
+
         self.reporters = PluginCache(Reporter, self)
         self.checkers = PluginCache(Checker, self)
         self.fixers = PluginCache(Fixer, self)
@@ -32,7 +54,25 @@ class Context(LoggerMixin):
         self.activities = PluginFactory(Activity, self)
         self.flows = PluginFactory(Flow, self)
 
+        self.trace = DecisionTrace(getattr(config, 'TRACE_FILE', None))
+        self.actions = ActionQueue(self)
         self.timetracking = Timetracking(self)
+        self.verdicts = VerdictCache()
+        self.intervals = IntervalIndex()
+        self.backends = {}
+
+    def backend(self, backend_class):
+        """
+        Returns the shared instance of the given Backend class. The instance
+        is created on first use.
+        """
+
+        instance = self.backends.get(backend_class)
+
+        if instance is None:
+            instance = self.backends[backend_class] = backend_class(self)
+
+        return instance
 
     def clear_cache(self):
         """
@@ -45,6 +85,55 @@ class Context(LoggerMixin):
         self.checkers.cache.clear()
         self.fixers.cache.clear()
 
+        self.tick += 1
+        self.polled = False
+        self.clock.update()
+        self.trace.start_round()
+
+    def flush(self):
+        """
+        Runs the queued fixer actions, and lets the backends perform the work
+        batched during the evaluation round. This method should be called
+        after each evaluation round.
+        """
+
+        self.actions.run()
+
+        for backend in self.backends.values():
+            try:
+                backend.flush()
+            except Exception:  # pylint: disable=broad-except
+                self.log_exception()
+
+        self.trace.flush()
+
+    def next_change(self):
+        """
+        Returns the next moment when a time-based check can change its value
+        or the current activity needs to act, or None.
+        """
+
+        activity_change = (self.activity.next_change()
+                           if self.activity is not None else None)
+
+        return earliest(self.intervals.next_boundary(), activity_change)
+
+    def counters(self):
+        """
+        Returns a dictionary of runtime counters, useful for assessing the
+        efficiency of the caching layers.
+        """
+
+        counters = dict()
+        counters.update(self.verdicts.counters())
+        counters.update(self.timetracking.counters())
+        counters.update(self.actions.counters())
+
+        for backend in self.backends.values():
+            counters.update(backend.counters())
+
+        return counters
+
     def set_activity(self, identifier, time_limit=None):
         """
         Sets the current activity as given by the identifier.
@@ -52,6 +141,7 @@ class Context(LoggerMixin):
 
         self.info("Setting activity {0} ({1})"
                   .format(identifier, time_limit or 'unlimited'))
+        self.verdicts.clear()
         self.activity = self.activities.make(identifier,
                                              kwargs=dict(time_limit=time_limit))
         self.info("Activity is now %s" % self.activity)
@@ -63,6 +153,7 @@ class Context(LoggerMixin):
 
         self.info("Unsetting activity.")
         self.activity = None
+        self.verdicts.clear()
 
     def set_flow(self, identifier, time_limit=None):
         """
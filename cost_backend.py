@@ -0,0 +1,145 @@
+"""
+Provides the cost-aware ordering of the operands of the checker
+combinators (see checkers/combinators.py).
+
+For each operand, the backend keeps the exponential moving averages of its
+evaluation time (cost) and of the fraction of rounds it evaluated to True
+(selectivity). Conjunctions evaluate first the operands that are cheap and
+likely to be False, disjunctions the operands that are cheap and likely to
+be True, hence the expensive operands (and the reporters they use) are
+evaluated only when the cheap ones cannot decide the outcome.
+
+Each operand is measured at most once per round, since repeated evaluations
+within the round are served from the caches and cost next to nothing.
+"""
+
+from plugins import Backend, HashableDict
+from util import monotonic
+
+
+class Operand(object):
+    """
+    A checker invocation, used as an operand of the combinators.
+    """
+
+    __slots__ = ('identifier', 'args', 'kwargs', 'key')
+
+    def __init__(self, identifier, args, kwargs):
+        self.identifier = identifier
+        self.args = args
+        self.kwargs = HashableDict(kwargs)
+        self.key = (identifier, args, self.kwargs)
+
+    def __eq__(self, other):
+        return isinstance(other, Operand) and self.key == other.key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return '{0}({1})'.format(self.identifier, ', '.join(
+            [repr(arg) for arg in self.args] +
+            ['{0}={1!r}'.format(key, value)
+             for key, value in sorted(self.kwargs.items())]))
+
+
+def check(identifier, *args, **kwargs):
+    """
+    Returns the operand for the combinators, i.e.
+
+        self.check('all_of', check('time_interval', start='9.00', end='17.00'),
+                             check('any_of', check(...), check(...)))
+    """
+
+    return Operand(identifier, args, kwargs)
+
+
+class CostBackend(Backend):
+    """
+    Keeps the cost and selectivity statistics of the operands, and orders
+    the operands by them.
+    """
+
+    # Weight of the latest measurement in the moving averages
+    SMOOTHING = 0.2
+
+    # Lower bound of the probabilities, so that operands which were never
+    # decisive are still ordered by their cost
+    MIN_PROBABILITY = 0.01
+
+    def __init__(self, context):
+        super(CostBackend, self).__init__(context)
+
+        # key -> [average cost in seconds, average truth]
+        self.stats = {}
+        self.measured = set()
+        self.tick = None
+
+        self.evaluated = 0
+        self.skipped = 0
+
+    def evaluate(self, key, function, *args):
+        """
+        Evaluates the operand using the given function, and updates its
+        statistics.
+        """
+
+        if self.tick != self.context.tick:
+            self.measured.clear()
+            self.tick = self.context.tick
+
+        self.evaluated += 1
+
+        start = monotonic()
+        result = function(*args)
+        cost = monotonic() - start
+
+        if key not in self.measured:
+            self.measured.add(key)
+
+            stats = self.stats.get(key)
+            if stats is None:
+                self.stats[key] = [cost, 1.0 if result else 0.0]
+            else:
+                stats[0] += self.SMOOTHING * (cost - stats[0])
+                stats[1] += self.SMOOTHING * ((1.0 if result else 0.0) -
+                                              stats[1])
+
+        return result
+
+    def rank(self, key, conjunction):
+        """
+        Returns the expected cost of deciding the outcome using the operand.
+        Operands that were not measured yet are ranked first.
+        """
+
+        stats = self.stats.get(key)
+
+        if stats is None:
+            return 0.0
+
+        cost, truth = stats
+        decisive = 1.0 - truth if conjunction else truth
+        return cost / max(decisive, self.MIN_PROBABILITY)
+
+    def order(self, operands, conjunction=True, key=None):
+        """
+        Returns the operands in the order they should be evaluated in. The
+        given order is kept for the operands of equal rank.
+        """
+
+        key = key or (lambda operand: operand)
+        return sorted(operands,
+                      key=lambda operand: self.rank(key(operand), conjunction))
+
+    def skip(self, count):
+        self.skipped += count
+
+    def counters(self):
+        return {
+            'combinator_operands_evaluated': self.evaluated,
+            'combinator_operands_skipped': self.skipped,
+        }
@@ -0,0 +1,208 @@
+"""
+Provides a trace of the decisions made by the rules.
+
+Only the transitions are recorded: the rules becoming active or inactive,
+the checkers returning a different result than in the previous round, and
+the fixers that fired, with their arguments. Rounds in which nothing changes
+cost no records (nor building of the representations). The records are kept
+in a ring buffer of a fixed size, with the arguments and results stored as
+truncated representations, so the memory used by the trace is bounded.
+
+The trace can be queried using the Why D-Bus method ('actor why --since 10m'),
+and optionally spilled to a rotating file of marshalled records.
+"""
+
+import collections
+import datetime
+import marshal
+import os
+import time
+
+from logger import LoggerMixin
+from plugins import HashableDict
+
+RULE = 'rule'
+CHECKER = 'checker'
+FIXER = 'fixer'
+
+# Marks the checker results not known from the previous round
+MISSING = object()
+
+
+def shorten(value, length):
+    """
+    Returns the representation of the value, truncated to the given length.
+    """
+
+    representation = repr(value)
+
+    if len(representation) > length:
+        representation = representation[:length - 3] + '...'
+
+    return representation
+
+
+class DecisionTrace(LoggerMixin):
+    """
+    Ring buffer of the decision records. Each record is a tuple
+    (timestamp, rule, kind, identifier, arguments, result).
+    """
+
+    MAX_RECORDS = 10000
+    MAX_VALUE_LENGTH = 80
+
+    # Spill file is rotated once it grows over MAX_FILE_SIZE bytes
+    MAX_FILE_SIZE = 1024 * 1024
+
+    def __init__(self, path=None):
+        self.records = collections.deque(maxlen=self.MAX_RECORDS)
+        self.path = os.path.expanduser(path) if path else None
+        self.pending = []
+        self.timestamp = time.time()
+        self.dropped = 0
+
+        # Identifiers of the rules active in the last round
+        self.active = set()
+
+        # (rule, checker, args, kwargs) -> result, in the previous and in
+        # the current round
+        self.previous = {}
+        self.current = {}
+
+    def start_round(self):
+        """
+        Marks the beginning of an evaluation round. Records made within
+        a round share its timestamp.
+        """
+
+        self.timestamp = time.time()
+
+        # Results of the checkers not run in the last round are forgotten
+        self.previous, self.current = self.current, {}
+
+    def rules(self, identifiers):
+        """
+        Records the rules that became active or inactive since the last
+        round.
+        """
+
+        identifiers = set(identifiers)
+
+        for identifier in sorted(identifiers - self.active):
+            self.record(None, RULE, identifier, result='active')
+
+        for identifier in sorted(self.active - identifiers):
+            self.record(None, RULE, identifier, result='inactive')
+
+        self.active = identifiers
+
+    def checker(self, rule, identifier, args, kwargs, result):
+        """
+        Records the result of the checker, unless it is the same as in the
+        previous round.
+        """
+
+        try:
+            key = (rule, identifier, args, HashableDict(kwargs))
+            last = self.current.get(key, self.previous.get(key, MISSING))
+            unchanged = last is not MISSING and last == result
+            self.current[key] = result
+        except TypeError:
+            # Unhashable arguments, the result cannot be compared
+            unchanged = False
+
+        if not unchanged:
+            self.record(rule, CHECKER, identifier, args, kwargs, result)
+
+    def record(self, rule, kind, identifier, args=None, kwargs=None,
+               result=None):
+        arguments = ''
+
+        if args or kwargs:
+            arguments = ', '.join(
+                [shorten(arg, self.MAX_VALUE_LENGTH) for arg in args or ()] +
+                ['{0}={1}'.format(key, shorten(value, self.MAX_VALUE_LENGTH))
+                 for key, value in sorted((kwargs or {}).items())]
+            )
+
+        record = (self.timestamp, rule, kind, identifier, arguments,
+                  shorten(result, self.MAX_VALUE_LENGTH))
+
+        if len(self.records) == self.records.maxlen:
+            self.dropped += 1
+
+        self.records.append(record)
+
+        if self.path is not None:
+            self.pending.append(record)
+
+    def since(self, seconds):
+        """
+        Returns the records made in the last given number of seconds.
+        """
+
+        threshold = time.time() - seconds
+        return [record for record in self.records if record[0] >= threshold]
+
+    def report(self, seconds):
+        """
+        Returns the formatted records made in the last given number of
+        seconds, preceded by a notice if older records were dropped.
+        """
+
+        lines = [self.format(record) for record in self.since(seconds)]
+
+        if (self.dropped and self.records and
+                self.records[0][0] > time.time() - seconds):
+            oldest = datetime.datetime.fromtimestamp(self.records[0][0])
+            lines.insert(0, u"Records older than {0:%H:%M:%S} were dropped, "
+                            u"the trace is incomplete".format(oldest))
+
+        return lines
+
+    @staticmethod
+    def format(record):
+        timestamp, rule, kind, identifier, arguments, result = record
+        moment = datetime.datetime.fromtimestamp(timestamp)
+
+        if kind == RULE:
+            return u"{0:%H:%M:%S} rule {1} {2}".format(moment, identifier,
+                                                        result.strip("'"))
+
+        return u"{0:%H:%M:%S} {1}: {2} {3}({4}) -> {5}".format(
+            moment, rule or '-', kind, identifier, arguments, result)
+
+    def flush(self):
+        """
+        Appends the records made since the last flush to the spill file.
+        """
+
+        if not self.pending:
+            return
+
+        pending, self.pending = self.pending, []
+
+        try:
+            if (os.path.exists(self.path) and
+                    os.path.getsize(self.path) > self.MAX_FILE_SIZE):
+                os.rename(self.path, self.path + '.1')
+
+            with open(self.path, 'ab') as fil:
+                marshal.dump(pending, fil)
+        except (IOError, OSError) as exc:
+            self.warning("Could not write the decision trace: %s", exc)
+
+    @staticmethod
+    def load(path):
+        """
+        Returns the records stored in the given spill file.
+        """
+
+        records = []
+
+        with open(path, 'rb') as fil:
+            while True:
+                try:
+                    records.extend(marshal.load(fil))
+                except EOFError:
+                    return records
@@ -0,0 +1,266 @@
+"""
+Provides cached access to the content of files.
+
+The directories of the accessed files are watched using inotify, and the
+content is re-read only after the file has been modified, moved or deleted.
+Files are read rather than memory-mapped: the watched files (i.e. logs) are
+often truncated in place, and accessing the mapping of a truncated file
+kills the process (SIGBUS).
+
+If inotify is not available, or the directory cannot be watched,
+modification time and size are checked on each evaluation round instead.
+"""
+
+import os
+import re
+
+from inotify import Inotify, InotifyError, IN_Q_OVERFLOW, IN_IGNORED
+from plugins import Backend
+
+
+class FileEntry(object):
+    """
+    The cached content of a single file, None if the file does not exist.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.content = None
+        self.dirty = True
+        self.watched = False
+        self.stat = None
+
+
+class FileBackend(Backend):
+    """
+    Keeps the content of the accessed files in memory. Directories that
+    could not be watched are retried after WATCH_RETRY_INTERVAL seconds.
+    """
+
+    WATCH_RETRY_INTERVAL = 60
+
+    def __init__(self, context):
+        super(FileBackend, self).__init__(context)
+
+        self.entries = {}
+        self.watches = {}      # directory -> watch descriptor
+        self.directories = {}  # watch descriptor -> directory
+        self.unwatchable = {}  # directory -> time of the failed attempt
+        self.checked_tick = None
+
+        try:
+            self.inotify = Inotify()
+        except InotifyError as exc:
+            self.warning("Inotify not available, polling files: %s", exc)
+            self.inotify = None
+
+        self.reads = 0
+        self.hits = 0
+        self.bytes_read = 0
+
+    def watch(self, entry):
+        """
+        Watches the directory of the given file. Watching the directory
+        (instead of the file itself) lets us notice the file being replaced
+        or created.
+        """
+
+        directory = os.path.dirname(entry.path)
+
+        if directory not in self.watches:
+            now = self.context.clock.monotonic
+            failed = self.unwatchable.get(directory)
+
+            if (failed is not None and
+                    now - failed < self.WATCH_RETRY_INTERVAL):
+                return
+
+            try:
+                wd = self.inotify.add_watch(directory)
+            except InotifyError as exc:
+                self.debug("Cannot watch %s: %s", directory, exc)
+                self.unwatchable[directory] = now
+                return
+
+            self.unwatchable.pop(directory, None)
+
+            self.watches[directory] = wd
+            self.directories[wd] = directory
+
+        entry.watched = True
+
+    def process_events(self):
+        """
+        Marks the entries affected by the pending events as dirty.
+        Performed at most once per evaluation round.
+        """
+
+        if self.checked_tick == self.context.tick:
+            return
+
+        self.checked_tick = self.context.tick
+
+        if self.inotify is None:
+            for entry in self.entries.values():
+                entry.dirty = True
+            return
+
+        for wd, mask, _, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW:
+                # Events were lost, we need to re-read everything
+                for entry in self.entries.values():
+                    entry.dirty = True
+                continue
+
+            directory = self.directories.get(wd)
+            if directory is None:
+                continue
+
+            if mask & IN_IGNORED:
+                # Directory was removed, watch has to be re-established
+                del self.directories[wd]
+                del self.watches[directory]
+                for entry in self.entries.values():
+                    if os.path.dirname(entry.path) == directory:
+                        entry.dirty = True
+                        entry.watched = False
+                continue
+
+            entry = self.entries.get(os.path.join(directory, name))
+            if entry is not None:
+                entry.dirty = True
+
+    def load(self, entry):
+        """
+        Reads the content of the file.
+        """
+
+        entry.content = None
+
+        try:
+            with open(entry.path, 'rb') as fil:
+                stat = os.fstat(fil.fileno())
+                entry.stat = (stat.st_mtime, stat.st_size, stat.st_ino)
+                entry.content = fil.read()
+                self.bytes_read += len(entry.content)
+        except (IOError, OSError):
+            entry.stat = None
+
+        self.reads += 1
+
+    def unchanged(self, entry):
+        """
+        Verifies whether the file has changed, if we cannot rely on inotify.
+        """
+
+        try:
+            stat = os.stat(entry.path)
+            return entry.stat == (stat.st_mtime, stat.st_size, stat.st_ino)
+        except OSError:
+            return entry.stat is None
+
+    def get(self, path):
+        """
+        Returns the cached content of the file, or None if the file does not
+        exist.
+        """
+
+        path = os.path.abspath(os.path.expanduser(path))
+        self.process_events()
+
+        entry = self.entries.get(path)
+        if entry is None:
+            entry = self.entries[path] = FileEntry(path)
+
+        if self.inotify is not None and not entry.watched:
+            self.watch(entry)
+            entry.dirty = True
+
+        if entry.dirty and (entry.watched or not self.unchanged(entry)):
+            self.load(entry)
+        else:
+            self.hits += 1
+
+        entry.dirty = False
+        return entry.content
+
+    # Queries
+
+    def content(self, path):
+        """
+        Returns the content of the file as a string, or None if the file does
+        not exist.
+        """
+
+        return self.get(path)
+
+    def search(self, path, regexp):
+        """
+        Returns the list of all the matches of the regular expression in the
+        file, or None if the file does not exist.
+        """
+
+        content = self.get(path)
+
+        if content is not None:
+            return [match.group(0) for match in re.finditer(regexp, content)]
+
+    def lines(self, path, start=0, end=None):
+        """
+        Returns the lines of the file in the given range (with the slice
+        semantics, negative indices count from the end), or None if the
+        file does not exist. Only the requested part of the file is split.
+        """
+
+        content = self.get(path)
+
+        if content is None:
+            return None
+
+        start = start or 0
+
+        if start < 0 and (end is None or end < 0):
+            # Locate the beginning of the -start-th line from the end
+            position = len(content)
+            if content[position - 1:position] == '\n':
+                position -= 1
+
+            for _ in range(-start):
+                position = content.rfind('\n', 0, position)
+                if position < 0:
+                    break
+
+            lines = content[position + 1:].splitlines()
+            return lines[:end] if end is not None else lines
+
+        if start < 0 or (end is not None and end < 0):
+            # Mixed ranges require the total number of lines
+            return content.splitlines()[start:end]
+
+        # Locate the beginning and the end of the range scanning forward
+        offset = 0
+        for _ in range(start):
+            offset = content.find('\n', offset) + 1
+            if offset == 0:
+                return []
+
+        if end is None:
+            return content[offset:].splitlines()
+
+        limit = offset
+        for _ in range(max(end - start, 0)):
+            limit = content.find('\n', limit) + 1
+            if limit == 0:
+                limit = len(content)
+                break
+
+        return content[offset:limit].splitlines()
+
+    def counters(self):
+        return {
+            'file_watches': len(self.watches),
+            'file_reads': self.reads,
+            'file_cache_hits': self.hits,
+            'file_bytes_read': self.bytes_read,
+            'file_unwatchable_directories': len(self.unwatchable),
+        }
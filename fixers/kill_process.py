@@ -1,6 +1,8 @@
 import os
 import signal
 
+import psutil
+
 from plugins import Fixer
 
 
@@ -10,6 +12,17 @@ class KillProcessFixer(Fixer):
     """
 
     identifier = "kill_process"
+    deferred = True
+    parallel_safe = True
+
+    def idempotency_key(self, pid):
+        # pylint: disable=arguments-differ
+
+        # The creation time distinguishes processes reusing the same PID
+        try:
+            return int(pid), psutil.Process(int(pid)).create_time()
+        except (TypeError, ValueError, psutil.Error):
+            return None
 
     def kill(self, pid):
         os.kill(pid, signal.SIGKILL)
@@ -7,6 +7,7 @@ class LockScreenFixer(DBusMixin, Fixer):
     """
 
     identifier = "lock_screen"
+    deferred = True
 
     bus_name = 'org.freedesktop.ScreenSaver'
     object_path = '/ScreenSaver'
@@ -1,13 +1,15 @@
-import dbus
+from notification_backend import NotificationBackend
+from plugins import Fixer
 
-from plugins import Fixer, DBusMixin
-from util import Periodic
 
-
-class NotifyFixer(DBusMixin, Fixer):
+class NotifyFixer(Fixer):
     """
     Simple fixer, that sends a D-Bus notification.
 
+    The message is only enqueued, the NotificationBackend sends it at the end
+    of the evaluation round, coalesced with other messages of the same rule
+    and headline.
+
     Accepted options (defaults in parentheses):
       - message : Text of the message sent
       - headline: Headline of the notification (AcTor Alert!)
@@ -17,31 +19,14 @@ class NotifyFixer(DBusMixin, Fixer):
     """
 
     identifier = "notify"
-    stateless = False
-
-    bus_name = 'org.freedesktop.Notifications'
-    object_path = '/org/freedesktop/Notifications'
-
-    def __init__(self, context):
-        super(NotifyFixer, self).__init__(context)
 
-        self.last_notification = 0
-        self.timer = Periodic(0.5)
+    # Enqueueing does not block, and needs to know the rule
+    deferred = False
 
     def run(self, message, headline="Actor Alert!",
             app_name="Actor", app_icon='', timeout=0):
         # pylint: disable=arguments-differ
 
-        def notify():
-            if not self.timer:
-                return
-
-            replaces_id = self.last_notification
-            self.last_notification = self.interface.Notify(app_name, replaces_id, app_icon,
-                                                           headline, message, [], {},
-                                                           timeout)
-        try:
-            notify()
-        except dbus.DBusException:
-            self.initialize_interface()
-            notify()
+        backend = self.context.backend(NotificationBackend)
+        backend.notify(message, headline, app_name, app_icon, timeout,
+                       rule=getattr(self.context, 'rule', None))
@@ -1,7 +1,33 @@
 import shlex
-import subprocess
 
+from hamster_backend import fact_activity
 from plugins import Fixer, DBusMixin
+from util import run_async
+
+# Timeout of the timew commands, in seconds
+TIMEW_TIMEOUT = 30
+
+
+def report_result(callback, success):
+    if callback is not None:
+        callback(success)
+
+
+class TimewCommandMixin(object):
+    """
+    Runs the timew command in the background, the callback is called once
+    it finishes.
+    """
+
+    def timew(self, args, callback):
+        def finished(returncode, stdout, stderr):
+            # pylint: disable=unused-argument
+            if returncode != 0:
+                self.warning("Command timew %s failed: %s",
+                             args[0], stderr.strip() or returncode)
+            report_result(callback, returncode == 0)
+
+        run_async(['timew'] + args, timeout=TIMEW_TIMEOUT, callback=finished)
 
 
 class SetHamsterActivityFixer(DBusMixin, Fixer):
@@ -10,82 +36,124 @@ class SetHamsterActivityFixer(DBusMixin, Fixer):
 
     Accepted options (defaults in parentheses):
       - activity: Activity string as put in the Hamster (activity@Sample)
+      - callback: Called with True or False once the activity is set (None)
     """
 
     identifier = "set_hamster_activity"
 
+    # Requests of the rules are merged, Timetracking runs the fixer directly
+    deferred = True
+
     bus_name = 'org.gnome.Hamster'
     object_path = '/org/gnome/Hamster'
 
-    def run(self, activity):
+    def run(self, activity, callback=None):
         # pylint: disable=arguments-differ
         if not self.interface:
+            report_result(callback, False)
             return
 
         # First, let's detect the current activity to not
         # redefine the same activity over and over
         current_activity = self.report('hamster_activity')
 
-        # We use substring search here to support setting activity
-        # of the form activity@Project, description
-        # since we generate only activity@Project
-        if current_activity is None or current_activity not in activity:
+        # Hamster reports the activity@Project part only, while we can
+        # set activity of the form activity@Project, description
+        if current_activity == fact_activity(activity):
+            report_result(callback, True)
+            return
+
+        def failed(error):
+            self.warning("Could not set Hamster activity: %s", error)
+            report_result(callback, False)
+
+        def add_fact():
+            self.interface.AddFact(
+                activity, 0, 0, False,
+                reply_handler=lambda fact_id: report_result(callback, True),
+                error_handler=failed
+            )
 
-            # Zero stands for now
-            self.interface.StopTracking(0)
-            self.interface.AddFact(activity, 0, 0, False)
+        # Zero stands for now
+        self.interface.StopTracking(0, reply_handler=add_fact,
+                                    error_handler=failed)
 
 
 class StopHamsterActivityFixer(DBusMixin, Fixer):
     """
     Simple fixer that stops current activity in Hamster.
+
+    Accepted options (defaults in parentheses):
+      - callback: Called with True or False once the activity is stopped
+                  (None)
     """
 
     identifier = "stop_hamster_activity"
 
+    deferred = True
+
     bus_name = 'org.gnome.Hamster'
     object_path = '/org/gnome/Hamster'
 
-    def run(self, activity):
+    def run(self, callback=None):
         # pylint: disable=arguments-differ
         if not self.interface:
+            report_result(callback, False)
             return
 
+        def failed(error):
+            self.warning("Could not stop Hamster activity: %s", error)
+            report_result(callback, False)
+
         # Zero stands for now
-        self.interface.StopTracking(0)
+        self.interface.StopTracking(
+            0,
+            reply_handler=lambda: report_result(callback, True),
+            error_handler=failed
+        )
 
 
-class SetTimewActivityFixer(Fixer):
+class SetTimewActivityFixer(TimewCommandMixin, Fixer):
     """
     Simple fixer, that sets current activity in Timewarrior.
 
     Accepted options (defaults in parentheses):
       - activity: Activity string as put to timewarrior
+      - callback: Called with True or False once the activity is set (None)
     """
 
     identifier = "set_timew_activity"
 
-    def run(self, activity):
+    deferred = True
+
+    def run(self, activity, callback=None):
         # pylint: disable=arguments-differ
 
         # First, let's detect the current activity to not
         # redefine the same activity over and over
         current_activity = self.report('timew_activity')
 
-        # We use substring search here to support setting activity
-        # of the form activity@Project, description
-        # since we generate only activity@Project
-        if current_activity is not activity:
-            subprocess.call(['timew', 'start'] + shlex.split(activity))
+        # Compare the tags, since the quoting might differ
+        tags = shlex.split(activity)
+        if current_activity is None or shlex.split(current_activity) != tags:
+            self.timew(['start'] + tags, callback)
+        else:
+            report_result(callback, True)
 
 
-class StopTimewActivityFixer(Fixer):
+class StopTimewActivityFixer(TimewCommandMixin, Fixer):
     """
     Simple fixer, that stops current activity in Timewarrior.
+
+    Accepted options (defaults in parentheses):
+      - callback: Called with True or False once the activity is stopped
+                  (None)
     """
 
     identifier = "stop_timew_activity"
 
-    def run(self):
+    deferred = True
+
+    def run(self, callback=None):
         # pylint: disable=arguments-differ
-        subprocess.call(['timew', 'stop'])
+        self.timew(['stop'], callback)
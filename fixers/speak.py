@@ -1,5 +1,5 @@
 from plugins import Fixer
-from util import run
+from util import run_async
 
 
 class SpeakFixer(Fixer):
@@ -8,8 +8,10 @@ class SpeakFixer(Fixer):
     """
 
     identifier = "speak"
+    deferred = True
 
     def run(self, text, language='en'):
         # pylint: disable=arguments-differ
 
-        run(['espeak', '-v', language, text])
+        # Speaking takes a while, do not wait for it
+        run_async(['espeak', '-v', language, text], timeout=120)
@@ -1,7 +1,7 @@
 import datetime
 
 from plugins import Fixer, DBusMixin
-from util import run, convert_timestamp
+from util import run_async, convert_timestamp
 
 
 class SuspendFixer(DBusMixin, Fixer):
@@ -10,6 +10,7 @@ class SuspendFixer(DBusMixin, Fixer):
     """
 
     identifier = "suspend"
+    deferred = True
 
     bus_name = 'org.freedesktop.PowerManagement'
     object_path = '/org/freedesktop/PowerManagement'
@@ -18,7 +19,7 @@ class SuspendFixer(DBusMixin, Fixer):
         # pylint: disable=arguments-differ
 
         if enforced:
-            run(['sudo', 'pm-suspend'])
+            run_async(['sudo', 'pm-suspend'])
         else:
             self.interface.Suspend()
 
@@ -32,6 +33,7 @@ class SuspendUntilFixer(Fixer):
     """
 
     identifier = "suspend_until"
+    deferred = True
 
     def run(self, until):
         # pylint: disable=arguments-differ
@@ -42,4 +44,4 @@ class SuspendUntilFixer(Fixer):
             until = until + datetime.timedelta(1)
 
         seconds_until = int((until - datetime.datetime.now()).total_seconds())
-        run(['sudo', 'rtcwake', '-u', '-m', 'mem', '-s', seconds_until])
+        run_async(['sudo', 'rtcwake', '-u', '-m', 'mem', '-s', seconds_until])
@@ -1,5 +1,5 @@
 from plugins import Fixer
-from util import run
+from tmux_backend import TmuxBackend, TmuxCommandError
 
 
 class TmuxDetachFixer(Fixer):
@@ -8,35 +8,42 @@ class TmuxDetachFixer(Fixer):
     """
 
     identifier = "tmux_detach"
+    deferred = True
 
     def run(self):
-        run(['tmux', 'detach-client'])
+        tmux = self.context.backend(TmuxBackend)
+
+        # The client might have detached in the meantime
+        try:
+            # In the control mode, 'detach-client' would detach our own client
+            if tmux.ready():
+                client = tmux.latest_client()
+                if client is not None:
+                    tmux.command('detach-client', '-t', client.name)
+            else:
+                tmux.command('detach-client')
+        except TmuxCommandError as exc:
+            self.debug("Could not detach the tmux client: %s", exc)
 
 
 class TmuxKillActivePaneFixer(Fixer):
     """
-    Returns a list of pids of the processes in the active panes.
+    Kills the active panes of the attached sessions.
     """
 
     identifier = 'tmux_kill_active_pane'
+    deferred = True
 
     def get_active_panes(self):
-        active_sessions = self.report('tmux_active_sessions')
-        active_pane_ids = []
-
-        for session in active_sessions:
-            output = run(
-                ['tmux',
-                 'list-panes',
-                 '-t', session,
-                 '-F', '#{pane_active} #{pane_id}'])[0]
-
-            active_pane_ids = active_pane_ids + [line[2:]
-                                                 for line in output.splitlines()
-                                                 if line.startswith('1 ')]
-
-        return active_pane_ids
+        snapshot = self.context.backend(TmuxBackend).snapshot()
+        return [pane.pane_id for pane in snapshot.active_panes]
 
     def run(self):
+        tmux = self.context.backend(TmuxBackend)
+
         for pane_id in self.get_active_panes():
-            run(['tmux', 'kill-pane', '-t', pane_id])
+            # The pane might have disappeared in the meantime
+            try:
+                tmux.command('kill-pane', '-t', pane_id)
+            except TmuxCommandError as exc:
+                self.debug("Could not kill tmux pane %s: %s", pane_id, exc)
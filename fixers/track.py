@@ -1,16 +1,20 @@
-import os
-
 from plugins import Fixer
-from config import CONFIG_DIR
+from track_backend import TrackBackend
 
 
 class TrackFixer(Fixer):
 
     identifier = 'track'
+    deferred = True
+
+    def idempotency_key(self, ident, key, value):
+        # pylint: disable=arguments-differ
+
+        # Recording the same value again would not change anything
+        return ident, key, value
 
     def run(self, ident, key, value):
         # pylint: disable=arguments-differ
 
-        filepath = os.path.join(CONFIG_DIR, ident + ".act")
-        with open(filepath, 'a') as fil:
-            fil.write("{0}: {1}\n".format(key, value))
+        # The record is written out at the end of the evaluation round
+        self.context.backend(TrackBackend).record(ident, key, value)
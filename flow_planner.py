@@ -0,0 +1,117 @@
+"""
+Provides the planning of the flows, i.e. fitting the durations of the flow's
+activities into the time limit.
+
+Each activity specifies its duration, the maximal shrinking (the lowest
+allowed fraction of its duration) and its priority. The planner computes the
+allocation directly:
+  - the activities with the lowest priority (in case of tie, the lowest
+    maximal shrinking) are skipped, until the remaining activities fit into
+    the time limit when shrunk as much as they allow
+  - the remaining activities are shrunk (or prolonged) by a common factor,
+    except those that would be shrunk below their maximal shrinking, which
+    are kept at it instead (water-filling)
+
+Both steps are a single pass over the sorted activities, hence planning takes
+O(n log n) time. Plans are cached per flow and time limit.
+"""
+
+import collections
+
+from plugins import Backend
+
+
+def plan_shrinkings(activities, time_limit):
+    """
+    Returns the list of shrinking factors of the given activities, given as
+    (duration, max_shrinking, priority) tuples, with None for the skipped
+    activities.
+    """
+
+    shrinkings = [None] * len(activities)
+
+    # Skip the activities, until the rest can fit into the time limit
+    minimal_time = sum(duration * max_shrinking
+                       for duration, max_shrinking, _ in activities)
+    by_priority = sorted(range(len(activities)),
+                         key=lambda i: (activities[i][2], activities[i][1]))
+    skipped = 0
+
+    while skipped < len(by_priority) and minimal_time > time_limit:
+        duration, max_shrinking, _ = activities[by_priority[skipped]]
+        minimal_time -= duration * max_shrinking
+        skipped += 1
+
+    planned = sorted(by_priority[skipped:],
+                     key=lambda i: activities[i][1], reverse=True)
+    free_duration = float(sum(activities[i][0] for i in planned))
+
+    if free_duration == 0:
+        raise Exception("Not enough time to initialize the flow.")
+
+    # Keep the activities that cannot be shrunk by the common factor at their
+    # maximal shrinking, starting with the least shrinkable one
+    clamped_time = 0.0
+    shrinking = time_limit / free_duration
+
+    for index in planned:
+        duration, max_shrinking, _ = activities[index]
+        if max_shrinking <= shrinking:
+            break
+
+        clamped_time += duration * max_shrinking
+        free_duration -= duration
+        shrinking = ((time_limit - clamped_time) / free_duration
+                     if free_duration > 0 else 0.0)
+
+    for index in planned:
+        shrinkings[index] = max(shrinking, activities[index][1])
+
+    return shrinkings
+
+
+class FlowPlanner(Backend):
+    """
+    Keeps at most MAX_PLANS plans, evicting the least recently used ones.
+    """
+
+    MAX_PLANS = 100
+
+    def __init__(self, context):
+        super(FlowPlanner, self).__init__(context)
+
+        self.plans = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def plan(self, flow, activities, time_limit):
+        """
+        Returns the shrinking factors of the activities of the flow (see
+        plan_shrinkings), from the cache if possible.
+        """
+
+        activities = tuple(tuple(activity) for activity in activities)
+        key = (flow, activities, time_limit)
+
+        shrinkings = self.plans.pop(key, None)
+
+        if shrinkings is None:
+            self.misses += 1
+            shrinkings = tuple(plan_shrinkings(activities, time_limit))
+
+            if len(self.plans) >= self.MAX_PLANS:
+                self.plans.popitem(last=False)
+        else:
+            self.hits += 1
+
+        # Reinsert to mark the plan as the most recently used
+        self.plans[key] = shrinkings
+        return shrinkings
+
+    def counters(self):
+        return {
+            'flow_plan_hits': self.hits,
+            'flow_plan_misses': self.misses,
+            'flow_plans': len(self.plans),
+        }
@@ -0,0 +1,223 @@
+"""
+Provides a cached view of today's facts in the Hamster time tracker.
+
+Facts are fetched over D-Bus only after Hamster announces a change using the
+FactsChanged or ActivitiesChanged signals. The per-activity and per-category
+totals are maintained incrementally, and the duration of the ongoing fact is
+extrapolated from the clock.
+"""
+
+import datetime
+import time
+
+import dbus
+
+from plugins import Backend, DBusMixin
+
+
+def fact_activity(activity):
+    """
+    Returns the 'activity@category' part of the given fact, which can be of
+    the form 'activity@category, description #tag'. This is how Hamster
+    reports the ongoing activity.
+    """
+
+    return activity.split(',', 1)[0].split('#', 1)[0].strip()
+
+
+class Fact(object):
+    """
+    A single Hamster fact. See to_dbus_fact method in src/hamster-service
+    for the layout of the D-Bus structure.
+    """
+
+    def __init__(self, dbus_fact):
+        self.id = int(dbus_fact[0])
+        self.ongoing = dbus_fact[2] == 0    # End time, 0 for ongoing facts
+        self.name = unicode(dbus_fact[4])
+        self.category = unicode(dbus_fact[6])
+        self.duration = int(dbus_fact[9])   # In seconds
+
+    @property
+    def activity(self):
+        return u"%s@%s" % (self.name, self.category)
+
+    @property
+    def signature(self):
+        return (self.activity, self.ongoing, self.duration)
+
+
+class HamsterBackend(DBusMixin, Backend):
+    """
+    Keeps today's facts of the Hamster time tracker in memory, together with
+    the per-activity and per-category totals (in seconds, excluding the
+    ongoing fact).
+
+    Facts are refetched when Hamster signals a change, when the day changes,
+    or after MAX_AGE seconds at the latest, in case signals are not being
+    delivered.
+    """
+
+    bus_name = "org.gnome.Hamster"
+    object_path = "/org/gnome/Hamster"
+
+    MAX_AGE = 300
+
+    def __init__(self, context):
+        super(HamsterBackend, self).__init__(context)
+
+        self.facts = {}
+        self.activity_totals = {}
+        self.category_totals = {}
+        self.ongoing = None
+
+        self.fetched_at = None
+        self.fetched_day = None
+        self.dirty = True
+
+        self.fetches = 0
+        self.signals = 0
+
+        self.subscribe()
+
+    def subscribe(self):
+        if self.interface is None:
+            return
+
+        for signal_name in ('FactsChanged', 'ActivitiesChanged'):
+            self.bus.add_signal_receiver(
+                self.invalidate,
+                signal_name=signal_name,
+                dbus_interface=self.bus_name,
+                path=self.object_path,
+            )
+
+    def invalidate(self, *args):
+        self.signals += 1
+        self.dirty = True
+
+    def add(self, fact, sign=1):
+        if fact.ongoing:
+            self.ongoing = fact if sign > 0 else None
+            return
+
+        for totals, key in ((self.activity_totals, fact.activity),
+                            (self.category_totals, fact.category)):
+            totals[key] = totals.get(key, 0) + sign * fact.duration
+
+    def refresh(self):
+        """
+        Refetches the facts, if they could have changed, and updates the
+        totals by the facts that were added, modified or removed.
+        """
+
+        if self.interface is None:
+            self.initialize_interface()
+            self.subscribe()
+            if self.interface is None:
+                return
+
+        now = time.time()
+        outdated = (self.fetched_at is None or
+                    now - self.fetched_at > self.MAX_AGE or
+                    datetime.date.today() != self.fetched_day)
+
+        if not (self.dirty or outdated):
+            return
+
+        try:
+            dbus_facts = self.interface.GetTodaysFacts()
+        except dbus.DBusException as exc:
+            self.debug("Could not fetch Hamster facts: %s", exc)
+            self.interface = None
+            return
+
+        self.dirty = False
+        self.fetches += 1
+        self.fetched_at = now
+        self.fetched_day = datetime.date.today()
+
+        facts = dict((fact.id, fact) for fact in map(Fact, dbus_facts))
+
+        for fact_id, fact in self.facts.items():
+            current = facts.get(fact_id)
+            if current is None or current.signature != fact.signature:
+                self.add(fact, sign=-1)
+
+        for fact_id, fact in facts.items():
+            previous = self.facts.get(fact_id)
+            if previous is None or previous.signature != fact.signature:
+                self.add(fact)
+
+        self.facts = facts
+
+    def ongoing_duration(self):
+        """
+        Returns the duration of the ongoing fact, extrapolated to the current
+        moment.
+        """
+
+        return self.ongoing.duration + (time.time() - self.fetched_at)
+
+    # Queries answered from the in-memory state
+
+    def current_activity(self):
+        """
+        Returns the ongoing activity in the 'activity@category' form, or None
+        if there is none.
+        """
+
+        self.refresh()
+
+        if self.ongoing is not None:
+            return self.ongoing.activity
+
+    def activity_duration(self, activity):
+        """
+        Returns the total time spent today in the given activity, in seconds.
+        """
+
+        self.refresh()
+        duration = self.activity_totals.get(activity, 0)
+
+        if self.ongoing is not None and self.ongoing.activity == activity:
+            duration += self.ongoing_duration()
+
+        return duration
+
+    def category_duration(self, category):
+        """
+        Returns the total time spent today in the given category, in seconds.
+        """
+
+        self.refresh()
+        duration = self.category_totals.get(category, 0)
+
+        if self.ongoing is not None and self.ongoing.category == category:
+            duration += self.ongoing_duration()
+
+        return duration
+
+    def totals(self, by_category=False):
+        """
+        Returns a dictionary of totals of time spent today, per activity
+        (or category), in seconds.
+        """
+
+        self.refresh()
+        totals = dict(self.category_totals if by_category
+                      else self.activity_totals)
+
+        if self.ongoing is not None:
+            key = (self.ongoing.category if by_category
+                   else self.ongoing.activity)
+            totals[key] = totals.get(key, 0) + self.ongoing_duration()
+
+        return totals
+
+    def counters(self):
+        return {
+            'hamster_fetches': self.fetches,
+            'hamster_signals': self.signals,
+            'hamster_facts_today': len(self.facts),
+        }
@@ -0,0 +1,101 @@
+"""
+Minimal ctypes bindings for the Linux inotify API.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+# Events signalling that the content of a file in the watched directory
+# might have changed
+IN_CONTENT_CHANGES = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+                      IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF |
+                      IN_MOVE_SELF)
+
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyError(Exception):
+    """
+    Raised when inotify is not available or the watch cannot be added.
+    """
+    pass
+
+
+class Inotify(object):
+    """
+    A non-blocking inotify instance. Events are obtained by calling the
+    read_events method, which never blocks.
+    """
+
+    def __init__(self):
+        library = ctypes.util.find_library('c')
+
+        try:
+            self.libc = ctypes.CDLL(library, use_errno=True)
+            self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError) as exc:
+            raise InotifyError(str(exc))
+
+        if self.fd < 0:
+            raise InotifyError(os.strerror(ctypes.get_errno()))
+
+    def add_watch(self, path, mask=IN_CONTENT_CHANGES):
+        """
+        Adds a watch for the given path and returns the watch descriptor.
+        """
+
+        wd = self.libc.inotify_add_watch(self.fd, path, mask)
+
+        if wd < 0:
+            raise InotifyError(os.strerror(ctypes.get_errno()))
+
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self):
+        """
+        Returns the list of (wd, mask, cookie, name) tuples of the pending
+        events.
+        """
+
+        events = []
+
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except OSError as exc:
+                if exc.errno == errno.EAGAIN:
+                    return events
+                raise
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data,
+                                                                    offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip('\0')
+                offset += length
+                events.append((wd, mask, cookie, name))
+
+    def close(self):
+        os.close(self.fd)
@@ -1,40 +1,154 @@
+import atexit
 import os
 import sys
 import logging
+import threading
 import traceback
+import Queue
 
 import config
 
 
+class QueueHandler(logging.Handler):
+    """
+    Passes the log records to the LogWriter thread, so that the main loop
+    never blocks on writing the logs. If the queue is full (i.e. the disk
+    is stalled), the records are dropped rather than waited for.
+    """
+
+    def __init__(self, writer):
+        super(QueueHandler, self).__init__()
+        self.writer = writer
+
+    @staticmethod
+    def render_fields(fields):
+        return ' '.join('{0}={1}'.format(key, '{0:.4g}'.format(value)
+                                         if isinstance(value, float)
+                                         else value)
+                        for key, value in sorted(fields.items()))
+
+    def emit(self, record):
+        # The message is formatted right away, the arguments might be
+        # changed by the time the writer gets to the record
+        message = record.getMessage()
+
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message = '{0} [{1}]'.format(message,
+                                         self.render_fields(fields))
+            record.fields = None
+
+        record.msg = message
+        record.args = None
+
+        # The traceback objects are not needed by the formatter, only the
+        # formatted text is
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+            record.exc_info = None
+
+        try:
+            self.writer.queue.put_nowait(record)
+        except Queue.Full:
+            self.writer.dropped += 1
+
+
+class LogWriter(object):
+    """
+    Background thread formatting the log records and passing them to the
+    actual handlers.
+    """
+
+    QUEUE_SIZE = 10000
+
+    def __init__(self, handlers):
+        self.handlers = handlers
+        self.queue = Queue.Queue(self.QUEUE_SIZE)
+        self.dropped = 0
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+        atexit.register(self.stop)
+
+    def handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+
+            if record is None:
+                break
+
+            self.handle(record)
+
+            if self.dropped and self.queue.empty():
+                dropped, self.dropped = self.dropped, 0
+                self.handle(logging.makeLogRecord({
+                    'name': record.name,
+                    'levelno': logging.WARNING,
+                    'levelname': 'WARNING',
+                    'msg': "LogWriter: %d log records were dropped",
+                    'args': (dropped,),
+                }))
+
+    def stop(self, timeout=5):
+        """
+        Writes out the remaining records.
+        """
+
+        try:
+            self.queue.put(None, timeout=timeout)
+        except Queue.Full:
+            return
+
+        self.thread.join(timeout)
+
+        for handler in self.handlers:
+            handler.flush()
+
+
 class LoggerMixin(object):
     """
     This mixin adds logging capabilities to the class. All clases inheriting
     from this mixin use the 'main' logger unless overriden otherwise.
 
     LoggerMixin also provides convenient shortcut methods for logging.
+    The messages are formatted only if the level is enabled. Any keyword
+    arguments are structured fields (i.e. plugin, rule, duration), which are
+    appended to the message as key=value pairs.
     """
 
     logger = logging.getLogger('main')
 
     # Logging-related helpers
-    def log(self, log_func, message, *args):
-        log_func("%s: %s" % (self.__class__.__name__, message), *args)
+    def log(self, level, message, *args, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+
+        self.logger.log(level, "%s: %s" % (self.__class__.__name__, message),
+                        *args, extra={'fields': fields})
 
     # Interface to be leveraged by the class
-    def debug(self, message, *args):
-        self.log(self.logger.debug, message, *args)
+    def debug(self, message, *args, **fields):
+        self.log(logging.DEBUG, message, *args, **fields)
 
-    def info(self, message, *args):
-        self.log(self.logger.info, message, *args)
+    def info(self, message, *args, **fields):
+        self.log(logging.INFO, message, *args, **fields)
 
-    def warning(self, message, *args):
-        self.log(self.logger.warning, message, *args)
+    def warning(self, message, *args, **fields):
+        self.log(logging.WARNING, message, *args, **fields)
 
-    def error(self, message, *args):
-        self.log(self.logger.error, message, *args)
+    def error(self, message, *args, **fields):
+        self.log(logging.ERROR, message, *args, **fields)
 
-    def critical(self, message, *args):
-        self.log(self.logger.critical, message, *args)
+    def critical(self, message, *args, **fields):
+        self.log(logging.CRITICAL, message, *args, **fields)
 
     def log_exception(self):
         exception_type, value, trace = sys.exc_info()
@@ -64,8 +178,9 @@ class LoggerMixin(object):
             logging_level = logging.INFO
             log_default_level_warning = True
 
-        # Setup main logger
-        cls.logger.setLevel(logging.DEBUG)
+        # Setup main logger. Its level is set as well, so that disabled
+        # messages are skipped before any formatting takes place
+        cls.logger.setLevel(logging_level)
 
         # Define logging format
         timeformat = '%(asctime)s:' if config.LOGGING_TIMESTAMP else ''
@@ -74,25 +189,23 @@ class LoggerMixin(object):
             datefmt='%m/%d/%Y %I:%M:%S %p',
         )
 
-        # Define default handlers
-        stream_handler = logging.StreamHandler()
-        stream_handler.setLevel(logging_level)
-        stream_handler.setFormatter(formatter)
+        # Setup desired handlers
+        handlers = []
 
-        file_handler = logging.FileHandler(
-            filename=os.path.expanduser(config.LOGGING_FILE)
-        )
-        file_handler.setLevel(logging_level)
-        file_handler.setFormatter(formatter)
+        if config.LOGGING_TARGET in ('both', 'file'):
+            handlers.append(logging.FileHandler(
+                filename=os.path.expanduser(config.LOGGING_FILE)
+            ))
 
-        # Setup desired handlers
-        if config.LOGGING_TARGET == 'both':
-            cls.logger.addHandler(file_handler)
-            cls.logger.addHandler(stream_handler)
-        elif LOGGING_TARGET == 'file':
-            cls.logger.addHandler(file_handler)
-        else:
-            cls.logger.addHandler(stream_handler)
+        if config.LOGGING_TARGET != 'file':
+            handlers.append(logging.StreamHandler())
+
+        for handler in handlers:
+            handler.setLevel(logging_level)
+            handler.setFormatter(formatter)
+
+        # The handlers are run by the writer thread
+        cls.logger.addHandler(QueueHandler(LogWriter(handlers)))
 
         if log_default_level_warning:
             cls.logger.warning("Logging level %s not recognized, "
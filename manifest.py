@@ -0,0 +1,161 @@
+"""
+Provides lazy loading of the reporter, checker and fixer modules.
+
+The plugin packages are scanned without importing them: each module is
+parsed, and the identifiers assigned in its class bodies are indexed. A
+module is imported only when one of its identifiers is requested for the
+first time (see PluginFactory.get_plugin), hence the dependencies of the
+plugins that are not used by any rule (i.e. wnck, gtk or tasklib) are never
+loaded.
+"""
+
+import ast
+import glob
+import importlib
+import os
+
+from logger import LoggerMixin
+from util import monotonic
+
+PACKAGES = ('reporters', 'checkers', 'fixers')
+
+
+def class_identifiers(path):
+    """
+    Returns the list of the identifiers of the plugin classes defined in the
+    given module, i.e. the string values of the 'identifier' class
+    attributes.
+    """
+
+    with open(path) as fil:
+        tree = ast.parse(fil.read(), path)
+
+    identifiers = []
+
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        for statement in node.body:
+            if (isinstance(statement, ast.Assign) and
+                    len(statement.targets) == 1 and
+                    isinstance(statement.targets[0], ast.Name) and
+                    statement.targets[0].id == 'identifier' and
+                    isinstance(statement.value, ast.Str)):
+                identifiers.append(statement.value.s)
+
+    return identifiers
+
+
+class PluginManifest(LoggerMixin):
+    """
+    Index of the plugin identifiers to the modules defining them, together
+    with the record of the imported modules and their import times.
+    """
+
+    def __init__(self, root=None, packages=PACKAGES):
+        self.root = root or os.path.dirname(os.path.abspath(__file__))
+        self.index = {}       # (package, identifier) -> module name
+        self.modules = {}     # package -> list of module names
+        self.loaded = set()
+        self.failed = set()
+        self.import_times = {}
+
+        for package in packages:
+            self.scan(package)
+
+    def scan(self, package):
+        paths = sorted(glob.glob(os.path.join(self.root, package, '*.py')))
+        self.modules[package] = []
+
+        for path in paths:
+            name = os.path.basename(path)[:-3]
+            if name.startswith('_'):
+                continue
+
+            self.modules[package].append(name)
+
+            try:
+                identifiers = class_identifiers(path)
+            except (IOError, SyntaxError) as exc:
+                # The module will be imported when an identifier cannot be
+                # found in the index, and the error reported then
+                self.debug("Cannot scan %s: %s", path, exc)
+                continue
+
+            for identifier in identifiers:
+                self.index[(package, identifier)] = name
+
+    def import_module(self, package, name):
+        """
+        Imports the given plugin module, unless it has been imported (or has
+        failed to import) before. Returns True if the module was imported.
+        """
+
+        module_id = "{0}.{1}".format(package, name)
+
+        if module_id in self.loaded or module_id in self.failed:
+            return False
+
+        start = monotonic()
+
+        # pylint: disable=broad-except
+        try:
+            importlib.import_module(module_id)
+        except Exception as exc:
+            self.failed.add(module_id)
+            self.warning("The {0} {1} module could not be loaded: {2}"
+                         .format(name, package[:-1], str(exc)))
+            self.log_exception()
+            return False
+
+        self.loaded.add(module_id)
+        self.import_times[module_id] = monotonic() - start
+        self.debug("%s loaded in %.1f ms", module_id,
+                   self.import_times[module_id] * 1000)
+
+        return True
+
+    def load(self, package, identifier):
+        """
+        Imports the module defining the given identifier. If the identifier
+        is not in the index, all the remaining modules of the package are
+        imported. Returns True if any module was imported.
+        """
+
+        name = self.index.get((package, identifier))
+        names = [name] if name else self.modules.get(package, [])
+
+        imported = False
+        for name in names:
+            imported = self.import_module(package, name) or imported
+
+        return imported
+
+    def report(self):
+        """
+        Returns the lines of the report of the imported modules, ordered by
+        their import time.
+        """
+
+        available = sum(len(names) for names in self.modules.values())
+        lines = ["{0} of {1} plugin modules loaded ({2:.1f} ms)".format(
+            len(self.loaded), available,
+            sum(self.import_times.values()) * 1000)]
+
+        for module_id, duration in sorted(self.import_times.items(),
+                                          key=lambda item: -item[1]):
+            lines.append("  {0}: {1:.1f} ms".format(module_id,
+                                                    duration * 1000))
+
+        return lines
+
+    def counters(self):
+        return {
+            'plugin_modules_loaded': len(self.loaded),
+            'plugin_modules_failed': len(self.failed),
+            'plugin_import_ms': sum(self.import_times.values()) * 1000,
+        }
+
+
+MANIFEST = PluginManifest()
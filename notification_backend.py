@@ -0,0 +1,190 @@
+"""
+Provides the dispatcher of the desktop notifications.
+
+The notify fixer only enqueues the messages, which are sent at the end of the
+evaluation round. Messages are coalesced by the rule and headline: a newer
+message replaces the pending one, and updates the notification shown for
+the same rule and headline (using its replaces_id) instead of opening a new
+one. Messages are sent asynchronously, hence the main loop never waits for
+the notification server.
+
+The number of sent notifications is limited globally; messages over the limit
+stay pending (and keep being coalesced) until they can be sent. Repeating an
+unchanged message is suppressed for REPEAT_INTERVAL seconds.
+"""
+
+import collections
+
+import dbus
+
+from plugins import Backend, DBusMixin
+
+
+class Notification(object):
+
+    __slots__ = ('message', 'headline', 'app_name', 'app_icon', 'timeout')
+
+    def __init__(self, message, headline, app_name, app_icon, timeout):
+        self.message = message
+        self.headline = headline
+        self.app_name = app_name
+        self.app_icon = app_icon
+        self.timeout = timeout
+
+    @property
+    def content(self):
+        return (self.message, self.headline, self.app_name, self.app_icon)
+
+
+class NotificationBackend(DBusMixin, Backend):
+    """
+    Keeps the pending notifications, the ids of the shown notifications and
+    the state of the rate limit (a token bucket of MAX_BURST notifications,
+    refilled with RATE notifications per second).
+    """
+
+    bus_name = 'org.freedesktop.Notifications'
+    object_path = '/org/freedesktop/Notifications'
+
+    MAX_BURST = 5
+    RATE = 1 / 10.0
+    REPEAT_INTERVAL = 30
+
+    def __init__(self, context):
+        super(NotificationBackend, self).__init__(context)
+
+        # (rule, headline) -> Notification
+        self.pending = collections.OrderedDict()
+
+        # (rule, headline) -> (notification id, content, time sent)
+        self.shown = {}
+
+        self.tokens = self.MAX_BURST
+        self.refilled_at = self.context.clock.monotonic
+
+        self.requested = 0
+        self.coalesced = 0
+        self.repeated = 0
+        self.sent = 0
+        self.failed = 0
+
+        self.subscribed = False
+        self.subscribe()
+
+    def subscribe(self):
+        if self.interface is None or self.subscribed:
+            return
+
+        # The match rule does not depend on the owner of the bus name, hence
+        # the receiver survives the restarts of the notification server
+        self.bus.add_signal_receiver(
+            self.closed,
+            signal_name='NotificationClosed',
+            dbus_interface=self.bus_name,
+            path=self.object_path
+        )
+
+        self.subscribed = True
+
+    def closed(self, notification_id, reason):
+        # pylint: disable=unused-argument
+
+        # Closed notifications cannot be updated anymore
+        for key, (shown_id, _, _) in list(self.shown.items()):
+            if shown_id == notification_id:
+                del self.shown[key]
+
+    def notify(self, message, headline, app_name, app_icon, timeout,
+               rule=None):
+        """
+        Enqueues the message, replacing the pending message of the same rule
+        and headline.
+        """
+
+        self.requested += 1
+        key = (rule, headline)
+
+        if key in self.pending:
+            self.coalesced += 1
+            del self.pending[key]
+
+        self.pending[key] = Notification(message, headline, app_name,
+                                         app_icon, timeout)
+
+    def refill(self, now):
+        self.tokens = min(self.MAX_BURST,
+                          self.tokens + (now - self.refilled_at) * self.RATE)
+        self.refilled_at = now
+
+    def flush(self):
+        """
+        Sends the pending notifications, as far as the rate limit allows.
+        """
+
+        if not self.pending:
+            return
+
+        if self.interface is None:
+            self.initialize_interface()
+            self.subscribe()
+
+            # Keep the messages until the notification server is available
+            if self.interface is None:
+                return
+
+        now = self.context.clock.monotonic
+        self.refill(now)
+
+        for key, notification in list(self.pending.items()):
+            shown = self.shown.get(key)
+
+            if (shown is not None and shown[1] == notification.content and
+                    now - shown[2] < self.REPEAT_INTERVAL):
+                self.repeated += 1
+                del self.pending[key]
+                continue
+
+            if self.tokens < 1:
+                break
+
+            self.tokens -= 1
+            del self.pending[key]
+            self.send(key, notification, shown[0] if shown else 0, now)
+
+    def send(self, key, notification, replaces_id, now):
+        # Remember the content right away, so that it is not repeated while
+        # the reply is on its way
+        self.shown[key] = (replaces_id, notification.content, now)
+        self.sent += 1
+
+        def reply_handler(notification_id):
+            self.shown[key] = (notification_id, notification.content, now)
+
+        def error_handler(error):
+            self.failed += 1
+            self.shown.pop(key, None)
+            self.warning("Notification could not be sent: %s", error)
+
+            # The server might have been restarted, reconnect on next flush
+            self.interface = None
+
+        try:
+            self.interface.Notify(
+                notification.app_name, replaces_id, notification.app_icon,
+                notification.headline, notification.message, [], {},
+                notification.timeout,
+                reply_handler=reply_handler,
+                error_handler=error_handler
+            )
+        except dbus.DBusException as exc:
+            error_handler(exc)
+
+    def counters(self):
+        return {
+            'notifications_requested': self.requested,
+            'notifications_coalesced': self.coalesced,
+            'notifications_repeated': self.repeated,
+            'notifications_sent': self.sent,
+            'notifications_failed': self.failed,
+            'notifications_pending': len(self.pending),
+        }
@@ -0,0 +1,249 @@
+"""
+Provides an in-memory view of the open Pidgin (or finch) IM conversations.
+
+The conversations are fetched over D-Bus only when connecting to libpurple.
+Afterwards, the state is maintained from the ReceivedImMsg,
+ConversationUpdated and DeletingConversation signals, hence queries do not
+cost any D-Bus round trips. The state is dropped when libpurple leaves the
+bus, and fetched again once it is back.
+"""
+
+import collections
+
+import dbus
+
+from plugins import Backend, DBusMixin
+
+# See PurpleConversationType and PurpleConvUpdateType in conversation.h
+PURPLE_CONV_TYPE_IM = 1
+PURPLE_CONV_UPDATE_TITLE = 10
+
+
+class Conversation(object):
+
+    __slots__ = ('sender', 'count')
+
+    def __init__(self, sender, count=0):
+        self.sender = sender
+        self.count = count
+
+
+class PidginBackend(DBusMixin, Backend):
+    """
+    Keeps the open IM conversations, each with the name of the sender and
+    the number of messages received since the conversation was opened (or
+    since connecting to libpurple).
+    """
+
+    bus_name = "im.pidgin.purple.PurpleService"
+    object_path = "/im/pidgin/purple/PurpleObject"
+    interface_name = "im.pidgin.purple.PurpleInterface"
+
+    def __init__(self, context):
+        super(PidginBackend, self).__init__(context)
+
+        # Conversation id -> Conversation
+        self.conversations = collections.OrderedDict()
+
+        # Messages received before their conversation was created, by the
+        # normalized name of the sender
+        self.pending = {}
+
+        self.synced = False
+        self.subscribed = False
+
+        self.resyncs = 0
+        self.lookups = 0
+        self.signals = 0
+
+        self.subscribe()
+
+    def subscribe(self):
+        if self.interface is None or self.subscribed:
+            return
+
+        # The match rules do not depend on the owner of the bus name, hence
+        # the receivers survive the restarts of Pidgin
+        for signal_name, handler in (
+                ('ReceivedImMsg', self.received),
+                ('ConversationUpdated', self.updated),
+                ('DeletingConversation', self.deleting)):
+            self.bus.add_signal_receiver(
+                handler,
+                signal_name=signal_name,
+                dbus_interface=self.interface_name,
+                path=self.object_path,
+            )
+
+        self.bus.add_signal_receiver(
+            self.owner_changed,
+            signal_name='NameOwnerChanged',
+            dbus_interface='org.freedesktop.DBus',
+            arg0=self.bus_name,
+        )
+
+        self.subscribed = True
+
+    def owner_changed(self, name, old_owner, new_owner):
+        # pylint: disable=unused-argument
+
+        # Conversation ids are not valid across the restarts of libpurple,
+        # and the proxy is bound to the previous owner
+        self.conversations.clear()
+        self.pending.clear()
+        self.synced = False
+        self.interface = None
+
+    def lookup(self, conv):
+        """
+        Returns the name of the IM conversation, or None if it is not an IM
+        conversation.
+        """
+
+        self.lookups += 1
+
+        if self.interface.PurpleConversationGetType(conv) != \
+                PURPLE_CONV_TYPE_IM:
+            return None
+
+        return unicode(self.interface.PurpleConversationGetName(conv))
+
+    def normalize(self, account, name):
+        """
+        Returns the name normalized by the protocol of the account, i.e.
+        without the XMPP resource, so that the senders of the messages match
+        the names of the conversations.
+        """
+
+        try:
+            return unicode(self.interface.PurpleNormalize(account, name))
+        except dbus.DBusException as exc:
+            self.debug("Could not normalize the name %s: %s", name, exc)
+            return unicode(name)
+
+    def register(self, conv):
+        """
+        Adds the conversation that was not known yet, together with the
+        messages received before it was created.
+        """
+
+        sender = self.lookup(conv)
+        if sender is None:
+            return None
+
+        account = self.interface.PurpleConversationGetAccount(conv)
+        count = self.pending.pop(self.normalize(account, sender), 0)
+
+        conversation = Conversation(sender, count)
+        self.conversations[conv] = conversation
+
+        return conversation
+
+    # Signal handlers
+
+    def received(self, account, sender, message, conv, flags):
+        # pylint: disable=unused-argument,too-many-arguments
+
+        self.signals += 1
+        if not self.synced:
+            return
+
+        conversation = self.conversations.get(conv) if conv else None
+
+        if conversation is None:
+            # The conversation is created only after the first message is
+            # received, it gets registered by the following update
+            sender = self.normalize(account, sender)
+            self.pending[sender] = self.pending.get(sender, 0) + 1
+        else:
+            conversation.count += 1
+
+    def updated(self, conv, update_type):
+        self.signals += 1
+        if not self.synced or self.interface is None:
+            return
+
+        try:
+            if conv not in self.conversations:
+                self.register(conv)
+            elif update_type == PURPLE_CONV_UPDATE_TITLE:
+                sender = self.lookup(conv)
+                if sender is not None:
+                    self.conversations[conv].sender = sender
+        except dbus.DBusException as exc:
+            self.debug("Could not look up Pidgin conversation: %s", exc)
+
+    def deleting(self, conv):
+        self.signals += 1
+        self.conversations.pop(conv, None)
+
+    # Synchronization
+
+    def refresh(self):
+        """
+        Connects to libpurple and fetches the open IM conversations, unless
+        connected already.
+        """
+
+        if self.interface is None:
+            self.initialize_interface()
+            self.subscribe()
+            if self.interface is None:
+                return
+
+        if self.synced:
+            return
+
+        try:
+            conversations = collections.OrderedDict(
+                (conv, Conversation(
+                    unicode(self.interface.PurpleConversationGetName(conv))))
+                for conv in self.interface.PurpleGetIms()
+            )
+        except dbus.DBusException as exc:
+            self.debug("Could not fetch Pidgin conversations: %s", exc)
+            self.interface = None
+            return
+
+        self.resyncs += 1
+        self.conversations = conversations
+        self.pending.clear()
+        self.synced = True
+
+    # Queries answered from the in-memory state
+
+    def senders(self):
+        """
+        Returns the list of names of the senders of the open conversations,
+        followed by the senders of the messages whose conversation was not
+        created yet.
+        """
+
+        self.refresh()
+        senders = [conversation.sender
+                   for conversation in self.conversations.values()]
+
+        return senders + [sender for sender in self.pending
+                          if sender not in senders]
+
+    def unread_counts(self):
+        """
+        Returns a dictionary of numbers of received messages, per sender.
+        """
+
+        self.refresh()
+        counts = dict(self.pending)
+
+        for conversation in self.conversations.values():
+            counts[conversation.sender] = (counts.get(conversation.sender, 0)
+                                           + conversation.count)
+
+        return counts
+
+    def counters(self):
+        return {
+            'pidgin_resyncs': self.resyncs,
+            'pidgin_lookups': self.lookups,
+            'pidgin_signals': self.signals,
+            'pidgin_conversations': len(self.conversations),
+        }
@@ -1,8 +1,11 @@
 import dbus
+import logging
 import time
 import threading
 
 import logger
+from manifest import MANIFEST
+from util import monotonic
 
 # This file contains definitions of plugin classes, most of
 # which intentionally do not implement their abstract method
@@ -17,13 +20,43 @@ class NoSuchPlugin(Exception):
     pass
 
 
+class PluginList(list):
+    """
+    List of the plugins registered in a PluginMount. Keeps a revision
+    number, so that the users of the list can detect changes cheaply.
+    """
+
+    revision = 0
+
+    def append(self, plugin):
+        super(PluginList, self).append(plugin)
+        self.revision += 1
+
+    def replace(self, plugins):
+        self[:] = plugins
+        self.revision += 1
+
+    def remove_module(self, module_name):
+        """
+        Removes all the plugins defined in the given module.
+        """
+
+        self.replace([plugin for plugin in self
+                      if plugin.__module__ != module_name])
+
+
+# All the PluginMounts, i.e. Reporter, Checker, Rule or Activity
+MOUNTS = []
+
+
 class PluginMount(type):
 
     def __init__(cls, name, bases, attrs):
         super(PluginMount, cls).__init__(name, bases, attrs)
 
         if not hasattr(cls, 'plugins'):
-            cls.plugins = []
+            cls.plugins = PluginList()
+            MOUNTS.append(cls)
         else:
             # System generic plugin classes are marked with 'noplugin'
             # attribute. We do not want to mix those with user plugin
@@ -78,15 +111,29 @@ class Worker(Plugin):
     stateless = True
     side_effects = False
 
+    # Time-based workers depend on the clock only, hence their results change
+    # only at the boundaries registered in the context.intervals
+    time_based = False
+
     def evaluate(self, *args, **kwargs):
         """
-        Wraps the run method. Currently only adds the debug logging.
+        Wraps the run method. Currently only adds the debug logging, which
+        is skipped altogether unless the debug level is enabled.
         """
 
-        self.debug('Running with args={0}, kwargs={1}'.format(args, kwargs))
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return self.run(*args, **kwargs)
+
+        rule = getattr(self.context, 'rule', None)
+        self.debug('Running with args=%s, kwargs=%s', args, kwargs,
+                   plugin=self.identifier, rule=rule)
 
+        start = monotonic()
         result = self.run(*args, **kwargs)
-        self.debug('Result: {0}'.format(result))
+        duration = monotonic() - start
+
+        self.debug('Result: %s (%.1f ms)', result, duration * 1000,
+                   plugin=self.identifier, rule=rule, duration=duration)
 
         return result
 
@@ -98,6 +145,8 @@ class Reporter(Worker):
 
     __metaclass__ = PluginMount
 
+    package = 'reporters'
+
 
 class Checker(Worker):
     """
@@ -106,6 +155,8 @@ class Checker(Worker):
 
     __metaclass__ = PluginMount
 
+    package = 'checkers'
+
     def __bool__(self):
         return self.run()
 
@@ -117,8 +168,27 @@ class Fixer(Worker):
 
     __metaclass__ = PluginMount
 
+    package = 'fixers'
+
     side_effects = True
 
+    # Deferred fixers are queued, and run at the end of the evaluation round
+    # (see ActionQueue). Only fixers whose result is not needed can be
+    # deferred, fix() returns None for them.
+    deferred = False
+
+    # Actions of the parallel safe fixers can run concurrently with others
+    parallel_safe = False
+
+    def idempotency_key(self, *args, **kwargs):
+        """
+        Returns a key describing the requested change together with the
+        observed state it applies to. The action is suppressed if it was
+        already applied with the same key. None disables the suppression.
+        """
+
+        return None
+
 
 class ContextProxyMixin(object):
     """
@@ -149,10 +219,45 @@ class ContextProxyMixin(object):
 class Rule(ContextProxyMixin, Plugin):
     """
     Performs custom rule.
+
+    The rule can declare activation guards, and is run only while all of
+    them hold (see RuleIndex). Guards set to None are not used.
     """
 
     __metaclass__ = PluginMount
 
+    activities = None      # Identifiers of the activities, i.e. ('work',)
+    flows = None           # Identifiers of the flows
+    weekdays = None        # Weekday names, i.e. ('Saturday', 'Sunday')
+    time_windows = None    # i.e. (('9.00', '17.00'),)
+    session_locked = None  # True or False
+
+
+class Backend(logger.LoggerMixin):
+    """
+    Base class for long-lived data sources shared by the plugins. Backends
+    keep their state between the evaluation rounds, and are instantiated at
+    most once per Context, on first use (see Context.backend).
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+    def counters(self):
+        """
+        Returns a dictionary of runtime counters of the backend.
+        """
+
+        return dict()
+
+    def flush(self):
+        """
+        Performs the work postponed until the end of the evaluation round,
+        i.e. writes that were batched.
+        """
+
+        pass
+
 
 class DBusMixin(object):
     """
@@ -202,6 +307,10 @@ class AsyncEvalMixinBase(object):
 
     stateless = False
 
+    # The result is polled by the caller, hence the evaluation cannot be
+    # deferred to the end of the round
+    deferred = False
+
     def __init__(self, *args, **kwargs):
         super(AsyncEvalMixinBase, self).__init__(*args, **kwargs)
 
@@ -304,17 +413,26 @@ class PluginFactory(object):
         self.mount = mount
         self.context = context
 
+        self.index = {}
+        self.indexed = None
+
     @property
     def plugins(self):
         """
         Returns a dictionary of plugins contained in the
         given PluginMount upon which the factory is built.
+
+        The dictionary is rebuilt only after the plugins were changed.
         """
 
-        return {
-            plugin_class.identifier: plugin_class
-            for plugin_class in self.mount.plugins
-        }
+        if self.indexed != self.mount.plugins.revision:
+            self.index = {
+                plugin_class.identifier: plugin_class
+                for plugin_class in self.mount.plugins
+            }
+            self.indexed = self.mount.plugins.revision
+
+        return self.index
 
     def make(self, identifier, args=None, kwargs=None):
         """
@@ -334,9 +452,17 @@ class PluginFactory(object):
         NoSuchPlugin exception if none found.
         """
 
-        try:
-            return self.plugins[identifier]
-        except KeyError:
+        plugin_class = self.plugins.get(identifier)
+
+        # The module defining the plugin might not have been imported yet
+        package = getattr(self.mount, 'package', None)
+        if plugin_class is None and package is not None:
+            if MANIFEST.load(package, identifier):
+                plugin_class = self.plugins.get(identifier)
+
+        if plugin_class is not None:
+            return plugin_class
+        else:
             raise NoSuchPlugin("Plugin with identifier {0} is not available'"
                                .format(identifier))
 
@@ -383,16 +509,35 @@ class PluginCache(PluginFactory):
 
         plugin_class = self.get_plugin(identifier)
 
+        # Results of the other reporters and checkers need to be polled
+        if self.mount is not Fixer and not plugin_class.time_based:
+            self.context.polled = True
+
+        # Deferred fixers are queued, and recorded in the trace once run.
+        # Fixers requested from other threads are run right away.
+        if (getattr(plugin_class, 'deferred', False) and
+                self.context.actions.owns_thread()):
+            instance_id = identifier
+
+            if not plugin_class.stateless:
+                if rule_name is None:
+                    raise ValueError("Only stateless plugins can be accessed "
+                                     "from workers.")
+                instance_id = '{0}_{1}'.format(identifier, rule_name)
+
+            return self.context.actions.enqueue(identifier, instance_id,
+                                                args, kwargs)
+
         # Instances can be shared, and be kept for the time the Actor runs,
         # however, in the case of stateful plugins, we need to make sure
         # we create a separate instance per rule.
 
         if plugin_class.stateless and not plugin_class.side_effects:
             # Can be cached (per loop).
-            return self.result_from_cache(identifier, args, kwargs)
+            result = self.result_from_cache(identifier, args, kwargs)
         elif plugin_class.stateless:
             # It has side-effects, hence we need to run it.
-            return self.run_plugin_instance(identifier, args, kwargs)
+            result = self.run_plugin_instance(identifier, args, kwargs)
         else:
             if rule_name is None:
                 raise ValueError("Only stateless plugins can be accessed "
@@ -400,8 +545,19 @@ class PluginCache(PluginFactory):
             # It is stateful, hence cannot be shared between modules.
             # Modify instance name to include the rule name.
             instance_id = '{0}_{1}'.format(identifier, rule_name)
-            return self.run_plugin_instance(instance_id, args, kwargs,
-                                            class_identifier=identifier)
+            result = self.run_plugin_instance(instance_id, args, kwargs,
+                                              class_identifier=identifier)
+
+        # Changed checker results and fired fixers are recorded in the
+        # decision trace
+        if self.mount is Checker:
+            self.context.trace.checker(self.context.rule, identifier, args,
+                                       kwargs, result)
+        elif self.mount is Fixer:
+            self.context.trace.record(self.context.rule, 'fixer', identifier,
+                                      args, kwargs, result)
+
+        return result
 
     def get_plugin_instance(self, identifier, class_identifier=None):
         """
@@ -416,11 +572,32 @@ class PluginCache(PluginFactory):
         instance = self.instances.get(identifier)
 
         if instance is None:
-            identifier = class_identifier or identifier
-            self.instances[identifier] = instance = self.make(identifier)
+            instance = self.make(class_identifier or identifier)
+            self.instances[identifier] = instance
 
         return instance
 
+    def drop_instances(self, rule_name):
+        """
+        Drops the stateful plugin instances created for the given rule.
+        """
+
+        suffix = '_{0}'.format(rule_name)
+
+        for identifier in list(self.instances):
+            if (identifier.endswith(suffix) and
+                    identifier[:-len(suffix)] in self.plugins):
+                del self.instances[identifier]
+
+    def drop_module(self, module_name):
+        """
+        Drops the plugin instances of the classes defined in the given module.
+        """
+
+        for identifier, instance in list(self.instances.items()):
+            if type(instance).__module__ == module_name:
+                del self.instances[identifier]
+
     def result_from_cache(self, identifier, args, kwargs):
         """
         Only for stateless plugins with no side-effects. Gets the result from
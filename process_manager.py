@@ -0,0 +1,387 @@
+"""
+Provides the management of the external commands run by the plugins.
+
+Commands whose result is not needed (i.e. espeak, suspending, the startup
+commands) are spawned in the background. Their output is read, and their
+exit is handled, by the gobject main loop, hence they never block the
+evaluation, and they are always reaped. At most MAX_RUNNING background
+commands run at once, the rest waits in a queue.
+
+Long-lived commands (i.e. the applications started by the activities) are
+detached: they inherit the standard output, are not limited by MAX_RUNNING,
+and the main loop only reaps them once they exit.
+
+Commands whose output is needed (i.e. xprop or tmux queries) are run
+synchronously, but never for longer than the given timeout.
+"""
+
+import collections
+import errno
+import fcntl
+import os
+import select
+import signal
+import subprocess
+
+from logger import LoggerMixin
+from util import monotonic
+
+# Timeout of the synchronously run commands, in seconds
+RUN_TIMEOUT = 30
+
+
+def set_nonblocking(fil):
+    flags = fcntl.fcntl(fil, fcntl.F_GETFL)
+    fcntl.fcntl(fil, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+
+
+def read_available(fil):
+    """
+    Returns the data available in the non-blocking file, and whether the end
+    of the file was reached.
+    """
+
+    chunks = []
+
+    while True:
+        try:
+            chunk = os.read(fil.fileno(), 65536)
+        except OSError as exc:
+            if exc.errno in (errno.EAGAIN, errno.EINTR):
+                return ''.join(chunks), False
+            raise
+
+        if not chunk:
+            return ''.join(chunks), True
+
+        chunks.append(chunk)
+
+
+def exit_code(status):
+    """
+    Converts the wait status into the return code, as used by subprocess.
+    """
+
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+
+    return os.WEXITSTATUS(status)
+
+
+class Process(object):
+    """
+    A command spawned in the background.
+
+    The callback is called with the return code, stdout and stderr once the
+    command exits. The output callback is called with the name of the
+    stream and the data, as soon as the data is available. The output is
+    kept only for the callback, at most MAX_OUTPUT bytes of each stream.
+    """
+
+    MAX_OUTPUT = 1024 * 1024
+
+    def __init__(self, args, timeout=None, callback=None, output=None):
+        self.args = [str(arg) for arg in args]
+        self.timeout = timeout
+        self.callback = callback
+        self.output = output
+
+        self.child = None
+        self.started = None
+        self.returncode = None
+        self.timed_out = False
+
+        self.buffers = {'stdout': [], 'stderr': []}
+        self.sizes = {'stdout': 0, 'stderr': 0}
+
+        # Main loop sources of the output watches and of the timeout
+        self.watches = {}
+        self.timeout_id = None
+
+    @property
+    def pid(self):
+        return self.child.pid if self.child is not None else None
+
+    def buffer(self, name, data):
+        if self.callback is None:
+            return
+
+        data = data[:self.MAX_OUTPUT - self.sizes[name]]
+        if data:
+            self.buffers[name].append(data)
+            self.sizes[name] += len(data)
+
+
+class ProcessManager(LoggerMixin):
+    """
+    Runs the external commands, and keeps the metrics of their spawning and
+    running times.
+    """
+
+    MAX_RUNNING = 8
+
+    def __init__(self):
+        self.running = {}
+        self.detached = {}
+        self.queue = collections.deque()
+
+        self.spawned = 0
+        self.spawn_failures = 0
+        self.queued = 0
+        self.timeouts = 0
+        self.completed = 0
+        self.spawn_time = 0.0
+        self.run_time = 0.0
+        self.max_run_time = 0.0
+
+    def popen(self, args, piped=True):
+        start = monotonic()
+        pipe = subprocess.PIPE if piped else None
+
+        try:
+            child = subprocess.Popen(args, stdout=pipe, stderr=pipe,
+                                     close_fds=True)
+        except OSError:
+            self.spawn_failures += 1
+            raise
+
+        self.spawned += 1
+        self.spawn_time += monotonic() - start
+
+        return child
+
+    def finished(self, started):
+        duration = monotonic() - started
+
+        self.completed += 1
+        self.run_time += duration
+        self.max_run_time = max(self.max_run_time, duration)
+
+    # Synchronous execution
+
+    def run(self, args, timeout=RUN_TIMEOUT):
+        """
+        Runs the command and returns its stdout, stderr and return code. The
+        command is killed after the timeout.
+        """
+
+        started = monotonic()
+        child = self.popen([str(arg) for arg in args])
+        deadline = started + timeout if timeout is not None else None
+
+        streams = {child.stdout: [], child.stderr: []}
+        for fil in streams:
+            set_nonblocking(fil)
+
+        open_files = list(streams)
+
+        while open_files:
+            remaining = (deadline - monotonic()
+                         if deadline is not None else None)
+
+            if remaining is not None and remaining <= 0:
+                self.timeouts += 1
+                self.warning("Command %s timed out after %s s",
+                             args[0], timeout)
+                child.kill()
+                break
+
+            try:
+                readable = select.select(open_files, [], [], remaining)[0]
+            except select.error as exc:
+                if exc.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for fil in readable:
+                data, finished = read_available(fil)
+                streams[fil].append(data)
+                if finished:
+                    open_files.remove(fil)
+
+        child.wait()
+        child.stdout.close()
+        child.stderr.close()
+        self.finished(started)
+
+        return (''.join(streams[child.stdout]),
+                ''.join(streams[child.stderr]),
+                child.returncode)
+
+    # Background execution
+
+    def spawn(self, args, timeout=None, callback=None, output=None):
+        """
+        Runs the command in the background, or queues it if MAX_RUNNING
+        commands are running already. Returns the Process.
+        """
+
+        process = Process(args, timeout, callback, output)
+
+        if len(self.running) >= self.MAX_RUNNING:
+            self.queued += 1
+            self.queue.append(process)
+        else:
+            self.start(process)
+
+        return process
+
+    def detach(self, args):
+        """
+        Runs the long-lived command in the background, regardless of
+        MAX_RUNNING. Returns the Process, or None if it could not be started.
+        """
+
+        # Imported here, so that the synchronous commands do not need gobject
+        import gobject
+
+        process = Process(args)
+
+        try:
+            process.child = self.popen(process.args, piped=False)
+        except OSError as exc:
+            self.warning("Command %s could not be started: %s",
+                         process.args[0], exc)
+            return None
+
+        process.started = monotonic()
+        self.detached[process.pid] = process
+        gobject.child_watch_add(process.pid, self.reaped, process)
+
+        return process
+
+    def reaped(self, pid, status, process):
+        self.detached.pop(pid, None)
+        process.child.returncode = process.returncode = exit_code(status)
+        self.finished(process.started)
+
+    def start(self, process):
+        import gobject
+
+        try:
+            process.child = self.popen(process.args)
+        except OSError as exc:
+            self.warning("Command %s could not be started: %s",
+                         process.args[0], exc)
+            self.complete(process, None)
+            return
+
+        process.started = monotonic()
+        self.running[process.pid] = process
+
+        for name in ('stdout', 'stderr'):
+            fil = getattr(process.child, name)
+            set_nonblocking(fil)
+            process.watches[name] = gobject.io_add_watch(
+                fil, gobject.IO_IN | gobject.IO_HUP | gobject.IO_ERR,
+                self.readable, process, name)
+
+        # The main loop reaps the child once it exits
+        gobject.child_watch_add(process.pid, self.exited, process)
+
+        if process.timeout is not None:
+            process.timeout_id = gobject.timeout_add(
+                int(process.timeout * 1000), self.expire, process)
+
+    def read(self, process, name):
+        fil = getattr(process.child, name)
+        if fil.closed:
+            return False
+
+        data, finished = read_available(fil)
+
+        if data:
+            process.buffer(name, data)
+            if process.output is not None:
+                process.output(name, data)
+
+        if finished:
+            fil.close()
+
+        return not finished
+
+    def readable(self, source, condition, process, name):
+        # pylint: disable=unused-argument
+
+        if self.read(process, name):
+            return True
+
+        del process.watches[name]
+        return False
+
+    def expire(self, process):
+        process.timeout_id = None
+
+        if process.pid in self.running:
+            self.timeouts += 1
+            process.timed_out = True
+            self.warning("Command %s timed out after %s s",
+                         process.args[0], process.timeout)
+
+            try:
+                os.kill(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+        return False
+
+    def exited(self, pid, status, process):
+        """
+        Handles the exit of the background command. The child has been
+        reaped by the main loop at this point.
+        """
+
+        import gobject
+
+        self.running.pop(pid, None)
+
+        for source in process.watches.values():
+            gobject.source_remove(source)
+
+        if process.timeout_id is not None:
+            gobject.source_remove(process.timeout_id)
+
+        # Collect the output that was not read yet
+        for name in ('stdout', 'stderr'):
+            self.read(process, name)
+            getattr(process.child, name).close()
+
+        # Let the Popen object know the child is gone
+        process.child.returncode = exit_code(status)
+        self.finished(process.started)
+        self.complete(process, process.child.returncode)
+
+        while self.queue and len(self.running) < self.MAX_RUNNING:
+            self.start(self.queue.popleft())
+
+    def complete(self, process, returncode):
+        process.returncode = returncode
+
+        if process.callback is None:
+            return
+
+        # pylint: disable=broad-except
+        try:
+            process.callback(returncode,
+                             ''.join(process.buffers['stdout']),
+                             ''.join(process.buffers['stderr']))
+        except Exception:
+            self.log_exception()
+
+    def counters(self):
+        return {
+            'processes_spawned': self.spawned,
+            'processes_spawn_failures': self.spawn_failures,
+            'processes_running': len(self.running),
+            'processes_detached': len(self.detached),
+            'processes_queued': len(self.queue),
+            'processes_queued_total': self.queued,
+            'processes_timed_out': self.timeouts,
+            'processes_completed': self.completed,
+            'processes_spawn_ms': self.spawn_time * 1000,
+            'processes_run_ms': self.run_time * 1000,
+            'processes_max_run_ms': self.max_run_time * 1000,
+        }
+
+
+PROCESSES = ProcessManager()
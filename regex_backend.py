@@ -0,0 +1,167 @@
+"""
+Provides a cache of compiled regular expressions.
+
+The internal cache of the re module is small (100 patterns in Python 2.7) and
+is cleared completely once full, hence configurations with many patterns end
+up recompiling them on each evaluation round. RegexBackend keeps its own
+bounded LRU cache of the compiled patterns instead.
+
+It also supports matching a single string against a whole set of patterns.
+The patterns are combined into a single alternation, which is scanned in one
+pass, instead of running one search per pattern.
+"""
+
+import collections
+import re
+
+from plugins import Backend
+
+# Patterns using these constructs cannot be safely combined with others:
+# backreferences, conditional group references and named groups would refer
+# to the wrong groups, and inline flags would apply to the whole combined
+# pattern
+UNCOMBINABLE = re.compile(r'\\[1-9]|\(\?P[<=]|\(\?\(|\(\?[iLmsux]+\)')
+
+# Maximum number of groups in a single combined pattern (Python 2.7 supports
+# at most 100 groups per pattern)
+MAX_GROUPS = 99
+
+
+class RegexBackend(Backend):
+    """
+    Keeps at most MAX_PATTERNS compiled patterns, evicting the least recently
+    used ones, and at most MAX_PLANS plans for matching sets of patterns.
+    """
+
+    MAX_PATTERNS = 1000
+    MAX_PLANS = 100
+
+    def __init__(self, context):
+        super(RegexBackend, self).__init__(context)
+
+        self.patterns = collections.OrderedDict()
+        self.plans = collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.passes = 0
+
+    def compile(self, pattern):
+        """
+        Returns the compiled pattern, from the cache if possible.
+        """
+
+        compiled = self.patterns.pop(pattern, None)
+
+        if compiled is None:
+            self.misses += 1
+            compiled = re.compile(pattern)
+
+            if len(self.patterns) >= self.MAX_PATTERNS:
+                self.patterns.popitem(last=False)
+        else:
+            self.hits += 1
+
+        # Reinsert to mark the pattern as the most recently used
+        self.patterns[pattern] = compiled
+        return compiled
+
+    def search(self, pattern, string):
+        return self.compile(pattern).search(string)
+
+    def combine(self, patterns):
+        """
+        Splits the patterns into chunks that fit into a single combined
+        pattern. Returns the list of the compiled combined patterns, each
+        together with the list of the patterns it contains.
+        """
+
+        chunks = []
+        sources, members, groups = [], [], 0
+
+        for pattern in patterns:
+            size = self.compile(pattern).groups + 1
+
+            if members and groups + size > MAX_GROUPS:
+                chunks.append((re.compile('|'.join(sources)), members))
+                sources, members, groups = [], [], 0
+
+            sources.append('(?P<_{0}>{1})'.format(len(members), pattern))
+            members.append(pattern)
+            groups += size
+
+        if members:
+            chunks.append((re.compile('|'.join(sources)), members))
+
+        return chunks
+
+    def plan(self, patterns):
+        """
+        Returns the patterns that need to be searched for separately, and the
+        combined chunks of the rest. Plans are cached per tuple of patterns.
+        """
+
+        plan = self.plans.get(patterns)
+
+        if plan is None:
+            separate, combinable = [], []
+
+            for pattern in patterns:
+                if (UNCOMBINABLE.search(pattern) or
+                        self.compile(pattern).groups >= MAX_GROUPS):
+                    separate.append(pattern)
+                else:
+                    combinable.append(pattern)
+
+            if len(self.plans) >= self.MAX_PLANS:
+                self.plans.popitem(last=False)
+
+            plan = (separate, self.combine(combinable))
+            self.plans[patterns] = plan
+
+        return plan
+
+    def matching(self, patterns, string):
+        """
+        Returns the list of the given patterns that match the string.
+
+        Each pass over the string finds at least one of the remaining matching
+        patterns; patterns that were shadowed by another match (starting at
+        the same position, or overlapping it) are found in the next passes.
+        Hence the number of passes is bounded by the number of matching
+        patterns, rather than by the number of patterns.
+        """
+
+        string = string or ''
+        patterns = tuple(patterns)
+        separate, chunks = self.plan(patterns)
+
+        matched = set(pattern for pattern in separate
+                      if self.search(pattern, string))
+
+        while chunks:
+            found = set()
+
+            for combined, members in chunks:
+                self.passes += 1
+                for match in combined.finditer(string):
+                    found.add(members[int(match.lastgroup[1:])])
+
+            if not found:
+                break
+
+            matched |= found
+            remaining = tuple(pattern for _, members in chunks
+                              for pattern in members
+                              if pattern not in found)
+            chunks = self.plan(remaining)[1]
+
+        return [pattern for pattern in patterns if pattern in matched]
+
+    def counters(self):
+        return {
+            'regex_cache_hits': self.hits,
+            'regex_cache_misses': self.misses,
+            'regex_cached_patterns': len(self.patterns),
+            'regex_set_passes': self.passes,
+        }
@@ -0,0 +1,133 @@
+"""
+Provides reloading of the rule files in the configuration directory.
+
+Rule files are either Python modules, or YAML documents compiled by the
+yaml_rules module.
+
+The directory is watched using inotify (or polled for modification times, if
+inotify is not available). Only the files that changed are reloaded: the
+plugin classes they defined are removed from the PluginMounts, and the file
+is loaded again. If the file cannot be loaded, the previous classes are put
+back, so a typo in a rule file never disables the rules it contained.
+"""
+
+import glob
+import imp
+import os
+
+from inotify import (Inotify, InotifyError, IN_CLOSE_WRITE, IN_DELETE,
+                     IN_MOVED_FROM, IN_MOVED_TO, IN_Q_OVERFLOW)
+from logger import LoggerMixin
+from plugins import MOUNTS
+from yaml_rules import load_rules
+
+RULE_FILE_EVENTS = IN_CLOSE_WRITE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+RULE_FILE_EXTENSIONS = ('.py', '.yaml', '.yml')
+
+# Compiled plans of the YAML rule files are cached in this subdirectory
+CACHE_DIRECTORY = '.cache'
+
+
+def module_name(path):
+    """
+    Returns the name of the module the plugins of the given rule file belong
+    to. YAML rule files keep their extension, so they do not clash with
+    Python rule files of the same name.
+    """
+
+    name, extension = os.path.splitext(os.path.basename(path))
+    return name if extension == '.py' else name + extension
+
+
+class RuleReloader(LoggerMixin):
+    """
+    Loads the rule files and detects the changes in them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.mtimes = {}
+
+        try:
+            self.inotify = Inotify()
+            self.inotify.add_watch(directory, RULE_FILE_EVENTS)
+        except InotifyError as exc:
+            self.warning("Inotify not available, polling rule files: %s", exc)
+            self.inotify = None
+
+    def rule_files(self):
+        return sorted(path for extension in RULE_FILE_EXTENSIONS
+                      for path in glob.glob(os.path.join(self.directory,
+                                                         '*' + extension)))
+
+    def modification_time(self, path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def changed_files(self):
+        """
+        Returns the list of the rule files that were modified, created or
+        deleted since they were loaded.
+        """
+
+        if self.inotify is not None:
+            names = set()
+            rescan = False
+
+            for _, mask, _, name in self.inotify.read_events():
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                elif name.endswith(RULE_FILE_EXTENSIONS):
+                    names.add(name)
+
+            if not rescan:
+                return [os.path.join(self.directory, name)
+                        for name in sorted(names)]
+
+        paths = set(self.rule_files()) | set(self.mtimes)
+        return [path for path in sorted(paths)
+                if self.modification_time(path) != self.mtimes.get(path)]
+
+    def load(self, path):
+        """
+        Loads (or reloads) the given rule file. The plugin classes previously
+        defined by the file are unregistered, or kept if the file cannot be
+        loaded. Returns True if the file was loaded (or removed).
+        """
+
+        module_id = module_name(path)
+        previous = [(mount, list(mount.plugins)) for mount in MOUNTS]
+
+        for mount in MOUNTS:
+            mount.plugins.remove_module(module_id)
+
+        self.mtimes[path] = self.modification_time(path)
+
+        if self.mtimes[path] is None:
+            # The file was deleted
+            del self.mtimes[path]
+            return True
+
+        # pylint: disable=broad-except
+        try:
+            if path.endswith('.py'):
+                imp.load_source(module_id, path)
+            else:
+                load_rules(path, module_id,
+                           os.path.join(self.directory, CACHE_DIRECTORY))
+        except Exception as exc:
+            self.warning(
+                "Rule file {0} cannot be loaded, following error was "
+                "encountered: {1}".format(path, str(exc))
+            )
+            self.log_exception()
+
+            for mount, plugins in previous:
+                mount.plugins.replace(plugins)
+
+            return False
+
+        return True
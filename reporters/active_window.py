@@ -5,6 +5,9 @@ from util import run
 
 from plugins import Reporter
 
+# xprop answers immediately, unless the X server is stuck
+XPROP_TIMEOUT = 5
+
 
 class ActiveWindowNameReporter(Reporter):
     """
@@ -64,7 +67,7 @@ class ActiveWindowPidReporter(ActiveWindowNameReporter):
         Returns None if active window could not be detected.
         """
 
-        output = run(['xprop', '-root'])[0]
+        output = run(['xprop', '-root'], timeout=XPROP_TIMEOUT)[0]
 
         if output is None:
             return None
@@ -78,7 +81,8 @@ class ActiveWindowPidReporter(ActiveWindowNameReporter):
             if not window_id.startswith('0x'):
                 return None
 
-            output = run(['xprop', '-id', window_id])[0]
+            output = run(['xprop', '-id', window_id],
+                         timeout=XPROP_TIMEOUT)[0]
             candidate_lines = [line for line in output.splitlines()
                                if line.startswith('_NET_WM_PID')]
 
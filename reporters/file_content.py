@@ -1,5 +1,4 @@
-import os
-
+from file_backend import FileBackend
 from plugins import Reporter
 
 
@@ -15,6 +14,37 @@ class FileContentReporter(Reporter):
     def run(self, path):
         # pylint: disable=arguments-differ
 
-        if os.path.isfile(path):
-            with open(path, 'r') as fil:
-                return fil.read()
+        return self.context.backend(FileBackend).content(path)
+
+
+class FileSearchReporter(Reporter):
+    """
+    Returns the list of all the matches of the given regular expression in
+    the given file. Large files are searched without being read into memory.
+
+    Returns None if the file does not exist.
+    """
+
+    identifier = 'file_search'
+
+    def run(self, path, regexp):
+        # pylint: disable=arguments-differ
+
+        return self.context.backend(FileBackend).search(path, regexp)
+
+
+class FileLinesReporter(Reporter):
+    """
+    Returns the given range of lines of the given file. Negative indices
+    count from the end of the file, hence start=-10 returns the last ten
+    lines. Only the requested part of large files is read.
+
+    Returns None if the file does not exist.
+    """
+
+    identifier = 'file_lines'
+
+    def run(self, path, start=0, end=None):
+        # pylint: disable=arguments-differ
+
+        return self.context.backend(FileBackend).lines(path, start, end)
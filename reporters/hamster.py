@@ -1,7 +1,8 @@
-from plugins import Reporter, DBusMixin
+from hamster_backend import HamsterBackend
+from plugins import Reporter
 
 
-class HamsterActivityReporter(DBusMixin, Reporter):
+class HamsterActivityReporter(Reporter):
     """
     Reports the current activity, as set in Hamster Time Tracker.
 
@@ -11,57 +12,51 @@ class HamsterActivityReporter(DBusMixin, Reporter):
 
     identifier = 'hamster_activity'
 
-    bus_name = "org.gnome.Hamster"
-    object_path = "/org/gnome/Hamster"
-
     def run(self):
-        activity = None
-
-        try:
-            today_facts = self.interface.GetTodaysFacts()
-        except Exception:
-            return None
-
-        # See to_dbus_fact method in src/hamster-service
-        if today_facts:
-            last_fact = today_facts[-1]
-            if last_fact[2] == 0:    # 2 - end_time, set to 0 for ongoing facts
-                # 4 - name, 6 - category
-                activity = "%s@%s" % (last_fact[4], last_fact[6])
+        return self.context.backend(HamsterBackend).current_activity()
 
-        return activity
 
-
-class HamsterActivityDailyDurationReporter(DBusMixin, Reporter):
+class HamsterActivityDailyDurationReporter(Reporter):
     """
     Reports the cummulative time spent in a particular given activity,
     as tracked by Hamster Time Tracker.
 
-    Returns the total time in minutes as float.
+    Returns the total time in minutes as float. If no activity is given,
+    returns a dictionary of totals for all the activities.
     """
 
     identifier = 'hamster_activity_daily_duration'
 
-    bus_name = "org.gnome.Hamster",
-    object_path = "/org/gnome/Hamster"
-
     def run(self, activity=None):
         # pylint: disable=arguments-differ
 
-        totals = dict()
+        hamster = self.context.backend(HamsterBackend)
 
-        for fact in self.interface.GetTodaysFacts():
-            # 4 - name
-            # 6 - category
-            # 9 - duration
-            key = "%s@%s" % (fact[4], fact[6])
+        if activity is not None:
+            return hamster.activity_duration(activity) / 60.0
+        else:
+            return dict((key, value / 60.0)
+                        for key, value in hamster.totals().items())
 
-            if key in totals:
-                totals[key] = + fact[9] / 60.0
-            else:
-                totals[key] = fact[9] / 60.0
 
-        if activity is not None:
-            return totals.get(activity, 0.0)
+class HamsterCategoryDailyDurationReporter(Reporter):
+    """
+    Reports the cummulative time spent in a particular given category,
+    as tracked by Hamster Time Tracker.
+
+    Returns the total time in minutes as float. If no category is given,
+    returns a dictionary of totals for all the categories.
+    """
+
+    identifier = 'hamster_category_daily_duration'
+
+    def run(self, category=None):
+        # pylint: disable=arguments-differ
+
+        hamster = self.context.backend(HamsterBackend)
+
+        if category is not None:
+            return hamster.category_duration(category) / 60.0
         else:
-            return totals
+            return dict((key, value / 60.0) for key, value
+                        in hamster.totals(by_category=True).items())
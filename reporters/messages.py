@@ -1,24 +1,17 @@
-from plugins import Reporter, DBusMixin
+from pidgin_backend import PidginBackend
+from plugins import Reporter
 
 
-class MessagesReporter(DBusMixin, Reporter):
+class MessagesReporter(Reporter):
     """
     Returns a list of raw sender names of users you have unread
     IM messages from.
+
+    The conversations are tracked by the PidginBackend from the libpurple
+    signals, hence no D-Bus calls are made per evaluation.
     """
 
     identifier = 'messages'
 
-    bus_name = "im.pidgin.purple.PurpleService"
-    object_path = "/im/pidgin/purple/PurpleObject"
-    interface_name = "im.pidgin.purple.PurpleInterface"
-
     def run(self):
-        if not self.interface:
-            return []
-
-        messages = self.interface.PurpleGetIms()
-        names = [self.interface.PurpleConversationGetName(m)
-                 for m in messages]
-
-        return names
+        return self.context.backend(PidginBackend).senders()
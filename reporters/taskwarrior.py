@@ -1,5 +1,5 @@
 from plugins import Reporter
-from tasklib import TaskWarrior
+from taskwarrior_backend import TaskWarriorBackend
 
 
 class TaskWarriorReporter(Reporter):
@@ -12,11 +12,8 @@ class TaskWarriorReporter(Reporter):
     def run(self, warrior_options=None, rawfilter=None, taskfilter=None):
         # pylint: disable=arguments-differ
 
-        warrior_options = warrior_options or dict()
-        taskfilter = taskfilter or dict()
-        rawfilter = rawfilter or tuple()
-
-        warrior = TaskWarrior(**warrior_options)
-        tasks = warrior.tasks.filter(*rawfilter, **taskfilter)
-
-        return tasks
+        return self.context.backend(TaskWarriorBackend).filter(
+            options=warrior_options,
+            rawfilter=rawfilter,
+            taskfilter=taskfilter,
+        )
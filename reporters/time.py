@@ -1,4 +1,3 @@
-import datetime
 from plugins import Reporter
 
 
@@ -8,9 +7,10 @@ class TimeReporter(Reporter):
     """
 
     identifier = 'time'
+    time_based = True
 
     def run(self):
-        return datetime.datetime.now()
+        return self.context.clock.now
 
 
 class WeekdayReporter(Reporter):
@@ -19,16 +19,18 @@ class WeekdayReporter(Reporter):
     """
 
     identifier = 'weekday'
+    time_based = True
 
     def run(self):
-        day = datetime.datetime.now().strftime("%w")
+        # The day changes at midnight
+        self.context.intervals.add(0, 0)
 
         weekdays = [
-            'Sunday',
             'Monday',
             'Tuesday',
             'Wednesday',
             'Thursday',
             'Friday',
-            'Saturday']
-        return weekdays[int(day)]
+            'Saturday',
+            'Sunday']
+        return weekdays[self.context.clock.weekday]
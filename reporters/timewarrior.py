@@ -1,41 +1,52 @@
 from plugins import Reporter
-from util import run
+from timewarrior_backend import TimewarriorBackend
 
 
 class TaskWarriorReporter(Reporter):
     """
-    Returns TaskWarrior tasks matching the given filter.
+    Returns the tags of the activity currently tracked in Timewarrior,
+    or None if no activity is being tracked.
     """
 
     identifier = 'timew_activity'
 
     def run(self):
-        stdout, stderr, code = run(['timew'])
-        parts = stdout.splitlines()[0].split("Tracking ")
-
-        if len(parts) > 1:
-            return parts[1].strip()
-        else:
-            return None
+        return self.context.backend(TimewarriorBackend).activity()
 
 
 class TaskWarriorReporterDuration(Reporter):
     """
-    Returns TaskWarrior tasks matching the given filter.
+    Returns the duration of the activity currently tracked in Timewarrior,
+    in minutes, or None if no activity is being tracked.
     """
 
     identifier = 'timew_activity_duration'
 
     def run(self):
-        stdout, stderr, code = run(['timew'])
-        parts = stdout.splitlines()[3].split("Total ")
+        seconds = self.context.backend(TimewarriorBackend).activity_duration()
+
+        if seconds is not None:
+            return int(seconds // 60)
+
+
+class TimewarriorTagDailyDurationReporter(Reporter):
+    """
+    Reports the cummulative time spent today in activities with a particular
+    tag, as tracked by Timewarrior.
+
+    Returns the total time in minutes as float. If no tag is given, returns
+    a dictionary of totals for all the tags.
+    """
 
-        if len(parts) > 1:
-            segments = parts[1].strip().split(':')
-            if len(segments) > 1:
-                minutes = int(segments[1].lstrip('0') or 0)
-                hours = int(segments[0].lstrip('0') or 0)
+    identifier = 'timew_tag_daily_duration'
 
-                return (hours * 60) + minutes
+    def run(self, tag=None):
+        # pylint: disable=arguments-differ
 
-        return None
+        totals = self.context.backend(TimewarriorBackend).tag_totals()
+
+        if tag is not None:
+            return totals.get(tag, 0) / 60.0
+        else:
+            return dict((key, value / 60.0)
+                        for key, value in totals.items())
@@ -1,7 +1,5 @@
-import os
-
 from plugins import Reporter
-from config import CONFIG_DIR
+from track_backend import TrackBackend
 
 
 class TrackReporter(Reporter):
@@ -11,13 +9,4 @@ class TrackReporter(Reporter):
     def run(self, ident, key):
         # pylint: disable=arguments-differ
 
-        filepath = os.path.join(CONFIG_DIR, ident + ".act")
-        try:
-            with open(filepath, 'r') as fil:
-                data = fil.readlines()
-
-                for line in data:
-                    if line.startswith(key):
-                        return line.split(':')[1].strip()
-        except IOError as exc:
-            self.debug("Encountered an IOError, %s" % str(exc))
+        return self.context.backend(TrackBackend).get(ident, key)
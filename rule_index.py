@@ -0,0 +1,213 @@
+"""
+Provides the index of the rules by their activation guards.
+
+The guards of the rules (activities, flows, weekdays and time windows) only
+change their value when the current activity or flow changes, at midnight,
+or at the boundaries of the time windows. The day is split into buckets by
+the boundaries of all the windows, and the list of the active rules is
+rebuilt only when the activity, the flow, the weekday or the bucket changes.
+
+The session_locked guard is evaluated each round, but only if some of the
+active rules use it.
+"""
+
+import bisect
+
+from logger import LoggerMixin
+from util import seconds_since_midnight
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday',
+            'Saturday', 'Sunday')
+
+
+def names(value):
+    """
+    Returns the frozenset of the given names, a single name is accepted too.
+    """
+
+    if isinstance(value, basestring):
+        value = (value,)
+
+    return frozenset(value)
+
+
+def weekday_index(name):
+    """
+    Returns the index of the weekday given by its (case-insensitive) name.
+    """
+
+    normalized = unicode(name).strip().capitalize()
+
+    if normalized not in WEEKDAYS:
+        raise ValueError("Unknown weekday: %r" % (name,))
+
+    return WEEKDAYS.index(normalized)
+
+
+def in_window(window, second):
+    start, end = window
+
+    # If the start of the window is later than the end, the window spans
+    # over the midnight
+    if start > end:
+        return start <= second or second < end
+    else:
+        return start <= second < end
+
+
+class RuleGuards(object):
+    """
+    The parsed activation guards of a rule. Raises ValueError if some of
+    the guards cannot be parsed.
+    """
+
+    def __init__(self, rule):
+        self.rule = rule
+
+        self.activities = (names(rule.activities)
+                           if rule.activities is not None else None)
+        self.flows = names(rule.flows) if rule.flows is not None else None
+        self.weekdays = (frozenset(weekday_index(weekday)
+                                   for weekday in names(rule.weekdays))
+                         if rule.weekdays is not None else None)
+        self.windows = ([(seconds_since_midnight(start),
+                          seconds_since_midnight(end))
+                         for start, end in rule.time_windows]
+                        if rule.time_windows is not None else None)
+        self.session_locked = rule.session_locked
+
+    @classmethod
+    def unguarded(cls, rule):
+        """
+        Returns the guards of the given rule that always hold.
+        """
+
+        guards = cls.__new__(cls)
+        guards.rule = rule
+        guards.activities = guards.flows = None
+        guards.weekdays = guards.windows = None
+        guards.session_locked = None
+
+        return guards
+
+    def holds(self, activity, flow, weekday, second):
+        """
+        Returns True if all the guards, except for session_locked, hold.
+        """
+
+        if self.activities is not None and activity not in self.activities:
+            return False
+
+        if self.flows is not None and flow not in self.flows:
+            return False
+
+        if self.weekdays is not None and weekday not in self.weekdays:
+            return False
+
+        if self.windows is not None and not any(in_window(window, second)
+                                                for window in self.windows):
+            return False
+
+        return True
+
+
+class RuleIndex(LoggerMixin):
+    """
+    Keeps the list of the rules whose guards hold.
+    """
+
+    def __init__(self, context):
+        self.context = context
+
+        self.guards = []
+        self.boundaries = []
+        self.state = None
+        self.active = []
+
+        self.rebuilds = 0
+        self.skipped = 0
+
+    def update(self, rules):
+        """
+        Indexes the given rules. The windows of the guards are registered in
+        the interval index of the context, so that Actor wakes up when the
+        list of the active rules changes. Rules with invalid guards are
+        evaluated unconditionally, rather than silently disabled.
+        """
+
+        self.guards = []
+        boundaries = set()
+
+        for rule in rules:
+            try:
+                self.guards.append(RuleGuards(rule))
+            except (ValueError, TypeError) as exc:
+                self.error("Rule %s has invalid guards, evaluating it "
+                           "unconditionally: %s", rule.identifier, exc)
+                self.guards.append(RuleGuards.unguarded(rule))
+
+        for guards in self.guards:
+            for window in guards.windows or []:
+                self.context.intervals.add(*window)
+                boundaries.update(window)
+
+            # Weekdays change at midnight
+            if guards.weekdays is not None:
+                self.context.intervals.add(0, 0)
+
+        self.boundaries = sorted(boundaries)
+        self.state = None
+
+    def identifiers(self):
+        activity = self.context.activity
+        flow = self.context.flow
+
+        return (activity.identifier if activity is not None else None,
+                flow.identifier if flow is not None else None)
+
+    def session_locked(self):
+        # pylint: disable=broad-except
+        try:
+            return self.context.reporters.get('desktop_session_locked',
+                                              (), {})
+        except Exception as exc:
+            self.debug("Session lock state not available: %s", exc)
+
+    def active_rules(self):
+        """
+        Returns the list of the rules that should be run in this round.
+        """
+
+        clock = self.context.clock
+        activity, flow = self.identifiers()
+        second = clock.second_of_day
+        state = (activity, flow, clock.weekday,
+                 bisect.bisect_right(self.boundaries, second))
+
+        if state != self.state:
+            self.state = state
+            self.rebuilds += 1
+            self.active = [guards for guards in self.guards
+                           if guards.holds(activity, flow, clock.weekday,
+                                           second)]
+
+        rules = [guards.rule for guards in self.active]
+
+        if any(guards.session_locked is not None for guards in self.active):
+            locked = self.session_locked()
+
+            # Rules are not skipped if the lock state is not known
+            if locked is not None:
+                rules = [guards.rule for guards in self.active
+                         if guards.session_locked in (None, bool(locked))]
+
+        self.skipped += len(self.guards) - len(rules)
+        return rules
+
+    def counters(self):
+        return {
+            'rules_indexed': len(self.guards),
+            'rules_active': len(self.active),
+            'rules_skipped': self.skipped,
+            'rule_index_rebuilds': self.rebuilds,
+        }
@@ -0,0 +1,173 @@
+"""
+Provides cached TaskWarrior queries.
+
+The results of the queries are kept in memory until the TaskWarrior data
+files change. The data files are checked at most once per evaluation round,
+hence rules checking the tasks every round do not spawn 'task' at all.
+
+Results of the filters referring to dates (i.e. +OVERDUE, due:today,
+due.before:now or +READY) change with time even if the data files do not,
+hence they are cached for the current minute only. Other results are
+cached for the current day at most, since waiting tasks become pending
+without modifying the data files.
+
+The cache can also be invalidated explicitly, using the TasksChanged D-Bus
+method (i.e. 'actor tasks-changed' called from a TaskWarrior on-modify hook).
+"""
+
+import os
+import re
+
+from tasklib import TaskWarrior
+
+from plugins import Backend
+
+# Files whose modification means the query results might have changed
+DATA_FILES = (
+    'pending.data',
+    'completed.data',
+    'taskchampion.sqlite3',
+)
+
+# Date attributes, virtual tags and named dates whose use makes the filter
+# time-relative
+TIME_RELATIVE = re.compile(
+    r'\b(due|wait|scheduled|until|entry|modified|start|end|now|today|'
+    r'tomorrow|yesterday|[se]o[dwmqy]|overdue|ready|waiting|'
+    r'week|month|quarter|year)\b',
+    re.IGNORECASE
+)
+
+
+def canonicalize(value):
+    """
+    Converts the given filter or options structure into a hashable value,
+    independent of the ordering of the dictionary items.
+    """
+
+    if isinstance(value, dict):
+        return tuple(sorted((key, canonicalize(item))
+                            for key, item in value.items()))
+    elif isinstance(value, (list, tuple)):
+        return tuple(canonicalize(item) for item in value)
+    else:
+        return value
+
+
+class TaskWarriorBackend(Backend):
+    """
+    Keeps TaskWarrior instances alive, and caches the filter results, keyed
+    by the canonicalized options and filters.
+    """
+
+    def __init__(self, context):
+        super(TaskWarriorBackend, self).__init__(context)
+
+        self.warriors = {}
+        self.results = {}
+        self.versions = {}
+        self.checked_tick = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    def warrior(self, options):
+        """
+        Returns the TaskWarrior instance for the given options.
+        """
+
+        key = canonicalize(options)
+        warrior = self.warriors.get(key)
+
+        if warrior is None:
+            warrior = self.warriors[key] = TaskWarrior(**options)
+
+        return warrior
+
+    def data_location(self, warrior):
+        location = (warrior.overrides.get('data.location') or
+                    warrior.config.get('data.location'))
+        return os.path.expanduser(location)
+
+    def data_version(self, location):
+        """
+        Returns the modification times of the data files in the given
+        location. Data files are checked at most once per evaluation round.
+        """
+
+        if self.checked_tick.get(location) != self.context.tick:
+            version = []
+
+            for filename in DATA_FILES:
+                try:
+                    stat = os.stat(os.path.join(location, filename))
+                    version.append((stat.st_mtime, stat.st_size))
+                except OSError:
+                    version.append(None)
+
+            self.versions[location] = tuple(version)
+            self.checked_tick[location] = self.context.tick
+
+        return self.versions[location]
+
+    def period(self, rawfilter, taskfilter):
+        """
+        Returns the period of time the results of the filter are valid for.
+        """
+
+        clock = self.context.clock
+        # Attribute modifiers are given as i.e. due__before in taskfilter
+        filters = ' '.join(map(unicode, list(rawfilter) + list(taskfilter) +
+                               list(taskfilter.values()))).replace('_', ' ')
+
+        if TIME_RELATIVE.search(filters):
+            return clock.today, clock.minute_of_day
+
+        return clock.today, None
+
+    def filter(self, options=None, rawfilter=None, taskfilter=None):
+        """
+        Returns the TaskQuerySet of the tasks matching the given filters.
+        The query set is evaluated already, and shared by all the callers
+        until the results are invalidated.
+        """
+
+        options = options or dict()
+        rawfilter = rawfilter or tuple()
+        taskfilter = taskfilter or dict()
+
+        warrior = self.warrior(options)
+        location = self.data_location(warrior)
+        version = self.data_version(location)
+
+        version = (version, self.period(rawfilter, taskfilter))
+
+        key = (location, canonicalize(options),
+               canonicalize(rawfilter), canonicalize(taskfilter))
+        cached = self.results.get(key)
+
+        if cached is not None and cached[0] == version:
+            self.hits += 1
+            return cached[1]
+
+        self.misses += 1
+        tasks = warrior.tasks.filter(*rawfilter, **taskfilter)
+
+        # Evaluate the query set now, it keeps the results afterwards
+        len(tasks)
+        self.results[key] = (version, tasks)
+
+        return tasks
+
+    def invalidate(self):
+        """
+        Drops all the cached results.
+        """
+
+        self.results.clear()
+
+    def counters(self):
+        return {
+            'taskwarrior_cache_hits': self.hits,
+            'taskwarrior_cache_misses': self.misses,
+        }
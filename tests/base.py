@@ -1,6 +1,8 @@
 import importlib
 from unittest import TestCase
 
+from util import CLOCK, IntervalIndex
+
 class FakePluginCache(object):
 
     def __init__(self):
@@ -26,6 +28,20 @@ class MockContext(object):
         self.reporters = FakePluginCache()
         self.checkers = FakePluginCache()
         self.fixers = FakePluginCache()
+        self.tick = 0
+        self.clock = CLOCK
+        self.clock.update()
+        self.backends = {}
+        self.intervals = IntervalIndex()
+
+    def backend(self, backend_class):
+        if backend_class not in self.backends:
+            self.backends[backend_class] = backend_class(self)
+        return self.backends[backend_class]
+
+    def flush(self):
+        for backend in self.backends.values():
+            backend.flush()
 
 
 class PluginTestCase(TestCase):
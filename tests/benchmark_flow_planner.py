@@ -0,0 +1,92 @@
+"""
+Compares the flow planner with the iterative loop it replaced, on flows of
+10 to 1,000 activities with a time limit of half of their total duration.
+
+Run from the repository root:
+
+    python -m tests.benchmark_flow_planner
+"""
+
+import random
+import timeit
+
+from activities import ActivitySpec
+from flow_planner import plan_shrinkings
+
+SIZES = (10, 100, 1000)
+REPEAT = 5
+
+# The loop below does not always converge, stop it eventually
+MAX_ITERATIONS = 10000
+
+
+def iterative_plan(activities, time_limit):
+    """
+    The former Flow.generate_plan. Returns the planned activities and the
+    number of iterations.
+    """
+
+    planned_activities = [ActivitySpec(*a) for a in activities]
+
+    for iteration in range(MAX_ITERATIONS):
+        planned_activities = [a for a in planned_activities
+                              if not a.skipped]
+        time_required = sum([a.duration * a.shrinking
+                             for a in planned_activities])
+
+        if time_required == 0:
+            raise Exception("Not enough time to initialize the flow.")
+
+        time_deficit = time_required - time_limit
+
+        if abs(time_deficit) <= 0.005:
+            break
+
+        something_shrinked = False
+        shrink_factor = 1 - (float(time_deficit) / time_required)
+
+        for activity in planned_activities:
+            proposed_shrinking = activity.shrinking * shrink_factor
+
+            if proposed_shrinking >= activity.max_shrinking:
+                activity.shrinking = proposed_shrinking
+                something_shrinked = True
+
+        if not something_shrinked:
+            activity = min(planned_activities,
+                           key=lambda a: (a.priority, a.max_shrinking))
+            activity.skipped = True
+
+    return planned_activities, iteration + 1
+
+
+def generate_flow(size, seed=0):
+    rng = random.Random(seed)
+    return [('activity%d' % index, rng.randint(5, 60),
+             rng.choice((0.3, 0.5, 0.7, 0.9)), rng.randint(1, 5))
+            for index in range(size)]
+
+
+def best_time(function):
+    return min(timeit.repeat(function, number=1, repeat=REPEAT))
+
+
+def main():
+    print("{0:>10} {1:>12} {2:>12} {3:>11} {4:>9}".format(
+        "activities", "loop [ms]", "planner [ms]", "iterations", "speedup"))
+
+    for size in SIZES:
+        activities = generate_flow(size)
+        time_limit = sum(a[1] for a in activities) / 2.0
+        specs = [a[1:] for a in activities]
+
+        _, iterations = iterative_plan(activities, time_limit)
+        loop = best_time(lambda: iterative_plan(activities, time_limit))
+        planner = best_time(lambda: plan_shrinkings(specs, time_limit))
+
+        print("{0:>10} {1:>12.3f} {2:>12.3f} {3:>11} {4:>8.1f}x".format(
+            size, loop * 1000, planner * 1000, iterations, loop / planner))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+import threading
+from unittest import TestCase
+
+from action_queue import ActionQueue
+from decisions import DecisionTrace
+from plugins import Fixer, PluginCache
+from tests.base import MockContext
+
+import fixers.set_activity  # pylint: disable=unused-import
+
+
+class ActionQueueTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.context.rule = None
+        self.context.trace = DecisionTrace()
+        self.context.actions = ActionQueue(self.context)
+        self.context.fixers = PluginCache(Fixer, self.context)
+
+        calls = self.calls = []
+        state = self.state = {'locked': False}
+
+        class LockFixer(Fixer):
+            identifier = 'test_lock'
+            deferred = True
+
+            def idempotency_key(self):
+                return state['locked']
+
+            def run(self):
+                calls.append('lock')
+                state['locked'] = True
+
+        class PingFixer(Fixer):
+            identifier = 'test_ping'
+            deferred = True
+            parallel_safe = True
+
+            def run(self, host):
+                calls.append(host)
+
+        class EchoFixer(Fixer):
+            identifier = 'test_echo'
+
+            def run(self, value):
+                calls.append(value)
+                return value
+
+    def tearDown(self):
+        Fixer.plugins.remove_module(__name__)
+
+    def fix(self, identifier, **kwargs):
+        return self.context.fixers.get(identifier, (), kwargs)
+
+    def test_deferred_and_merged(self):
+        self.fix('test_ping', host='a')
+        self.fix('test_ping', host='a')
+        self.fix('test_ping', host='b')
+        self.fix('test_ping', host='c')
+
+        assert self.calls == []
+
+        self.context.actions.run()
+        assert sorted(self.calls) == ['a', 'b', 'c']
+        assert self.context.actions.merged == 1
+
+        records = self.context.trace.since(60)
+        assert [record[3] for record in records] == ['test_ping'] * 3
+
+    def test_not_deferred_by_default(self):
+        assert self.fix('test_echo', value=42) == 42
+        assert self.calls == [42]
+        assert not self.context.actions.pending
+
+    def test_timew_requests_merged(self):
+        for rule in ('FirstRule', 'SecondRule'):
+            self.context.rule = rule
+            assert self.fix('set_timew_activity', activity='work') is None
+
+        assert len(self.context.actions.pending) == 1
+        assert self.context.actions.merged == 1
+
+    def test_idempotency(self):
+        self.fix('test_lock')
+        self.context.actions.run()
+        assert self.calls == ['lock']
+
+        # The key observed after locking differs from the applied one
+        self.fix('test_lock')
+        self.context.actions.run()
+        assert self.calls == ['lock', 'lock']
+
+        # Same state as when last applied, hence suppressed
+        self.fix('test_lock')
+        self.context.actions.run()
+        assert self.calls == ['lock', 'lock']
+        assert self.context.actions.suppressed == 1
+
+        # Unlocked, the state changed
+        self.state['locked'] = False
+        self.fix('test_lock')
+        self.context.actions.run()
+        assert self.calls == ['lock', 'lock', 'lock']
+
+    def test_enqueue_from_other_thread(self):
+        errors = []
+
+        def enqueue():
+            try:
+                self.context.actions.enqueue('test_ping', 'test_ping', (), {})
+            except RuntimeError as exc:
+                errors.append(exc)
+
+        thread = threading.Thread(target=enqueue)
+        thread.start()
+        thread.join()
+
+        assert len(errors) == 1
+        assert not self.context.actions.pending
+
@@ -1,5 +1,15 @@
-from tests.base import CheckerTestCase
+import datetime
+import shutil
+import tempfile
 
+from unittest import TestCase
+
+from tests.base import CheckerTestCase, MockContext
+
+from cost_backend import CostBackend, check
+from decisions import DecisionTrace
+from plugins import Checker, PluginCache, Reporter
+from track_backend import TrackBackend
 from util import convert_timestamp
 
 
@@ -13,6 +23,29 @@ class RegularExpressionCheckerTest(CheckerTestCase):
         assert self.plugin.run(regexp='ratata', string="nasty ratata") == True
 
 
+class RegularExpressionSetCheckerTest(CheckerTestCase):
+    class_name = 'RegularExpressionSetChecker'
+    module_name = 'regular_expression'
+
+    def test_regular_expression_set_checker(self):
+        regexps = ('Firefox', 'Fire', 'fox$', 'reddit', r'(o)\1', '(?i)MOZILLA')
+        assert self.plugin.run(regexps, "Mozilla Firefox") == [
+            'Firefox', 'Fire', 'fox$', '(?i)MOZILLA']
+        assert self.plugin.run(regexps, "Chromium") == []
+        assert self.plugin.run(regexps, "Good food") == [r'(o)\1']
+
+    def test_conditional_group_references(self):
+        # In a combined pattern, group 1 would refer to another pattern
+        regexps = ('Fire', r'^(<)?fox(?(1)>)$')
+        assert self.plugin.run(regexps, "<fox>") == [r'^(<)?fox(?(1)>)$']
+        assert self.plugin.run(regexps, "<fox") == []
+
+    def test_many_regular_expressions(self):
+        regexps = tuple('site{0}'.format(number) for number in range(500))
+        assert self.plugin.run(regexps, "site42 and site420") == [
+            'site4', 'site42', 'site420']
+
+
 class TimeIntervalCheckerTest(CheckerTestCase):
     class_name = 'TimeIntervalChecker'
     module_name = 'time_interval'
@@ -54,3 +87,115 @@ class TimeIntervalCheckerTest(CheckerTestCase):
 
         self.context.reporters['time'] = convert_timestamp('09.00')
         assert self.plugin.run(start='18.00', end='05.00') == False
+
+    def test_time_interval_boundaries(self):
+        self.context.reporters['time'] = convert_timestamp('09.00')
+        self.plugin.run(start='18.00', end='05.00')
+        self.plugin.run(start='12.00', end='12.30')
+
+        intervals = self.context.intervals
+        assert (intervals.next_boundary(convert_timestamp('09.00')) ==
+                convert_timestamp('12.00'))
+        assert (intervals.next_boundary(convert_timestamp('12.00')) ==
+                convert_timestamp('12.30'))
+        assert (intervals.next_boundary(convert_timestamp('20.00')) ==
+                convert_timestamp('05.00') + datetime.timedelta(days=1))
+
+
+class TrackedAverageCheckerTest(CheckerTestCase):
+    class_name = 'TrackedAverageChecker'
+    module_name = 'tracked'
+
+    def setUp(self):
+        super(TrackedAverageCheckerTest, self).setUp()
+
+        self.directory = tempfile.mkdtemp()
+        self.tracks = self.context.backend(TrackBackend)
+        self.tracks.directory = self.directory
+
+        today = datetime.date.today()
+        for days_ago, value in enumerate([2, 2, 3, 5]):
+            day = today - datetime.timedelta(days=days_ago)
+            self.tracks.record('mood', day.isoformat(), value)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_tracked_average_checker(self):
+        assert self.plugin.run('mood', days=3, below=3) == True
+        assert self.plugin.run('mood', days=4, below=3) == False
+        assert self.plugin.run('mood', days=4, above=2) == True
+        assert self.plugin.run('sleep', days=4, below=3) == False
+
+    def test_new_record_considered(self):
+        assert self.plugin.run('mood', days=1, below=3) == True
+
+        today = datetime.date.today().isoformat()
+        self.tracks.record('mood', today + " 20.00", 4)
+
+        assert self.plugin.run('mood', days=1, below=3) == False
+
+
+class AllOfCheckerTest(CheckerTestCase):
+    class_name = 'AllOfChecker'
+    module_name = 'combinators'
+
+    def setUp(self):
+        super(AllOfCheckerTest, self).setUp()
+
+        self.calls = []
+        checkers = self.context.checkers
+
+        def get(identifier, args, kwargs):
+            self.calls.append(identifier)
+            return checkers.store.get(identifier)
+
+        self.context.checkers.get = get
+
+    def test_short_circuit_ordering(self):
+        self.context.checkers['expensive'] = True
+        self.context.checkers['cheap'] = False
+        operands = (check('expensive'), check('cheap'))
+
+        assert self.plugin.run(*operands) == False
+        assert self.calls == ['expensive', 'cheap']
+
+        # Cheap operand is measured as decisive, hence evaluated first
+        backend = self.context.backend(CostBackend)
+        backend.stats[check('expensive')][0] = 1.0
+        backend.stats[check('cheap')][0] = 0.001
+
+        self.context.tick += 1
+        self.calls = []
+        assert self.plugin.run(*operands) == False
+        assert self.calls == ['cheap']
+        assert backend.skipped == 1
+
+        self.context.checkers['cheap'] = True
+        self.context.tick += 1
+        self.calls = []
+        assert self.plugin.run(*operands) == True
+        assert self.calls == ['cheap', 'expensive']
+
+
+class PollingTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.context.rule = None
+        self.context.trace = DecisionTrace()
+        self.context.polled = False
+        self.context.reporters = PluginCache(Reporter, self.context)
+        self.context.checkers = PluginCache(Checker, self.context)
+
+    def test_time_based_checks(self):
+        checkers = self.context.checkers
+        checkers.get('not', (check('time_interval', '9.00', '17.00'),))
+        self.context.reporters.get('weekday')
+
+        # Results change only at the boundaries, midnight included
+        assert not self.context.polled
+        assert 0 in self.context.intervals.boundaries
+
+        checkers.get('regular_expression', ('steam', 'Steam'))
+        assert self.context.polled
@@ -0,0 +1,72 @@
+import time
+from unittest import TestCase
+
+from decisions import DecisionTrace, CHECKER
+
+
+class DecisionTraceTest(TestCase):
+
+    def setUp(self):
+        self.trace = DecisionTrace()
+
+    def lines(self):
+        return [self.trace.format(record) for record in self.trace.since(60)]
+
+    def test_records_formatted(self):
+        self.trace.rules(['NoGamesRule'])
+        self.trace.checker('NoGamesRule', 'regular_expression', (),
+                           dict(regexp='steam', string='Steam'), False)
+
+        lines = self.lines()
+        assert lines[0].endswith("rule NoGamesRule active")
+        assert lines[1].endswith("NoGamesRule: checker regular_expression"
+                                 "(regexp='steam', string='Steam') -> False")
+
+    def test_rule_transitions(self):
+        self.trace.rules(['First', 'Second'])
+        self.trace.rules(['First', 'Second'])
+        self.trace.rules(['Second'])
+
+        assert [line[9:] for line in self.lines()] == [
+            'rule First active', 'rule Second active', 'rule First inactive']
+
+    def test_checker_transitions(self):
+        for result in (False, False, True, True, False):
+            self.trace.start_round()
+            self.trace.checker('Rule', 'check', ('a',), {}, result)
+
+        assert [record[5] for record in self.trace.records] == [
+            'False', 'True', 'False']
+
+        # Results are compared only with the previous round
+        self.trace.start_round()
+        self.trace.start_round()
+        self.trace.checker('Rule', 'check', ('a',), {}, False)
+        assert len(self.trace.records) == 4
+
+        # Results of unhashable arguments cannot be compared
+        self.trace.checker('Rule', 'check', ([],), {}, False)
+        self.trace.checker('Rule', 'check', ([],), {}, False)
+        assert len(self.trace.records) == 6
+
+    def test_bounded(self):
+        for number in range(DecisionTrace.MAX_RECORDS + 10):
+            self.trace.record('Rule', CHECKER, 'check', (number,),
+                              result='x' * 1000)
+
+        assert len(self.trace.records) == DecisionTrace.MAX_RECORDS
+        assert self.trace.records[0][4] == '10'
+        assert len(self.trace.records[0][5]) == DecisionTrace.MAX_VALUE_LENGTH
+        assert self.trace.dropped == 10
+
+    def test_incomplete_report(self):
+        self.trace.timestamp = time.time() - 30
+        self.trace.record('Rule', CHECKER, 'check', result=True)
+        assert len(self.trace.report(60)) == 1
+
+        # The requested window is older than the oldest kept record
+        self.trace.dropped = 1
+        lines = self.trace.report(60)
+        assert len(lines) == 2
+        assert lines[0].startswith("Records older than")
+        assert len(self.trace.report(10)) == 0
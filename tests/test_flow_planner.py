@@ -0,0 +1,78 @@
+from unittest import TestCase
+
+from activities import Flow
+from flow_planner import FlowPlanner, plan_shrinkings
+from tests.base import MockContext
+
+
+class PlanShrinkingsTest(TestCase):
+
+    def test_common_factor(self):
+        shrinkings = plan_shrinkings([(10, 0.5, 1), (30, 0.5, 1)], 20)
+        assert shrinkings == [0.5, 0.5]
+
+        # Spare time prolongs the activities
+        shrinkings = plan_shrinkings([(10, 0.5, 1), (30, 0.5, 1)], 60)
+        assert shrinkings == [1.5, 1.5]
+
+    def test_max_shrinking(self):
+        # The first activity can only be shrunk to 80%, the rest of the
+        # deficit is taken from the second
+        shrinkings = plan_shrinkings([(10, 0.8, 1), (10, 0.2, 1)], 12)
+        assert shrinkings[0] == 0.8
+        assert abs(shrinkings[1] - 0.4) < 1e-9
+
+    def test_skipping(self):
+        activities = [(10, 0.9, 2), (10, 0.9, 1), (10, 0.5, 1)]
+
+        # The lowest priority activity with the lowest max shrinking is
+        # skipped first
+        shrinkings = plan_shrinkings(activities, 19)
+        assert shrinkings[2] is None
+        assert abs(sum(d * s for (d, _, _), s in
+                       zip(activities, shrinkings) if s) - 19) < 1e-9
+
+        shrinkings = plan_shrinkings(activities, 9)
+        assert shrinkings == [0.9, None, None]
+
+        self.assertRaises(Exception, plan_shrinkings, activities, 5)
+
+
+class FlowTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.started = started = []
+        self.context.set_activity = lambda i, d: started.append((i, d))
+        self.context.unset_flow = lambda: started.append(None)
+
+        class TestFlow(Flow):
+            identifier = 'test_flow'
+            activities = (('work', 40, 0.5, 2),
+                          ('mail', 10, 0.9, 1),
+                          ('break', 10, 0.8, 2))
+
+        self.flow_class = TestFlow
+
+    def tearDown(self):
+        Flow.plugins.remove_module(__name__)
+
+    def test_plan(self):
+        flow = self.flow_class(self.context, time_limit=30)
+        assert [a.identifier for a in flow.plan] == ['work', 'break']
+
+        # Skipped activities are not started
+        for _ in range(3):
+            flow.start_next_activity()
+
+        assert [i for i, _ in self.started[:2]] == ['work', 'break']
+        assert self.started[2] is None
+
+        # The plan is cached
+        self.flow_class(self.context, time_limit=30)
+        planner = self.context.backend(FlowPlanner)
+        assert (planner.hits, planner.misses) == (1, 1)
+
+    def test_unlimited(self):
+        flow = self.flow_class(self.context)
+        assert [a.planned_duration for a in flow.plan] == [40, 10, 10]
@@ -0,0 +1,85 @@
+import logging
+import threading
+from unittest import TestCase
+
+from logger import LoggerMixin, LogWriter, QueueHandler
+
+
+class BlockingHandler(logging.Handler):
+    """
+    Collects the messages, blocking the writer until it is released.
+    """
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def emit(self, record):
+        self.started.set()
+        self.released.wait(5)
+        self.messages.append(self.format(record))
+
+
+class SmallLogWriter(LogWriter):
+    QUEUE_SIZE = 2
+
+
+class LoggerTest(TestCase):
+
+    def setUp(self):
+        self.handler = BlockingHandler()
+        self.writer = SmallLogWriter([self.handler])
+
+        self.logger = logging.getLogger('actor-tests')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.queue_handler = QueueHandler(self.writer)
+        self.logger.addHandler(self.queue_handler)
+
+    def tearDown(self):
+        self.handler.released.set()
+        self.writer.stop()
+        self.logger.removeHandler(self.queue_handler)
+
+    def test_formatted_when_queued(self):
+        value = {'state': 'before'}
+        self.logger.info("Value: %s", value)
+        value['state'] = 'after'
+
+        self.handler.released.set()
+        self.writer.stop()
+
+        assert self.handler.messages == ["Value: {'state': 'before'}"]
+
+    def test_dropped_when_full(self):
+        self.logger.info("first")
+        assert self.handler.started.wait(5)
+
+        # The writer is blocked, the queue takes two records
+        for number in range(4):
+            self.logger.info("record %d", number)
+
+        assert self.writer.dropped == 2
+
+        self.handler.released.set()
+        self.writer.stop()
+
+        assert self.handler.messages == [
+            "first", "record 0", "record 1",
+            "LogWriter: 2 log records were dropped",
+        ]
+
+    def test_fields(self):
+        class Source(LoggerMixin):
+            logger = self.logger
+
+        Source().debug("Result: %s", 42, plugin='time', duration=0.0012)
+
+        self.handler.released.set()
+        self.writer.stop()
+
+        assert self.handler.messages == [
+            "Source: Result: 42 [duration=0.0012 plugin=time]"
+        ]
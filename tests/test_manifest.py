@@ -0,0 +1,22 @@
+from unittest import TestCase
+
+from manifest import PluginManifest
+
+
+class PluginManifestTest(TestCase):
+
+    def setUp(self):
+        self.manifest = PluginManifest()
+
+    def test_index(self):
+        assert self.manifest.index[('reporters', 'time')] == 'time'
+        assert self.manifest.index[('reporters', 'weekday')] == 'time'
+        assert self.manifest.index[('checkers', 'time_interval')] == 'time_interval'
+        assert ('fixers', 'time') not in self.manifest.index
+
+    def test_load(self):
+        assert self.manifest.load('checkers', 'time_interval')
+        assert 'checkers.time_interval' in self.manifest.import_times
+
+        # Modules are imported only once
+        assert not self.manifest.load('checkers', 'time_interval')
@@ -0,0 +1,111 @@
+from unittest import TestCase
+
+from notification_backend import NotificationBackend
+from tests.base import MockContext
+
+
+class FakeNotifications(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def Notify(self, app_name, replaces_id, app_icon, headline, message,
+               actions, hints, timeout, reply_handler, error_handler):
+        self.calls.append((replaces_id, headline, message))
+        reply_handler(len(self.calls) + 100)
+
+
+class FailingNotifications(object):
+
+    def Notify(self, *args, **kwargs):
+        kwargs['error_handler'](Exception('server restarted'))
+
+
+class FakeBus(object):
+
+    def __init__(self):
+        self.receivers = []
+
+    def add_signal_receiver(self, handler, **kwargs):
+        self.receivers.append((handler, kwargs['signal_name']))
+
+
+class OfflineNotificationBackend(NotificationBackend):
+    """
+    Never connects to the session bus, hence the tests do not depend on the
+    notification daemon running.
+    """
+
+    def initialize_interface(self):
+        self.interface = None
+
+
+class NotificationBackendTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.backend = OfflineNotificationBackend(self.context)
+        assert not self.backend.subscribed
+        self.backend.interface = self.interface = FakeNotifications()
+
+    def notify(self, message, headline='Actor', rule=None):
+        self.backend.notify(message, headline, 'Actor', '', 0, rule=rule)
+
+    def test_coalescing(self):
+        self.notify('first', rule='Rule')
+        self.notify('second', rule='Rule')
+        self.notify('other', rule='Other')
+        self.backend.flush()
+
+        assert self.interface.calls == [(0, 'Actor', 'second'),
+                                        (0, 'Actor', 'other')]
+        assert self.backend.coalesced == 1
+
+        # Updates replace the notification shown for the same rule
+        self.notify('third', rule='Rule')
+        self.backend.flush()
+        assert self.interface.calls[-1] == (101, 'Actor', 'third')
+
+        # Unchanged messages are not repeated
+        self.notify('third', rule='Rule')
+        self.backend.flush()
+        assert len(self.interface.calls) == 3
+        assert self.backend.repeated == 1
+
+    def test_rate_limit(self):
+        for number in range(NotificationBackend.MAX_BURST + 2):
+            self.notify('message', headline=str(number))
+
+        self.backend.flush()
+        assert len(self.interface.calls) == NotificationBackend.MAX_BURST
+        assert len(self.backend.pending) == 2
+
+        # The pending messages are sent once the limit allows
+        self.context.clock.monotonic += 20
+        self.backend.flush()
+        assert len(self.interface.calls) == NotificationBackend.MAX_BURST + 2
+
+    def test_subscribed_once(self):
+        bus = FakeBus()
+        interfaces = [FakeNotifications(), FailingNotifications()]
+
+        def initialize_interface():
+            self.backend.bus = bus
+            self.backend.interface = interfaces.pop()
+
+        self.backend.interface = None
+        self.backend.initialize_interface = initialize_interface
+
+        # The interface is reset after the failure, and set up again
+        self.notify('first')
+        self.backend.flush()
+        assert self.backend.interface is None and self.backend.failed == 1
+
+        self.notify('second')
+        self.backend.flush()
+        assert self.backend.interface is not None
+
+        assert bus.receivers == [(self.backend.closed, 'NotificationClosed')]
+
+    def tearDown(self):
+        self.context.clock.update()
@@ -0,0 +1,102 @@
+from unittest import TestCase
+
+from pidgin_backend import (PidginBackend, PURPLE_CONV_TYPE_IM,
+                            PURPLE_CONV_UPDATE_TITLE)
+from tests.base import MockContext
+
+
+class FakePurple(object):
+
+    def __init__(self, conversations):
+        self.conversations = conversations
+        self.calls = 0
+
+    def PurpleGetIms(self):
+        self.calls += 1
+        return list(self.conversations)
+
+    def PurpleConversationGetType(self, conv):
+        self.calls += 1
+        return PURPLE_CONV_TYPE_IM
+
+    def PurpleConversationGetName(self, conv):
+        self.calls += 1
+        return self.conversations[conv]
+
+    def PurpleConversationGetAccount(self, conv):
+        self.calls += 1
+        return 1
+
+    def PurpleNormalize(self, account, name):
+        # Drops the XMPP resource, as the jabber protocol does
+        self.calls += 1
+        return name.split('/', 1)[0].lower()
+
+
+class PidginBackendTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.backend = PidginBackend(self.context)
+        self.backend.interface = self.purple = FakePurple({1: u'alice'})
+
+    def test_served_from_signals(self):
+        assert self.backend.senders() == [u'alice']
+        assert self.purple.calls == 2
+
+        # Queries do not call libpurple again
+        assert self.backend.senders() == [u'alice']
+        assert self.purple.calls == 2
+
+        self.backend.received(1, u'alice', u'hi', 1, 0)
+        self.backend.received(1, u'alice', u'there', 1, 0)
+        assert self.backend.unread_counts() == {u'alice': 2}
+
+        # First message of a new conversation, created afterwards
+        self.backend.received(1, u'bob', u'hello', 0, 0)
+        assert self.backend.senders() == [u'alice', u'bob']
+
+        self.purple.conversations[2] = u'bob'
+        self.backend.updated(2, 4)
+        assert self.backend.unread_counts() == {u'alice': 2, u'bob': 1}
+
+        # Known conversations are looked up only when renamed
+        calls = self.purple.calls
+        self.backend.updated(2, 4)
+        assert self.purple.calls == calls
+
+        self.purple.conversations[2] = u'Bob'
+        self.backend.updated(2, PURPLE_CONV_UPDATE_TITLE)
+        assert self.backend.senders() == [u'alice', u'Bob']
+
+        self.backend.deleting(1)
+        assert self.backend.senders() == [u'Bob']
+        assert self.backend.resyncs == 1
+
+    def test_sender_normalized(self):
+        self.backend.senders()
+
+        self.backend.received(1, u'Carol@example.org/laptop', u'hi', 0, 0)
+        self.backend.received(1, u'carol@example.org/phone', u'hi', 0, 0)
+        assert self.backend.unread_counts() == {u'alice': 0,
+                                                u'carol@example.org': 2}
+
+        # The pending messages are claimed by the created conversation
+        self.purple.conversations[2] = u'carol@example.org'
+        self.backend.updated(2, 4)
+        assert self.backend.pending == {}
+        assert self.backend.senders() == [u'alice', u'carol@example.org']
+        assert self.backend.unread_counts() == {u'alice': 0,
+                                                u'carol@example.org': 2}
+
+    def test_resync_on_reconnect(self):
+        self.backend.senders()
+        self.backend.owner_changed(PidginBackend.bus_name, ':1.1', '')
+        assert self.backend.conversations == {}
+
+        # Reconnected, the conversations are fetched again
+        self.backend.interface = self.purple
+        self.backend.received(1, u'alice', u'hi', 1, 0)
+        assert self.backend.senders() == [u'alice']
+        assert self.backend.unread_counts() == {u'alice': 0}
+        assert self.backend.resyncs == 2
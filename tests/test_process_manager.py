@@ -0,0 +1,153 @@
+import time
+from unittest import TestCase
+
+import gobject
+
+from process_manager import ProcessManager, Process
+from util import run
+
+
+def iterate_until(condition, timeout=5):
+    """
+    Runs the iterations of the main loop until the condition holds.
+    """
+
+    context = gobject.main_context_default()
+    deadline = time.time() + timeout
+
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not met in %s s" % timeout)
+        context.iteration(False)
+
+
+class ProcessManagerTest(TestCase):
+
+    def setUp(self):
+        self.manager = ProcessManager()
+
+    def test_run(self):
+        stdout, stderr, code = self.manager.run(
+            ['sh', '-c', 'echo out; echo err >&2; exit 3'])
+
+        assert (stdout, stderr, code) == ('out\n', 'err\n', 3)
+        assert self.manager.spawned == 1
+        assert self.manager.completed == 1
+
+    def test_run_timeout(self):
+        stdout, _, code = self.manager.run(['sh', '-c', 'echo a; sleep 10'],
+                                           timeout=0.2)
+
+        assert stdout == 'a\n'
+        assert code == -9
+        assert self.manager.timeouts == 1
+        assert self.manager.max_run_time < 5
+
+    def test_zero_timeout(self):
+        # An explicit zero timeout is not replaced by the default one
+        start = time.time()
+        assert run(['sleep', '10'], timeout=0)[2] == -9
+        assert time.time() - start < 5
+
+    def test_concurrency_cap(self):
+        self.manager.MAX_RUNNING = 0
+        process = self.manager.spawn(['true'])
+
+        assert isinstance(process, Process)
+        assert process.pid is None
+        assert list(self.manager.queue) == [process]
+
+    def test_spawn(self):
+        results = []
+        process = self.manager.spawn(
+            ['sh', '-c', 'echo out; echo err >&2; exit 3'],
+            callback=lambda *result: results.append(result))
+
+        assert self.manager.running == {process.pid: process}
+
+        # The child is reaped by the main loop
+        iterate_until(lambda: results)
+
+        assert results == [(3, 'out\n', 'err\n')]
+        assert process.returncode == 3
+        assert self.manager.running == {}
+        assert self.manager.completed == 1
+
+    def test_output_streaming(self):
+        chunks, results = [], []
+        self.manager.spawn(
+            ['sh', '-c', 'echo a; sleep 0.2; echo b'],
+            callback=lambda *result: results.append(result),
+            output=lambda name, data: chunks.append((name, data)))
+
+        # The output arrives before the command exits
+        iterate_until(lambda: chunks)
+        assert chunks == [('stdout', 'a\n')]
+        assert not results
+
+        iterate_until(lambda: results)
+        assert ''.join(data for _, data in chunks) == 'a\nb\n'
+
+    def test_spawn_timeout(self):
+        results = []
+        process = self.manager.spawn(
+            ['sleep', '10'], timeout=0.2,
+            callback=lambda *result: results.append(result))
+
+        iterate_until(lambda: results)
+
+        assert results[0][0] == -9
+        assert process.timed_out
+        assert self.manager.timeouts == 1
+
+    def test_queued_processes_started(self):
+        self.manager.MAX_RUNNING = 1
+        results = []
+
+        first = self.manager.spawn(['true'],
+                                   callback=lambda *r: results.append(1))
+        second = self.manager.spawn(['true'],
+                                    callback=lambda *r: results.append(2))
+
+        assert first.pid is not None
+        assert second.pid is None
+
+        # The queued process is started once the first one exits
+        iterate_until(lambda: len(results) == 2)
+
+        assert results == [1, 2]
+        assert second.returncode == 0
+        assert not self.manager.queue
+        assert self.manager.queued == 1
+
+    def test_output_not_kept_without_callback(self):
+        process = self.manager.spawn(['echo', 'unread'])
+        iterate_until(lambda: process.returncode is not None)
+
+        assert process.buffers == {'stdout': [], 'stderr': []}
+
+    def test_output_capped(self):
+        results = []
+        process = self.manager.spawn(
+            ['sh', '-c', 'echo 0123456789'],
+            callback=lambda *result: results.append(result))
+        process.MAX_OUTPUT = 4
+
+        iterate_until(lambda: results)
+        assert results == [(0, '0123', '')]
+
+    def test_detach(self):
+        self.manager.MAX_RUNNING = 0
+        process = self.manager.detach(['sh', '-c', 'exit 2'])
+
+        # Not piped, nor limited by MAX_RUNNING
+        assert process.child.stdout is None
+        assert self.manager.detached == {process.pid: process}
+        assert not self.manager.queue
+
+        iterate_until(lambda: not self.manager.detached)
+        assert process.returncode == 2
+
+    def test_detach_failure(self):
+        assert self.manager.detach(['/nonexistent/command']) is None
+        assert self.manager.spawn_failures == 1
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from plugins import Rule
+from reloader import RuleReloader
+
+RULE_FILE = """
+from plugins import Rule
+
+class ReloadedRule(Rule):
+    identifier = 'reloaded'
+    value = {0}
+"""
+
+
+class RuleReloaderTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'reloaded_rules.py')
+        self.reloader = RuleReloader(self.directory)
+
+    def tearDown(self):
+        Rule.plugins.remove_module('reloaded_rules')
+        shutil.rmtree(self.directory)
+
+    def write(self, content):
+        with open(self.path, 'w') as fil:
+            fil.write(content)
+
+        # Make sure the change is visible to the polling fallback as well
+        os.utime(self.path, (0, len(content)))
+
+    def rules(self):
+        return [rule for rule in Rule.plugins
+                if rule.__module__ == 'reloaded_rules']
+
+    def test_reload(self):
+        self.write(RULE_FILE.format(1))
+        self.reloader.changed_files()
+        assert self.reloader.load(self.path)
+        assert [rule.value for rule in self.rules()] == [1]
+
+        assert self.reloader.changed_files() == []
+
+        self.write(RULE_FILE.format(22))
+        assert self.reloader.changed_files() == [self.path]
+        assert self.reloader.load(self.path)
+        assert [rule.value for rule in self.rules()] == [22]
+
+        os.remove(self.path)
+        assert self.reloader.changed_files() == [self.path]
+        assert self.reloader.load(self.path)
+        assert self.rules() == []
+
+    def test_broken_file_keeps_rules(self):
+        self.write(RULE_FILE.format(1))
+        assert self.reloader.load(self.path)
+
+        self.write(RULE_FILE.format('1 +'))
+        assert not self.reloader.load(self.path)
+        assert [rule.value for rule in self.rules()] == [1]
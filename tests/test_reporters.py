@@ -1,13 +1,19 @@
 import datetime
 import subprocess
 import tempfile
+import time
 import os
+import shutil
 import dbus.mainloop.glib
 
 from tests.base import ReporterTestCase
+from file_backend import FileBackend
+from inotify import InotifyError
+from reporters.file_content import FileLinesReporter
 from util import run
 from time import sleep
 from tasklib import TaskWarrior, Task
+from taskwarrior_backend import TaskWarriorBackend
 
 
 class TimeReporterTest(ReporterTestCase):
@@ -177,6 +183,72 @@ class FileContentReporterTest(ReporterTestCase):
         assert "bbb" in file_content
         assert "ccc" in file_content
 
+    def test_file_content_modified(self):
+        self.plugin.run(path=self.tempfile.name)
+
+        self.tempfile.write("ddd\n")
+        self.tempfile.flush()
+        self.context.tick += 1
+
+        assert "ddd" in self.plugin.run(path=self.tempfile.name)
+
+    def test_file_lines_reporter(self):
+        plugin = FileLinesReporter(self.context)
+        assert plugin.run(path=self.tempfile.name, start=-2) == ['bbb', 'ccc']
+        assert plugin.run(path=self.tempfile.name, start=0, end=1) == ['aaa']
+
+    def test_truncated_in_place(self):
+        backend = self.context.backend(FileBackend)
+
+        assert "ccc" in self.plugin.run(path=self.tempfile.name)
+        self.plugin.run(path=self.tempfile.name)
+        assert backend.reads == 1
+
+        # Truncated in place, i.e. by logrotate's copytruncate
+        self.tempfile.truncate(0)
+        self.tempfile.seek(0)
+        self.tempfile.write("x\n")
+        self.tempfile.flush()
+        self.context.tick += 1
+
+        assert self.plugin.run(path=self.tempfile.name) == "x\n"
+        assert backend.reads == 2
+
+    def test_unwatchable_directory(self):
+        backend = self.context.backend(FileBackend)
+        attempts = []
+
+        def add_watch(directory):
+            attempts.append(directory)
+            raise InotifyError("No space left on device")
+
+        backend.inotify = FakeInotify()
+        backend.inotify.add_watch = add_watch
+
+        # The failed watch is not retried on every access
+        assert "ccc" in self.plugin.run(path=self.tempfile.name)
+        assert "ccc" in self.plugin.run(path=self.tempfile.name)
+        assert len(attempts) == 1
+
+        # The file is polled instead
+        self.tempfile.write("ddd\n")
+        self.tempfile.flush()
+        os.utime(self.tempfile.name, (0, 0))
+        assert "ddd" in self.plugin.run(path=self.tempfile.name)
+
+        self.context.clock.monotonic += FileBackend.WATCH_RETRY_INTERVAL
+        try:
+            self.plugin.run(path=self.tempfile.name)
+            assert len(attempts) == 2
+        finally:
+            self.context.clock.update()
+
+
+class FakeInotify(object):
+
+    def read_events(self):
+        return []
+
 
 class HamsterActivityReporterTest(ReporterTestCase):
     class_name = 'HamsterActivityReporter'
@@ -235,3 +307,154 @@ class TaskWarriorReporterTest(ReporterTestCase):
             taskfilter={'project': 'work'}
         )
         assert repr(result) == '[work task1]'
+
+    def test_cached_until_data_changes(self):
+        Task(self.warrior, description="first").save()
+        assert repr(self.plugin.run(warrior_options=self.tw_options)) == '[first]'
+
+        # Data files are checked once per evaluation round
+        Task(self.warrior, description="second").save()
+        assert len(self.plugin.run(warrior_options=self.tw_options)) == 1
+
+        self.context.tick += 1
+        assert len(self.plugin.run(warrior_options=self.tw_options)) == 2
+
+    def test_time_relative_filter_cached_for_minute(self):
+        backend = self.context.backend(TaskWarriorBackend)
+        Task(self.warrior, description="late",
+             due=datetime.datetime.now() - datetime.timedelta(days=1)).save()
+
+        for _ in range(2):
+            result = self.plugin.run(warrior_options=self.tw_options,
+                                     rawfilter=['+OVERDUE'])
+            assert repr(result) == '[late]'
+
+        assert (backend.hits, backend.misses) == (1, 1)
+
+        # The data files did not change, but the time did
+        self.context.clock.minute_of_day += 1
+        try:
+            self.plugin.run(warrior_options=self.tw_options,
+                            rawfilter=['+OVERDUE'])
+            assert backend.misses == 2
+        finally:
+            self.context.clock.update()
+
+
+class TimewarriorReporterTest(ReporterTestCase):
+    class_name = 'TaskWarriorReporter'
+    module_name = 'timewarrior'
+
+    def setUp(self):
+        self.database = tempfile.mkdtemp()
+        os.environ['TIMEWARRIORDB'] = self.database
+        os.mkdir(os.path.join(self.database, 'data'))
+
+        self.now = int(time.time())
+        self.data_path = os.path.join(
+            self.database, 'data',
+            time.strftime('%Y-%m', time.gmtime(self.now)) + '.data')
+
+        super(TimewarriorReporterTest, self).setUp()
+
+    def tearDown(self):
+        del os.environ['TIMEWARRIORDB']
+        shutil.rmtree(self.database)
+
+    def timestamp(self, seconds_ago):
+        return time.strftime('%Y%m%dT%H%M%SZ',
+                             time.gmtime(self.now - seconds_ago))
+
+    def write(self, lines, mode='w'):
+        with open(self.data_path, mode) as data:
+            data.write(''.join(line + '\n' for line in lines))
+
+    def test_no_data(self):
+        assert self.plugin.run() is None
+
+    def test_activity(self):
+        self.write([
+            'inc {0} - {1} # work "deep focus"'.format(self.timestamp(90),
+                                                       self.timestamp(60)),
+            'inc {0} # work mail'.format(self.timestamp(30)),
+        ])
+
+        assert self.plugin.run() == 'work mail'
+
+        backend = self.context.backends.values()[0]
+        assert [i.tags for i in backend.intervals] == [['work', 'deep focus']]
+
+    def test_malformed_lines(self):
+        self.write([
+            'inc 2017',
+            'inc {0} - 2017013 # broken'.format(self.timestamp(120)),
+            'inc {0} - {1} # "unbalanced'.format(self.timestamp(120),
+                                                 self.timestamp(100)),
+            'inc {0} - {1} # work'.format(self.timestamp(90),
+                                          self.timestamp(60)),
+            'inc {0} # mail'.format(self.timestamp(30)),
+        ])
+
+        assert self.plugin.run() == 'mail'
+
+        backend = self.context.backends.values()[0]
+        assert [i.tags for i in backend.intervals] == [['work']]
+
+    def test_incremental_parsing(self):
+        closed = 'inc {0} - {1} # work'.format(self.timestamp(90),
+                                                self.timestamp(60))
+        self.write([closed, 'inc {0} # mail'.format(self.timestamp(60))])
+        assert self.plugin.run() == 'mail'
+
+        backend = self.context.backends.values()[0]
+        parsed = backend.counters()['timewarrior_bytes_parsed']
+        assert parsed == len(closed) + 1
+
+        # Stopping the tracking rewrites the last line
+        self.context.tick += 1
+        self.write([closed,
+                    'inc {0} - {1} # mail'.format(self.timestamp(60),
+                                                  self.timestamp(30)),
+                    'inc {0} # "deep focus"'.format(self.timestamp(30))])
+
+        assert self.plugin.run() == '"deep focus"'
+        assert len(backend.intervals) == 2
+        assert backend.tag_totals()['mail'] == 30
+
+        # Only the newly appended bytes were parsed
+        parsed = backend.counters()['timewarrior_bytes_parsed'] - parsed
+        assert parsed < 2 * len(closed)
+
+    def test_rewritten_file(self):
+        self.write(['inc {0} - {1} # work'.format(self.timestamp(90),
+                                                   self.timestamp(60))])
+        assert self.plugin.run() is None
+
+        self.context.tick += 1
+        self.write(['inc {0} - {1} # play'.format(self.timestamp(90),
+                                                   self.timestamp(60))])
+
+        backend = self.context.backends.values()[0]
+        assert self.plugin.run() is None
+        assert backend.tag_totals() == {'play': 30}
+
+    def test_earlier_interval_retagged(self):
+        lines = ['inc {0} - {1} # work'.format(self.timestamp(390),
+                                                self.timestamp(360))]
+        lines += ['inc {0} - {1} # "long enough description {2}"'.format(
+            self.timestamp(300 - 60 * number),
+            self.timestamp(270 - 60 * number), number)
+            for number in range(3)]
+        self.write(lines)
+        assert self.plugin.run() is None
+
+        backend = self.context.backends.values()[0]
+        assert backend.tag_totals()['work'] == 30
+
+        # Same length edit, far before the end of the parsed part
+        self.context.tick += 1
+        self.write([lines[0].replace('work', 'play')] + lines[1:])
+
+        assert self.plugin.run() is None
+        assert 'work' not in backend.tag_totals()
+        assert backend.tag_totals()['play'] == 30
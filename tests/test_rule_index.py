@@ -0,0 +1,93 @@
+from unittest import TestCase
+
+from plugins import Rule
+from rule_index import RuleIndex
+from tests.base import MockContext
+
+
+class MockActivity(object):
+    identifier = 'work'
+
+
+class RuleIndexTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.context.activity = None
+        self.context.flow = None
+        self.index = RuleIndex(self.context)
+
+        def rule(**guards):
+            guards['noplugin'] = True
+            return type('GuardedRule', (Rule,), guards)(self.context)
+
+        self.rule = rule
+
+        self.always = rule()
+        self.working = rule(activities=('work',))
+        self.office_hours = rule(time_windows=(('9.00', '17.00'),),
+                                 weekdays=('Monday', 'Tuesday', 'Wednesday',
+                                           'Thursday', 'Friday'))
+        self.locked = rule(session_locked=True)
+
+        self.index.update([self.always, self.working, self.office_hours,
+                           self.locked])
+
+    def at(self, weekday, hour):
+        self.context.clock.weekday = weekday
+        self.context.clock.second_of_day = hour * 3600
+
+    def test_guards(self):
+        self.context.reporters['desktop_session_locked'] = False
+
+        self.at(0, 10)
+        assert self.index.active_rules() == [self.always, self.office_hours]
+
+        self.at(5, 10)
+        assert self.index.active_rules() == [self.always]
+
+        self.context.activity = MockActivity()
+        self.context.reporters['desktop_session_locked'] = True
+        assert self.index.active_rules() == [self.always, self.working,
+                                             self.locked]
+
+    def test_rebuilt_on_change_only(self):
+        self.at(0, 10)
+        self.index.active_rules()
+        self.at(0, 11)
+        self.index.active_rules()
+        assert self.index.rebuilds == 1
+
+        self.at(0, 17)
+        self.index.active_rules()
+        assert self.index.rebuilds == 2
+
+        # Window boundaries are registered, so Actor wakes up at them
+        assert self.context.intervals.boundaries == [0, 9 * 3600, 17 * 3600]
+
+    def test_invalid_guards(self):
+        weekend = self.rule(weekdays=(' saturday', 'SUNDAY'))
+        misspelled = self.rule(weekdays=('Mondey',))
+        bad_window = self.rule(time_windows=(('9:00', '17.00'),))
+
+        self.index.update([self.always, weekend, misspelled, bad_window])
+
+        # The rules with invalid guards are always evaluated
+        self.at(5, 10)
+        assert self.index.active_rules() == [self.always, weekend,
+                                             misspelled, bad_window]
+
+        self.at(0, 10)
+        assert self.index.active_rules() == [self.always, misspelled,
+                                             bad_window]
+
+    def test_single_name(self):
+        sunday = self.rule(weekdays='Sunday', activities='work')
+        self.index.update([sunday])
+
+        self.context.activity = MockActivity()
+        self.at(6, 10)
+        assert self.index.active_rules() == [sunday]
+
+    def tearDown(self):
+        self.context.clock.update()
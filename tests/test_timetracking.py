@@ -0,0 +1,119 @@
+from unittest import TestCase
+
+from action_queue import ActionQueue
+from decisions import DecisionTrace
+from plugins import Fixer, PluginCache, PluginFactory
+from tests.base import MockContext
+from timetracking import UNKNOWN, Timetracker, Timetracking
+
+import fixers.set_activity  # pylint: disable=unused-import
+
+
+class FakeHamster(object):
+    """
+    Replies to the asynchronous calls right away, unless told to fail or to
+    keep the replies until delivered.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.replies = []
+        self.error = None
+        self.delayed = False
+
+    def reply(self, handler, *args):
+        if self.delayed:
+            self.replies.append(lambda: handler(*args))
+        else:
+            handler(*args)
+
+    def deliver(self):
+        while self.replies:
+            self.replies.pop(0)()
+
+    def StopTracking(self, end_time, reply_handler, error_handler):
+        self.calls.append('stop')
+        if self.error is not None:
+            self.reply(error_handler, self.error)
+        else:
+            self.reply(reply_handler)
+
+    def AddFact(self, activity, start_time, end_time, temporary,
+                reply_handler, error_handler):
+        self.calls.append(activity)
+        self.reply(reply_handler, len(self.calls))
+
+
+class TimetrackingTest(TestCase):
+
+    def setUp(self):
+        self.context = MockContext()
+        self.context.rule = None
+        self.context.trace = DecisionTrace()
+        self.context.actions = ActionQueue(self.context)
+        self.context.fixers = PluginCache(Fixer, self.context)
+
+        self.hamster = FakeHamster()
+        for identifier in ('set_hamster_activity', 'stop_hamster_activity'):
+            fixer = self.context.fixers.get_plugin_instance(identifier)
+            fixer.interface = self.hamster
+
+        self.timetracking = Timetracking(self.context)
+        self.timetracking.timetracker = PluginFactory(
+            Timetracker, self.context).make('hamster')
+
+    def test_requests(self):
+        self.timetracking.start('work@Actor')
+        self.timetracking.stop()
+
+        # Completed by the main loop, not left in the queue of the round
+        assert self.hamster.calls == ['stop', 'work@Actor', 'stop']
+        assert not self.context.actions.pending
+        assert self.timetracking.in_flight == 0
+
+        # Stopped already
+        self.timetracking.stop()
+        assert self.timetracking.writes_avoided == 1
+
+    def test_failure(self):
+        self.hamster.error = Exception('Hamster is gone')
+        self.timetracking.start('work@Actor')
+
+        # The activity was not set, hence the mirror is not trusted
+        assert self.hamster.calls == ['stop']
+        assert self.timetracking.state is UNKNOWN
+
+    def test_reconcile_waits_for_requests(self):
+        self.hamster.delayed = True
+        self.timetracking.start('work@Actor')
+        assert self.timetracking.in_flight == 1
+
+        # The request was not completed yet, the mirror is kept
+        self.context.reporters['hamster_activity'] = None
+        self.timetracking.last_reconcile = None
+        self.timetracking.reconcile()
+        assert self.timetracking.state == ('work@Actor', None, ())
+
+        self.hamster.deliver()
+        assert self.timetracking.in_flight == 0
+        assert self.hamster.calls == ['stop', 'work@Actor']
+
+        self.context.reporters['hamster_activity'] = 'work@Actor'
+        self.timetracking.reconcile()
+        assert self.timetracking.state == ('work@Actor', None, ())
+
+    def test_exact_match(self):
+        timetracker = self.timetracking.timetracker
+
+        assert timetracker.matches('work@Actor', 'work@Actor, writing #docs',
+                                   None, ())
+        assert not timetracker.matches('work', 'work@Actor', None, ())
+
+        # Already tracked, hence not set again
+        self.context.reporters['hamster_activity'] = 'work@Actor'
+        results = []
+        self.context.fixers.run_plugin_instance(
+            'set_hamster_activity', (),
+            {'activity': 'work@Actor, writing', 'callback': results.append})
+        assert self.hamster.calls == []
+        assert results == [True]
@@ -0,0 +1,223 @@
+import collections
+import errno
+import time
+from StringIO import StringIO
+from unittest import TestCase
+
+from fixers.tmux import TmuxKillActivePaneFixer
+from tests.base import MockContext
+from tmux_backend import (TmuxBackend, TmuxCommandError, TmuxControlClient,
+                          TmuxRequest, TmuxSnapshot)
+from util import run
+
+
+def wait_until(condition, timeout=5):
+    """
+    Waits until the condition holds, instead of sleeping for a fixed time.
+    """
+
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not met in %s s" % timeout)
+        time.sleep(0.05)
+
+
+class TmuxBackendTest(TestCase):
+    """
+    Tests the tmux control mode backend against a private tmux server.
+    """
+
+    socket_name = 'actor-tests'
+
+    def tmux(self, *args):
+        return run(['tmux', '-L', self.socket_name] + list(args))
+
+    def setUp(self):
+        self.tmux('kill-server')
+        self.tmux('new-session', '-d', '-s', 'main', '-n', 'editor')
+        self.backend = TmuxBackend(MockContext(), socket_name=self.socket_name)
+
+    def tearDown(self):
+        self.backend.client.stop()
+        self.tmux('kill-server')
+
+    def test_connection(self):
+        assert self.backend.ready()
+        assert self.backend.counters()['tmux_connected']
+
+    def test_control_client_not_considered_attached(self):
+        assert self.backend.ready()
+        assert self.backend.clients == []
+        assert self.backend.snapshot().attached_sessions == []
+
+    def test_panes_tracked(self):
+        snapshot = self.backend.snapshot()
+        assert len(snapshot.sessions) == 1
+
+        session = snapshot.sessions[0]
+        assert session.name == 'main'
+        assert not session.attached
+        assert session.windows[0].name == 'editor'
+        assert session.windows[0].active
+        assert session.windows[0].panes[0].active
+
+    def test_notification_triggers_refresh(self):
+        # Attaching is followed by a %session-changed notification
+        assert self.backend.connected
+        wait_until(lambda: self.backend.notifications > 0)
+
+        assert self.backend.ready()
+        refreshes = self.backend.refreshes
+
+        # State is served from memory if nothing changed
+        assert self.backend.ready()
+        assert self.backend.refreshes == refreshes
+
+        self.tmux('new-window', '-d', '-t', 'main', '-n', 'shell')
+        wait_until(lambda: self.backend.dirty)
+
+        assert self.backend.ready()
+        assert self.backend.refreshes == refreshes + 1
+        assert len(self.backend.state.sessions[0].windows) == 2
+
+    def test_command(self):
+        assert self.backend.ready()
+        self.backend.command('new-window', '-d', '-t', 'main')
+        wait_until(lambda: len(
+            self.backend.snapshot().sessions[0].windows) == 2)
+
+        windows = self.backend.snapshot().sessions[0].windows
+        self.backend.command('kill-pane', '-t', windows[1].panes[0].pane_id)
+        wait_until(lambda: len(
+            self.backend.snapshot().sessions[0].windows) == 1)
+
+    def test_bulk_query(self):
+        # Without the control mode, the state is queried once per round
+        self.backend.control_mode = False
+        snapshot = self.backend.snapshot()
+
+        assert self.backend.queries == 1
+        assert snapshot.sessions[0].windows[0].name == 'editor'
+
+        self.backend.snapshot()
+        assert self.backend.queries == 1
+
+        self.backend.context.tick += 1
+        self.backend.snapshot()
+        assert self.backend.queries == 2
+
+    def test_vanished_pane(self):
+        assert self.backend.ready()
+        self.backend.context.backends[TmuxBackend] = self.backend
+
+        fixer = TmuxKillActivePaneFixer(self.backend.context)
+        fixer.get_active_panes = lambda: ['%99']
+
+        # Failures of the commands are not rule exceptions
+        fixer.run()
+        self.assertRaises(TmuxCommandError, self.backend.command,
+                          'kill-pane', '-t', '%99')
+
+
+class BrokenPipe(object):
+
+    def write(self, data):
+        raise IOError(errno.EPIPE, 'Broken pipe')
+
+
+class FakeProcess(object):
+
+    def __init__(self, output=''):
+        self.stdout = StringIO(output)
+        self.stdin = BrokenPipe()
+        self.killed = False
+
+    def poll(self):
+        return -9 if self.killed else None
+
+    def kill(self):
+        self.killed = True
+
+    def wait(self):
+        pass
+
+
+class TmuxControlClientTest(TestCase):
+
+    def read(self, output, requests):
+        client = TmuxControlClient()
+        process = FakeProcess(output)
+        client.read_output(process, collections.deque(requests))
+        return process
+
+    def test_responses_paired_by_guards(self):
+        abandoned, first, second = TmuxRequest(), TmuxRequest(), TmuxRequest()
+        abandoned.abandoned = True
+
+        process = self.read('\n'.join([
+            '%begin 1 10 1', 'late', '%end 1 10 1',
+            '%begin 1 11 0', '%end 1 11 0',
+            '%session-changed $0 main',
+            '%begin 1 12 1', 'first', '%end 1 12 1',
+            '%begin 1 13 1', 'oops', '%error 1 13 1',
+        ]) + '\n', [abandoned, first, second])
+
+        assert not process.killed
+        assert abandoned.lines == []
+        assert (first.success, first.lines) == (True, ['first'])
+        assert (second.success, second.lines) == (False, ['oops'])
+
+    def test_unmatched_guard_drops_connection(self):
+        request = TmuxRequest()
+        process = self.read('%begin 1 10 1\nx\n%end 1 9 1\n', [request])
+
+        assert process.killed
+        assert request.done.is_set() and not request.success
+
+    def test_server_gone(self):
+        client = TmuxControlClient()
+        client.process = FakeProcess()
+
+        self.assertRaises(TmuxCommandError, client.command, 'list-panes')
+        assert not client.alive
+
+
+class TmuxSnapshotTest(TestCase):
+
+    lines = [
+        'main\t1\t0\teditor\t0\t1\t%0\t100',
+        'main\t1\t1\tshell\t1\t0\t%1\t101',
+        'main\t1\t1\tshell\t1\t1\t%2\t102',
+        'other\t0\t0\tmail\t1\t1\t%3\t103',
+    ]
+
+    def test_structure(self):
+        snapshot = TmuxSnapshot(self.lines)
+
+        assert [s.name for s in snapshot.sessions] == ['main', 'other']
+        assert [w.name for w in snapshot.sessions[0].windows] == ['editor',
+                                                                  'shell']
+        assert len(snapshot.sessions[0].windows[1].panes) == 2
+
+    def test_active_objects(self):
+        snapshot = TmuxSnapshot(self.lines)
+
+        assert [s.name for s in snapshot.attached_sessions] == ['main']
+        assert [w.name for w in snapshot.active_windows] == ['shell']
+        assert [p.pane_id for p in snapshot.active_panes] == ['%2']
+        assert [p.pane_pid for p in snapshot.active_panes] == [102]
+
+    def test_attached_sessions_override(self):
+        snapshot = TmuxSnapshot(self.lines, attached_sessions=set(['other']))
+
+        assert [s.name for s in snapshot.attached_sessions] == ['other']
+        assert [p.pane_id for p in snapshot.active_panes] == ['%3']
+
+    def test_malformed_output(self):
+        backend = TmuxBackend(MockContext(), socket_name='actor-missing')
+        backend.control_mode = False
+        backend.command = lambda *args: ['main\t1']
+
+        self.assertRaises(TmuxCommandError, backend.refresh)
+        assert backend.dirty
@@ -0,0 +1,158 @@
+import datetime
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from analytics_backend import Series
+from tests.base import MockContext
+from track_backend import TrackBackend, TrackStore
+
+
+class TrackBackendTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'mood.act')
+
+        with open(self.path, 'w') as fil:
+            fil.write("2017-01-01: Good\n")
+            fil.write("2017-01-02 10.00: Bad\n")
+
+        self.context = MockContext()
+        self.backend = self.context.backend(TrackBackend)
+        self.backend.directory = self.directory
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path) as fil:
+            return fil.read()
+
+    def test_existing_records(self):
+        assert self.backend.get('mood', '2017-01-01') == 'Good'
+        assert self.backend.get('mood', '2017-01-02') == 'Bad'
+        assert self.backend.get('mood', '2017-01-03') is None
+        assert self.backend.get('sleep', '2017-01-01') is None
+
+    def test_batched_record(self):
+        self.backend.record('mood', '2017-01-03', 'Fine')
+
+        assert self.backend.get('mood', '2017-01-03') == 'Fine'
+        assert 'Fine' not in self.read()
+
+        self.context.flush()
+        assert self.read().endswith("2017-01-03: Fine\n")
+
+    def test_first_record_wins(self):
+        with open(self.path, 'a') as fil:
+            fil.write("2017-01-01: Bad\n")
+
+        assert self.backend.get('mood', '2017-01-01') == 'Good'
+
+        self.backend.record('mood', '2017-01-02 10.00', 'Fine')
+        assert self.backend.get('mood', '2017-01-02') == 'Bad'
+
+    def test_compaction(self):
+        with open(self.path, 'a') as fil:
+            for number in range(TrackStore.COMPACT_MIN_LINES):
+                fil.write("2017-01-01: Good {0}\n".format(number))
+
+        # Reading does not rewrite the file
+        content = self.read()
+        assert self.backend.get('mood', '2017-01-01') == 'Good'
+        assert self.read() == content
+
+        # Compacted once we write to it
+        self.backend.record('mood', '2017-01-03', 'Fine')
+        self.context.flush()
+        assert self.read() == ("2017-01-01: Good\n"
+                               "2017-01-02 10.00: Bad\n"
+                               "2017-01-03: Fine\n")
+
+    def test_compaction_keeps_other_lines(self):
+        with open(self.path, 'w') as fil:
+            fil.write("# Mood journal\n")
+            fil.write("2017-01-01: Good\n")
+            fil.write("\n")
+            for number in range(TrackStore.COMPACT_MIN_LINES):
+                fil.write("2017-01-02: Bad {0}\n".format(number))
+            fil.write("# the end")
+
+        self.backend.record('mood', '2017-01-03', 'Fine')
+        self.context.flush()
+
+        assert self.backend.get('mood', '2017-01-02') == 'Bad 0'
+        assert self.read() == ("# Mood journal\n"
+                               "2017-01-01: Good\n"
+                               "\n"
+                               "2017-01-02: Bad 0\n"
+                               "# the end\n"
+                               "2017-01-03: Fine\n")
+
+    def test_external_changes(self):
+        assert self.backend.get('mood', '2017-01-01') == 'Good'
+        store = self.backend.store('mood')
+        version = store.version
+
+        # Edited by the user, noticed in the next round
+        with open(self.path, 'w') as fil:
+            fil.write("2017-01-01: Great, after all\n")
+
+        assert self.backend.get('mood', '2017-01-01') == 'Good'
+        self.context.tick += 1
+        assert self.backend.get('mood', '2017-01-01') == 'Great, after all'
+        assert self.backend.get('mood', '2017-01-02') is None
+        assert store.version > version
+
+        # Records not written yet survive the reload
+        self.backend.record('mood', '2017-01-03', 'Fine')
+        with open(self.path, 'a') as fil:
+            fil.write("2017-01-04: Tired\n")
+
+        self.context.tick += 1
+        assert self.backend.get('mood', '2017-01-03') == 'Fine'
+        assert self.backend.get('mood', '2017-01-04') == 'Tired'
+
+        self.context.flush()
+        assert self.read() == ("2017-01-01: Great, after all\n"
+                               "2017-01-04: Tired\n"
+                               "2017-01-03: Fine\n")
+
+        # Our own writes do not cause reloads
+        version = store.version
+        self.context.tick += 1
+        self.backend.get('mood', '2017-01-03')
+        assert store.version == version
+
+
+class SeriesTest(TestCase):
+
+    def setUp(self):
+        self.series = Series.from_records([
+            ('2017-01-02', '4'),     # Monday
+            ('2017-01-03', 'Yes'),
+            ('2017-01-04', '2'),
+            ('2017-01-04 20.00', '4'),
+            ('2017-01-06', '5'),
+            ('2017-01-07', 'skipped'),
+        ])
+        self.end = datetime.date(2017, 1, 7).toordinal()
+
+    def test_average(self):
+        assert len(self.series) == 4
+        assert self.series.average(4, end=self.end) == 4.0
+        assert self.series.average(end=self.end) == 3.25
+        assert self.series.average(1, end=self.end) is None
+
+    def test_streaks(self):
+        assert self.series.streak(end=self.end) == 1
+        assert self.series.streak(threshold=4, end=self.end) == 1
+        assert self.series.longest_streak() == 3
+        assert self.series.longest_streak(threshold=3) == 1
+
+    def test_weekday_averages(self):
+        averages = self.series.weekday_averages()
+        assert averages[:3] == [4.0, 1.0, 3.0]
+        assert averages[3] is None
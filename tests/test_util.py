@@ -0,0 +1,184 @@
+import datetime
+import os
+import sys
+from unittest import TestCase
+
+from util import CLOCK, Clock, Expiration, Periodic, VerdictCache, monotonic
+
+
+class ClockTest(TestCase):
+
+    def test_snapshot(self):
+        clock = Clock()
+
+        assert clock.today == clock.now.date()
+        assert clock.weekday == clock.now.weekday()
+        assert clock.minute_of_day == clock.now.hour * 60 + clock.now.minute
+        assert 0 <= clock.second_of_day - clock.minute_of_day * 60 < 60
+
+        # The snapshot does not move until updated
+        snapshot = clock.monotonic
+        assert clock.monotonic == snapshot
+        assert monotonic() >= snapshot
+
+    def test_moment(self):
+        clock = Clock()
+
+        assert clock.moment(clock.monotonic) == clock.now
+        assert (clock.moment(clock.monotonic + 90) - clock.now ==
+                datetime.timedelta(seconds=90))
+
+
+class ClockTestCase(TestCase):
+
+    def setUp(self):
+        CLOCK.update()
+
+    def tearDown(self):
+        CLOCK.update()
+
+    def advance(self, seconds):
+        CLOCK.monotonic += seconds
+        CLOCK.now += datetime.timedelta(seconds=seconds)
+
+
+class PeriodicTest(ClockTestCase):
+
+    def test_automatic_intervals(self):
+        periodic = Periodic(1)
+        assert periodic.next_change() == CLOCK.now
+
+        assert periodic
+        assert not periodic
+        assert periodic.next_change() == CLOCK.now + datetime.timedelta(
+            minutes=1)
+
+        self.advance(59)
+        assert not periodic
+
+        self.advance(1)
+        assert periodic
+        assert not periodic
+
+    def test_manual_intervals(self):
+        periodic = Periodic(1, automatic_intervals=False)
+
+        assert periodic
+        assert periodic
+
+        periodic.start_new_interval()
+        assert not periodic
+
+        self.advance(60)
+        assert periodic
+
+
+class ExpirationTest(ClockTestCase):
+
+    def test_expiration(self):
+        expiration = Expiration(1)
+        CLOCK.update()
+
+        assert not expiration
+        assert not expiration.just_expired()
+        assert expiration.duration == 60
+
+        self.advance(30)
+        assert not expiration
+        assert 29 < expiration.remaining <= 30
+
+        self.advance(30)
+        assert expiration
+        assert expiration.next_change() is None
+        assert expiration.just_expired()
+        assert not expiration.just_expired()
+
+    def test_created_after_snapshot(self):
+        # The snapshot of the round was taken a while ago
+        CLOCK.monotonic -= 100
+        expiration = Expiration(1)
+
+        assert not expiration
+        assert expiration.passed == 0
+        assert expiration.remaining == 60
+
+        self.advance(200)
+        assert expiration
+
+    def test_empty_interval(self):
+        expiration = Expiration()
+
+        assert expiration
+        assert not expiration.just_expired()
+
+
+class FakeProcess(object):
+
+    def __init__(self, pid):
+        self.pid = pid
+
+    def create_time(self):
+        return 1000.0 + self.pid
+
+
+class VerdictCacheTest(TestCase):
+
+    def setUp(self):
+        self.cache = VerdictCache()
+        self.judged = []
+
+        # pid -> (device, inode) of the executable
+        self.executables = {}
+        self.cache.executable = self.executables.get
+
+    def judge(self, process):
+        self.judged.append(process.pid)
+        return process.pid % 2 == 0
+
+    def test_hit(self):
+        process = FakeProcess(2)
+
+        assert self.cache.get(process, 'work', self.judge)
+        assert self.cache.get(process, 'work', self.judge)
+        assert self.judged == [2]
+
+        # Verdicts are kept per activity
+        self.cache.get(process, 'rest', self.judge)
+        assert self.judged == [2, 2]
+
+        counters = self.cache.counters()
+        assert counters['verdict_checks_avoided'] == 1
+        assert counters['verdict_checks_performed'] == 2
+
+    def test_prune(self):
+        first = FakeProcess(2)
+        second = FakeProcess(3)
+
+        self.cache.get(first, 'work', self.judge)
+        self.cache.get(second, 'work', self.judge)
+        self.cache.prune()
+        assert self.cache.counters()['verdicts_cached'] == 2
+
+        # Only the first process is seen during the next round
+        self.cache.get(first, 'work', self.judge)
+        self.cache.prune()
+        assert self.cache.counters()['verdicts_cached'] == 1
+
+        self.cache.get(second, 'work', self.judge)
+        assert self.judged == [2, 3, 3]
+
+    def test_exec_invalidates(self):
+        process = FakeProcess(2)
+        self.executables[2] = (1, 100)
+        self.cache.get(process, 'work', self.judge)
+
+        # The process executes another program
+        self.executables[2] = (1, 200)
+        self.cache.get(process, 'work', self.judge)
+        assert self.judged == [2, 2]
+
+    def test_executable(self):
+        executable = VerdictCache.executable(os.getpid())
+
+        assert executable == VerdictCache.executable(os.getpid())
+        assert executable[1] == os.stat(sys.executable).st_ino
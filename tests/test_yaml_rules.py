@@ -0,0 +1,174 @@
+import datetime
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from plugins import Checker, Rule
+from tests.base import MockContext
+from yaml_rules import (RuleSyntaxError, compile_rules, load_plan,
+                        load_rules)
+
+RULES = [
+    {'Morning exercise': {
+        'reporters': ['TimeReporter'],
+        'checkers': [{'TimeIntervalChecker': {'start': '9.30',
+                                              'end': '10.00'}}],
+        'fixers': ['LockScreenFixer'],
+        'weekdays': ['Monday', 'Friday'],
+    }},
+    {'No work on Sunday': {
+        'reporters': ['weekday'],
+        'checkers': [
+            {'time_interval': {'end': '10.00', 'start': '9.30'}},
+            {'regular_expression': {'regexp': 'Sunday',
+                                    'string': '$weekday'}},
+        ],
+        'fixers': [{'kill_process': {'pid': 1}}],
+    }},
+    {'Countdown': {
+        'checkers': ['countdown'],
+    }},
+    {'Countdown again': {
+        'checkers': ['countdown'],
+    }},
+]
+
+
+class RecordingCache(object):
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    def get(self, identifier, args, kwargs, rule_name=None):
+        self.calls.append((identifier, kwargs))
+        return self.results.get(identifier)
+
+
+class CompileRulesTest(TestCase):
+
+    def test_shared_nodes(self):
+        plan = compile_rules(RULES)
+        nodes = plan['nodes']
+
+        # Same invocations are compiled into a single node
+        assert [node[1] for node in nodes] == [
+            'time', 'time_interval', 'weekday',
+            'regular_expression', 'countdown']
+
+        regexp = nodes[3]
+        assert regexp[2] == (('regexp', 'Sunday', None), ('string', None, 2))
+
+        assert plan['rules'][0] == (u'Morning exercise', (1,),
+                                    (('lock_screen', ()),),
+                                    {'weekdays': ('Monday', 'Friday')})
+        assert plan['rules'][1][1] == (1, 3)
+
+        # Countdown is stateful, hence not shared
+        assert not nodes[4][3]
+        assert nodes[1][3]
+
+    def test_errors(self):
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{'Rule': {'checkers': ['no_such_checker']}}])
+
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{'Rule': {'checkers': [
+                {'regular_expression': {'string': '$missing'}}]}}])
+
+    def test_unquoted_values(self):
+        # Unquoted 9.30 is read as a float by YAML
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{'Rule': {'checkers': [
+                {'time_interval': {'start': 9.30, 'end': '10.00'}}]}}])
+
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{'Rule': {'time_windows': [[9.30, '10.00']]}}])
+
+        with self.assertRaises(RuleSyntaxError):
+            compile_rules([{'Rule': {'checkers': [
+                {'regular_expression': {
+                    'string': datetime.date(2017, 1, 1)}}]}}])
+
+
+class YamlRuleTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'rules.yaml')
+
+        with open(self.path, 'w') as fil:
+            fil.write("- Rule:\n"
+                      "    reporters:\n"
+                      "    - weekday:\n"
+                      "    checkers:\n"
+                      "    - regular_expression:\n"
+                      "        regexp: Sunday\n"
+                      "        string: $weekday\n"
+                      "    fixers:\n"
+                      "    - notify:\n"
+                      "        message: $weekday\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_plan_cache(self):
+        cache = os.path.join(self.directory, '.cache')
+        plan = load_plan(self.path, cache)
+
+        assert len(os.listdir(cache)) == 1
+        assert load_plan(self.path, cache) == plan
+
+        # The plan of the previous content is removed
+        with open(self.path, 'a') as fil:
+            fil.write("- Other rule:\n"
+                      "    checkers:\n"
+                      "    - countdown:\n")
+
+        load_plan(self.path, cache)
+        assert len(os.listdir(cache)) == 1
+
+    def test_plan_cache_plugin_changes(self):
+        cache = os.path.join(self.directory, '.cache')
+        load_plan(self.path, cache)
+
+        checker = [plugin for plugin in Checker.plugins
+                   if plugin.identifier == 'regular_expression'][0]
+        stateless, checker.stateless = checker.stateless, False
+
+        # The cached plan shares a node that is stateful now
+        try:
+            plan = load_plan(self.path, cache)
+            assert not [node for node in plan['nodes']
+                        if node[1] == 'regular_expression'][0][3]
+        finally:
+            checker.stateless = stateless
+
+    def test_run(self):
+        rule_classes = load_rules(self.path, 'rules.yaml')
+        Rule.plugins.remove_module('rules.yaml')
+
+        context = MockContext()
+        context.reporters = RecordingCache({'weekday': 'Sunday'})
+        context.checkers = RecordingCache({'regular_expression': True})
+        context.fixers = RecordingCache({})
+
+        rule = rule_classes[0](context)
+        assert rule.identifier == u'Rule'
+
+        rule.run()
+        rule.run()
+
+        # Nodes are evaluated once per tick
+        assert context.reporters.calls == [('weekday', {})]
+        assert context.checkers.calls == [
+            ('regular_expression', {'regexp': 'Sunday', 'string': 'Sunday'})]
+        assert context.fixers.calls == [('notify', {'message': 'Sunday'})] * 2
+
+        context.tick += 1
+        context.checkers.results['regular_expression'] = False
+        rule.run()
+
+        assert len(context.checkers.calls) == 2
+        assert len(context.fixers.calls) == 2
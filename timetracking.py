@@ -3,45 +3,191 @@ Provides a layer that exposes time-tracking abilities, regardless of the user
 selected backend (Hamster, Timewarrior, etc.).
 """
 
+import shlex
+import time
+
 import config
 
+from hamster_backend import fact_activity
+from logger import LoggerMixin
 from plugins import PluginMount, PluginFactory, Plugin
+from timewarrior_backend import TimewarriorBackend
+
+# Marks the state of the timetracker that does not correspond to anything
+# we have requested (i.e. activity changed by the user directly)
+UNKNOWN = object()
+
+
+class Timetracking(LoggerMixin):
+    """
+    Keeps a local mirror of the tracked activity, category and tags, and
+    issues the start/stop requests to the timetracker only on real changes.
+
+    The mirror is reconciled with the timetracker lazily, at most once per
+    RECONCILE_INTERVAL seconds. The requests are issued asynchronously (as
+    background commands or asynchronous D-Bus calls), and completed by the
+    main loop, so that activity switches never block on the timetracker.
+    """
 
-class Timetracking(object):
+    RECONCILE_INTERVAL = 60
 
     def __init__(self, context):
         factory = PluginFactory(Timetracker, context)
         self.timetracker = factory.make(config.TIMETRACKER)
 
+        self.state = UNKNOWN
+        self.last_reconcile = None
+
+        # Number of requests not completed yet
+        self.in_flight = 0
+
+        self.writes_issued = 0
+        self.writes_avoided = 0
+
+    def reconcile(self):
+        """
+        Updates the mirror with the actual state of the timetracker, unless
+        it has been done recently.
+        """
+
+        now = time.time()
+        if (self.last_reconcile is not None and
+                now - self.last_reconcile < self.RECONCILE_INTERVAL):
+            return
+
+        # Requests in flight would make the comparison meaningless
+        if self.in_flight:
+            return
+
+        self.last_reconcile = now
+        current = self.timetracker.current()
+
+        if current is None:
+            self.state = None
+        elif self.state is None or self.state is UNKNOWN:
+            self.state = UNKNOWN
+        elif not self.timetracker.matches(current, *self.state):
+            self.state = UNKNOWN
+
+    def submit(self, function, *args):
+        """
+        Issues the timetracker request. The request reports its completion
+        by calling the given callback.
+        """
+
+        self.writes_issued += 1
+        self.in_flight += 1
+
+        # pylint: disable=broad-except
+        try:
+            function(*args, callback=self.completed)
+        except Exception:
+            self.log_exception()
+            self.completed(False)
+
+    def completed(self, success):
+        self.in_flight -= 1
+
+        if not success:
+            # Our mirror can no longer be trusted
+            self.last_reconcile = None
+            self.state = UNKNOWN
+
     def start(self, activity, category=None, tags=None):
-        self.timetracker.start(activity, category, tags)
+        self.reconcile()
+        state = (activity, category, tuple(tags or tuple()))
+
+        if state == self.state:
+            self.writes_avoided += 1
+            return
+
+        self.state = state
+        self.submit(self.timetracker.start, activity, category, tags)
 
     def stop(self):
-        self.timetracker.stop()
+        self.reconcile()
+
+        if self.state is None:
+            self.writes_avoided += 1
+            return
+
+        self.state = None
+        self.submit(self.timetracker.stop)
+
+    def counters(self):
+        return {
+            'timetracking_writes_issued': self.writes_issued,
+            'timetracking_writes_avoided': self.writes_avoided,
+        }
 
 
 class Timetracker(Plugin):
+    """
+    The start and stop methods issue the request, and call the callback
+    with True or False once it succeeds or fails.
+    """
 
     __metaclass__ = PluginMount
 
+    def apply(self, identifier, **kwargs):
+        """
+        Runs the fixer right away. The requests are deduplicated by
+        Timetracking already, and their completion is awaited using the
+        callback, hence they are not queued with the actions of the rules.
+        """
+
+        self.context.fixers.run_plugin_instance(identifier, (), kwargs)
+
+    def current(self):
+        """
+        Returns the currently tracked activity, as reported by the
+        timetracker, or None if nothing is tracked.
+        """
+
+        raise NotImplementedError("The current method needs to be"
+                                  "implemented by the timetracker")
+
+    def matches(self, current, activity, category, tags):
+        """
+        Returns True if the current activity reported by the timetracker
+        corresponds to the given activity.
+        """
+
+        raise NotImplementedError("The matches method needs to be"
+                                  "implemented by the timetracker")
+
 
 class HamsterTimetracker(Timetracker):
 
     identifier = 'hamster'
 
-    def start(self, activity, category, tags):
-        self.fix('set_hamster_activity', activity=activity)
+    def start(self, activity, category, tags, callback=None):
+        self.apply('set_hamster_activity', activity=activity,
+                   callback=callback)
 
-    def stop(self):
-        self.fix('stop_hamster_activity')
+    def stop(self, callback=None):
+        self.apply('stop_hamster_activity', callback=callback)
+
+    def current(self):
+        return self.report('hamster_activity')
+
+    def matches(self, current, activity, category, tags):
+        return current == fact_activity(activity)
 
 
 class TimewarriorTimetracker(Timetracker):
 
     identifier = 'timewarrior'
 
-    def start(self, activity, category, tags):
-        self.fix('set_timew_activity', activity=activity)
+    def start(self, activity, category, tags, callback=None):
+        self.apply('set_timew_activity', activity=activity,
+                   callback=callback)
 
-    def stop(self):
-        self.fix('stop_timew_activity')
+    def stop(self, callback=None):
+        self.apply('stop_timew_activity', callback=callback)
+
+    def current(self):
+        return self.context.backend(TimewarriorBackend).activity_tags()
+
+    def matches(self, current, activity, category, tags):
+        return current == shlex.split(activity)
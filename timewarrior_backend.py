@@ -0,0 +1,369 @@
+"""
+Provides the state of the Timewarrior time tracker by reading its data files
+directly, instead of spawning the timew command.
+
+Timewarrior stores the intervals in monthly files (data/YYYY-MM.data), one
+interval per line. New intervals are appended, only the last line (the open
+interval) is rewritten when the tracking stops. Hence we only parse the
+newly appended bytes on each change. Edits of the earlier intervals are
+detected by the checksum of the parsed part, and the file is parsed again.
+"""
+
+import calendar
+import datetime
+import os
+import shlex
+import time
+import zlib
+
+from logger import LoggerMixin
+from plugins import Backend
+
+
+class Interval(object):
+    """
+    A single tracked interval. End is None for the open interval. Start and
+    end are given as UNIX timestamps.
+    """
+
+    def __init__(self, start, end, tags):
+        self.start = start
+        self.end = end
+        self.tags = tags
+
+    @staticmethod
+    def parse_timestamp(timestamp):
+        # Timestamps are stored in UTC, in the 20170131T235959Z format
+        return calendar.timegm((
+            int(timestamp[0:4]), int(timestamp[4:6]), int(timestamp[6:8]),
+            int(timestamp[9:11]), int(timestamp[11:13]), int(timestamp[13:15]),
+        ))
+
+    @classmethod
+    def parse(cls, line):
+        """
+        Parses a line of the data file, i.e.:
+            inc 20170131T100000Z - 20170131T110000Z # tag1 "tag 2"
+
+        Returns None if the line does not describe an interval.
+        """
+
+        timestamps, _, tags = line.partition('#')
+        parts = timestamps.split()
+
+        if not parts or parts[0] != 'inc':
+            return None
+
+        start = cls.parse_timestamp(parts[1])
+        end = cls.parse_timestamp(parts[3]) if len(parts) > 3 else None
+
+        # Annotation, if any, follows after another '#' separator
+        tokens = shlex.split(tags)
+        if '#' in tokens:
+            tokens = tokens[:tokens.index('#')]
+
+        return cls(start, end, tokens)
+
+    def duration(self, since, now):
+        """
+        Returns the number of seconds of the interval after the since
+        timestamp. Open interval is considered to last until now.
+        """
+
+        end = self.end if self.end is not None else now
+        return max(end - max(self.start, since), 0)
+
+    @property
+    def description(self):
+        """
+        Returns the tags in the form used by the timew command.
+        """
+
+        return ' '.join('"{0}"'.format(tag) if ' ' in tag else tag
+                        for tag in self.tags)
+
+
+class DataFile(LoggerMixin):
+    """
+    Keeps track of the parsed part of a single data file. Lines that cannot
+    be parsed are logged and skipped.
+    """
+
+    # Size of the chunks in which the parsed part is read when verifying it
+    CHUNK_SIZE = 65536
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+
+        # CRC32 of the parsed part of the file, updated as it grows
+        self.checksum = 0
+        self.mtime = None
+        self.size = None
+        self.bytes_parsed = 0
+        self.open_interval = None
+
+    def changed(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+
+        mtime = stat.st_mtime if stat else None
+        size = stat.st_size if stat else None
+
+        if (mtime, size) == (self.mtime, self.size):
+            return False
+
+        self.mtime, self.size = mtime, size
+        return True
+
+    def read(self):
+        """
+        Returns the tuple (rewritten, closed), where closed is the list of
+        the closed intervals appended since the last read. If rewritten is
+        True, the file has been modified before the parsed offset and the
+        closed intervals have been parsed from the beginning of the file.
+
+        The open interval, if any, is stored in the open_interval attribute.
+        """
+
+        try:
+            with open(self.path, 'r') as data:
+                rewritten = not self.verify(data)
+                if rewritten:
+                    self.offset = 0
+                    self.checksum = 0
+
+                data.seek(self.offset)
+                content = data.read()
+        except IOError:
+            rewritten = self.offset > 0
+            self.offset = 0
+            self.checksum = 0
+            self.open_interval = None
+            return rewritten, []
+
+        closed = []
+        self.open_interval = None
+        position = self.offset
+
+        for line in content.splitlines(True):
+            # Do not consume incomplete lines, they are still being written
+            if not line.endswith('\n'):
+                break
+
+            try:
+                interval = Interval.parse(line)
+            except (IndexError, ValueError):
+                self.warning("Skipping malformed line in %s: %r",
+                             self.path, line)
+                interval = None
+
+            if interval is not None and interval.end is None:
+                # The open interval will be rewritten once it is closed,
+                # hence we need to parse it again next time
+                self.open_interval = interval
+                break
+
+            if interval is not None:
+                closed.append(interval)
+
+            position += len(line)
+
+        parsed = content[:position - self.offset]
+        self.checksum = zlib.crc32(parsed, self.checksum)
+        self.offset = position
+        self.bytes_parsed += len(parsed)
+
+        return rewritten, closed
+
+    def verify(self, data):
+        """
+        Verifies that the already parsed part of the file was not modified,
+        i.e. by retagging or modifying an earlier interval.
+        """
+
+        if self.offset == 0:
+            return True
+
+        checksum = 0
+        remaining = self.offset
+        data.seek(0)
+
+        while remaining > 0:
+            chunk = data.read(min(remaining, self.CHUNK_SIZE))
+            if not chunk:
+                return False
+
+            checksum = zlib.crc32(chunk, checksum)
+            remaining -= len(chunk)
+
+        return checksum == self.checksum
+
+
+class TimewarriorBackend(Backend):
+    """
+    Keeps today's intervals, per-tag totals and the open interval of
+    Timewarrior in memory.
+
+    The data file is checked for modifications at most once per evaluation
+    round, and only the newly appended bytes are parsed.
+    """
+
+    def __init__(self, context, database=None):
+        super(TimewarriorBackend, self).__init__(context)
+
+        self.database = database or self.default_database()
+        self.data_files = []
+        self.checked_tick = None
+        self.day_start = None
+
+        self.intervals = []
+        self.totals = {}
+
+        self.reads = 0
+
+    @staticmethod
+    def default_database():
+        if 'TIMEWARRIORDB' in os.environ:
+            return os.environ['TIMEWARRIORDB']
+
+        legacy = os.path.expanduser('~/.timewarrior')
+        if os.path.isdir(legacy):
+            return legacy
+
+        return os.path.expanduser('~/.local/share/timewarrior')
+
+    def data_paths(self, day_start, now):
+        """
+        Returns the paths of the data files containing today's intervals.
+        Today might have started in the previous file, since the files are
+        split by the UTC months.
+        """
+
+        months = set(time.strftime('%Y-%m', time.gmtime(timestamp))
+                     for timestamp in (day_start, now))
+
+        return [os.path.join(self.database, 'data', month + '.data')
+                for month in sorted(months)]
+
+    def reset(self, day_start, now):
+        """
+        Reloads today's intervals from scratch.
+        """
+
+        self.day_start = day_start
+        self.intervals = []
+        self.totals = {}
+
+        self.data_files = [DataFile(path)
+                           for path in self.data_paths(day_start, now)]
+
+        for data_file in self.data_files:
+            data_file.changed()
+            self.update(data_file.read()[1])
+
+    def update(self, closed):
+        self.reads += 1
+
+        for interval in closed:
+            if interval.end > self.day_start:
+                self.intervals.append(interval)
+                duration = interval.duration(self.day_start, interval.end)
+                for tag in interval.tags:
+                    self.totals[tag] = self.totals.get(tag, 0) + duration
+
+    @property
+    def open_interval(self):
+        for data_file in self.data_files:
+            if data_file.open_interval is not None:
+                return data_file.open_interval
+
+    def refresh(self):
+        """
+        Makes sure the in-memory state reflects the data files.
+        """
+
+        if self.checked_tick == self.context.tick:
+            return
+
+        self.checked_tick = self.context.tick
+
+        now = time.time()
+        day_start = time.mktime(datetime.date.today().timetuple())
+        paths = self.data_paths(day_start, now)
+
+        if (day_start != self.day_start or
+                paths != [data_file.path for data_file in self.data_files]):
+            self.reset(day_start, now)
+            return
+
+        for data_file in self.data_files:
+            if not data_file.changed():
+                continue
+
+            rewritten, closed = data_file.read()
+
+            if rewritten:
+                self.reset(day_start, now)
+                return
+
+            self.update(closed)
+
+    # Queries answered from the in-memory state
+
+    def activity(self):
+        """
+        Returns the tags of the open interval, or None if nothing is tracked.
+        """
+
+        self.refresh()
+
+        if self.open_interval is not None:
+            return self.open_interval.description
+
+    def activity_tags(self):
+        """
+        Returns the list of tags of the open interval, or None if nothing is
+        tracked.
+        """
+
+        self.refresh()
+
+        if self.open_interval is not None:
+            return self.open_interval.tags
+
+    def activity_duration(self):
+        """
+        Returns the duration of the open interval in seconds, or None if
+        nothing is tracked.
+        """
+
+        self.refresh()
+
+        if self.open_interval is not None:
+            return self.open_interval.duration(0, time.time())
+
+    def tag_totals(self):
+        """
+        Returns a dictionary mapping tags to the seconds tracked today.
+        """
+
+        self.refresh()
+        totals = dict(self.totals)
+
+        if self.open_interval is not None:
+            duration = self.open_interval.duration(self.day_start, time.time())
+            for tag in self.open_interval.tags:
+                totals[tag] = totals.get(tag, 0) + duration
+
+        return totals
+
+    def counters(self):
+        return {
+            'timewarrior_reads': self.reads,
+            'timewarrior_bytes_parsed': sum(data_file.bytes_parsed
+                                            for data_file in self.data_files),
+            'timewarrior_intervals_today': len(self.intervals),
+        }
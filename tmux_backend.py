@@ -0,0 +1,581 @@
+"""
+Provides snapshots of the sessions, windows and panes of the tmux server.
+
+Preferably, a persistent connection to the tmux server is used, using the
+tmux control mode (tmux -C). The state is kept in memory and refreshed over
+the same connection whenever tmux notifies us about a structural change,
+hence the tmux plugins do not need to spawn a tmux process on each
+evaluation. Otherwise, the state is obtained by a single bulk query.
+"""
+
+import collections
+import pipes
+import subprocess
+import threading
+import time
+
+import psutil
+
+from plugins import Backend
+from util import run
+
+
+TmuxSession = collections.namedtuple('TmuxSession', [
+    'name',
+    'attached',
+    'windows',
+])
+
+TmuxWindow = collections.namedtuple('TmuxWindow', [
+    'session_name',
+    'index',
+    'name',
+    'active',
+    'panes',
+])
+
+TmuxPane = collections.namedtuple('TmuxPane', [
+    'session_name',
+    'window_index',
+    'active',
+    'pane_id',
+    'pane_pid',
+])
+
+TmuxClient = collections.namedtuple('TmuxClient', [
+    'name',
+    'activity',
+    'session_name',
+])
+
+# All the fields needed to build the snapshot, obtained in a single
+# 'list-panes -a' query
+PANES_FORMAT = '\t'.join([
+    '#{session_name}',
+    '#{session_attached}',
+    '#{window_index}',
+    '#{window_name}',
+    '#{window_active}',
+    '#{pane_active}',
+    '#{pane_id}',
+    '#{pane_pid}',
+])
+
+CLIENTS_FORMAT = '\t'.join([
+    '#{client_control_mode}',
+    '#{client_name}',
+    '#{client_activity}',
+    '#{session_name}',
+])
+
+# Notifications that signal a change of the session, window or pane layout
+STRUCTURAL_NOTIFICATIONS = (
+    '%sessions-changed',
+    '%session-changed',
+    '%session-renamed',
+    '%session-window-changed',
+    '%client-session-changed',
+    '%client-detached',
+    '%window-add',
+    '%window-close',
+    '%window-renamed',
+    '%window-pane-changed',
+    '%unlinked-window-add',
+    '%unlinked-window-close',
+    '%layout-change',
+)
+
+
+class TmuxCommandError(Exception):
+    """
+    Raised when tmux reports an error for a command sent via control mode.
+    """
+    pass
+
+
+class TmuxRequest(object):
+    """
+    A command sent over the control connection, waiting for its response.
+    """
+
+    __slots__ = ('done', 'success', 'lines', 'abandoned')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.success = False
+        self.lines = []
+        self.abandoned = False
+
+    def complete(self, success, lines):
+        self.success = success
+        self.lines = lines
+        self.done.set()
+
+
+class TmuxControlClient(object):
+    """
+    A tmux client running in the control mode. Commands are written to its
+    standard input, responses are read back by a separate reader thread.
+
+    Each response is a block of lines between '%begin' and '%end' (or
+    '%error') guard lines, which carry the number of the command and a flag
+    telling whether the command was sent by this client. The responses to
+    our commands arrive in the order the commands were sent, hence they are
+    paired with the pending requests in that order. Requests that time out
+    are kept pending, so that their late responses are discarded rather
+    than paired with the following commands.
+    """
+
+    # Seconds to wait for a response from the tmux server
+    TIMEOUT = 2
+
+    # Connection is dropped once this many requests did not get a response
+    MAX_ABANDONED = 3
+
+    def __init__(self, socket_name=None, on_notification=None):
+        self.socket_name = socket_name
+        self.on_notification = on_notification or (lambda line: None)
+
+        self.process = None
+        self.pending = collections.deque()
+        self.lock = threading.Lock()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def tmux_args(self):
+        if self.socket_name:
+            return ['tmux', '-L', self.socket_name]
+        return ['tmux']
+
+    def start(self):
+        """
+        Attaches the control client to the tmux server. The client does not
+        receive pane output and does not affect the window sizes.
+        """
+
+        self.pending = collections.deque()
+        self.process = subprocess.Popen(
+            self.tmux_args() + ['-C', 'attach-session',
+                                '-f', 'ignore-size,no-output'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+
+        reader = threading.Thread(target=self.read_output,
+                                  args=(self.process, self.pending))
+        reader.daemon = True
+        reader.start()
+
+        # The response of the attach-session command itself is not ours to
+        # wait for, a no-op command confirms the connection instead
+        self.command('display-message', '-p', 'actor')
+
+    def stop(self):
+        if self.alive:
+            self.process.kill()
+            self.process.wait()
+
+    @staticmethod
+    def parse_guard(line):
+        """
+        Returns the command number and flags of the guard line.
+        """
+
+        try:
+            _, _, number, flags = line.split(' ')[:4]
+        except ValueError:
+            raise TmuxCommandError("Malformed guard line: %s" % line)
+
+        return number, flags
+
+    def read_output(self, process, pending):
+        """
+        Reads the output of the control client, separating the command
+        responses from the notifications.
+        """
+
+        block, number, flags = None, None, None
+
+        try:
+            for line in iter(process.stdout.readline, ''):
+                line = line.rstrip('\n')
+
+                if block is None and line.startswith('%begin'):
+                    block = []
+                    number, flags = self.parse_guard(line)
+                elif block is not None and line.startswith(('%end',
+                                                            '%error')):
+                    if self.parse_guard(line)[0] != number:
+                        raise TmuxCommandError("Unmatched guard line: %s"
+                                               % line)
+
+                    # Responses to the commands of other clients (i.e. the
+                    # attach-session command) are not ours
+                    if flags == '1':
+                        self.respond(pending, line.startswith('%end'), block)
+
+                    block = None
+                elif block is not None:
+                    block.append(line)
+                else:
+                    self.on_notification(line)
+        except TmuxCommandError:
+            # The pairing of the responses cannot be trusted anymore
+            process.kill()
+
+        # Unblock anyone waiting for the response
+        while pending:
+            pending.popleft().complete(False, ['tmux control client exited'])
+
+    def respond(self, pending, success, lines):
+        if not pending:
+            raise TmuxCommandError("Response to an unknown command")
+
+        request = pending.popleft()
+        if not request.abandoned:
+            request.complete(success, lines)
+
+    def command(self, *args):
+        """
+        Sends the command to the tmux server and returns the lines of the
+        response.
+        """
+
+        with self.lock:
+            if not self.alive:
+                raise TmuxCommandError("tmux control client is not running")
+
+            request = TmuxRequest()
+            self.pending.append(request)
+
+            line = ' '.join(pipes.quote(str(arg)) for arg in args)
+
+            try:
+                self.process.stdin.write(line + '\n')
+                self.process.stdin.flush()
+            except IOError as exc:
+                # The tmux server exited, the reader thread completes the
+                # pending requests once the client is gone
+                self.stop()
+                raise TmuxCommandError("tmux control client disconnected: "
+                                       "%s" % exc)
+
+        if not request.done.wait(self.TIMEOUT):
+            request.abandoned = True
+
+            if sum(1 for r in list(self.pending)
+                   if r.abandoned) >= self.MAX_ABANDONED:
+                self.stop()
+
+            raise TmuxCommandError("No response from the tmux server")
+
+        if not request.success:
+            raise TmuxCommandError('\n'.join(request.lines))
+
+        return request.lines
+
+
+class TmuxSnapshot(object):
+    """
+    A typed view of the sessions, windows and panes of the tmux server,
+    built from the output of a single 'list-panes -a' query.
+
+    If attached_sessions is given, it overrides the attached flags reported
+    by tmux (which count the control mode client as well).
+    """
+
+    def __init__(self, lines=tuple(), attached_sessions=None):
+        self.sessions = []
+        sessions = {}
+        windows = {}
+
+        for line in lines:
+            (session_name, session_attached, window_index, window_name,
+             window_active, pane_active, pane_id, pane_pid) = line.split('\t')
+
+            session = sessions.get(session_name)
+            if session is None:
+                if attached_sessions is not None:
+                    attached = session_name in attached_sessions
+                else:
+                    attached = session_attached not in ('', '0')
+
+                session = TmuxSession(session_name, attached, [])
+                sessions[session_name] = session
+                self.sessions.append(session)
+
+            window = windows.get((session_name, window_index))
+            if window is None:
+                window = TmuxWindow(session_name, int(window_index),
+                                    window_name, window_active == '1', [])
+                windows[(session_name, window_index)] = window
+                session.windows.append(window)
+
+            window.panes.append(TmuxPane(session_name, window.index,
+                                         pane_active == '1', pane_id,
+                                         int(pane_pid)))
+
+    @property
+    def attached_sessions(self):
+        return [session for session in self.sessions if session.attached]
+
+    @property
+    def active_windows(self):
+        """
+        Returns the active window of each attached session.
+        """
+
+        return [window
+                for session in self.attached_sessions
+                for window in session.windows
+                if window.active]
+
+    @property
+    def active_panes(self):
+        """
+        Returns the active pane of each active window.
+        """
+
+        return [pane
+                for window in self.active_windows
+                for pane in window.panes
+                if pane.active]
+
+
+class TmuxBackend(Backend):
+    """
+    Provides snapshots of the state of the tmux server.
+
+    Preferably, the state is kept in memory using a tmux control mode
+    client. It is refreshed over the control connection after a structural
+    notification, or after MAX_AGE seconds at the latest, to pick up changes
+    tmux does not notify about (i.e. attaching clients).
+
+    If the control mode is not available (the server is not running, or
+    the tmux version is older than 3.2), the snapshot is obtained using a
+    single 'tmux list-panes -a' call per evaluation round and the connection
+    attempt is repeated after RECONNECT_INTERVAL seconds.
+    """
+
+    MAX_AGE = 10
+    RECONNECT_INTERVAL = 30
+
+    def __init__(self, context, socket_name=None):
+        super(TmuxBackend, self).__init__(context)
+
+        self.client = TmuxControlClient(socket_name, self.handle_notification)
+        self.last_connect_attempt = None
+        self.last_refresh = None
+        self.control_mode = None
+        self.dirty = True
+
+        self.state = TmuxSnapshot()
+        self.state_tick = None
+        self.clients = []
+
+        self.processes = []
+        self.processes_tick = None
+
+        self.notifications = 0
+        self.refreshes = 0
+        self.commands = 0
+        self.queries = 0
+
+    def supports_control_mode(self):
+        """
+        Returns True if the installed tmux supports the control mode flags
+        we need (tmux 3.2 or newer).
+        """
+
+        if self.control_mode is None:
+            output = run(self.client.tmux_args() + ['-V'])[0]
+
+            try:
+                major, minor = output.split()[-1].split('.')[:2]
+                version = (int(major), int(minor.rstrip('abcdefghi')))
+                self.control_mode = version >= (3, 2)
+            except (IndexError, ValueError):
+                self.control_mode = False
+
+        return self.control_mode
+
+    @property
+    def connected(self):
+        """
+        Returns True if the control client is connected to the tmux server.
+        Tries to (re)connect if it is not.
+        """
+
+        if self.client.alive:
+            return True
+
+        now = time.time()
+        if (self.last_connect_attempt is not None and
+                now - self.last_connect_attempt < self.RECONNECT_INTERVAL):
+            return False
+
+        self.last_connect_attempt = now
+
+        try:
+            if not self.supports_control_mode():
+                return False
+            self.client.start()
+            self.dirty = True
+            self.debug("Connected to the tmux server in the control mode.")
+            return True
+        except (OSError, TmuxCommandError) as exc:
+            self.debug("Could not connect to the tmux server: %s", exc)
+            self.client.stop()
+            return False
+
+    def handle_notification(self, line):
+        self.notifications += 1
+
+        if line.split(' ', 1)[0] in STRUCTURAL_NOTIFICATIONS:
+            self.dirty = True
+
+    def refresh(self):
+        """
+        Reloads the state of the tmux server over the control connection,
+        if the state could have changed.
+        """
+
+        outdated = (self.last_refresh is None or
+                    time.time() - self.last_refresh > self.MAX_AGE)
+
+        if not (self.dirty or outdated):
+            return
+
+        # Clear the flag first, not to miss notifications arriving during
+        # the refresh itself
+        self.dirty = False
+        self.refreshes += 1
+
+        pane_lines = self.command('list-panes', '-a', '-F', PANES_FORMAT)
+        client_lines = self.command('list-clients', '-F', CLIENTS_FORMAT)
+
+        try:
+            # Our own control client must not be considered to be a user
+            clients = []
+            for line in client_lines:
+                control_mode, name, activity, session_name = line.split('\t')
+                if control_mode != '1':
+                    clients.append(TmuxClient(name, int(activity),
+                                              session_name))
+
+            attached = set(client.session_name for client in clients)
+            state = TmuxSnapshot(pane_lines, attached_sessions=attached)
+        except ValueError:
+            # Responses do not correspond to the commands, the connection
+            # cannot be trusted
+            self.client.stop()
+            self.dirty = True
+            raise TmuxCommandError("Malformed response of the tmux server")
+
+        self.clients = clients
+        self.state = state
+        self.last_refresh = time.time()
+
+    def query(self):
+        """
+        Obtains the state of the tmux server using a single tmux call.
+        """
+
+        self.queries += 1
+        output, _, code = run(self.client.tmux_args() +
+                              ['list-panes', '-a', '-F', PANES_FORMAT])
+
+        # Non-zero exit code means there is no tmux server running
+        lines = output.splitlines() if code == 0 else []
+
+        try:
+            self.state = TmuxSnapshot(lines)
+        except ValueError:
+            self.warning("Malformed output of tmux list-panes: %r", output)
+            self.state = TmuxSnapshot()
+
+        self.clients = []
+
+    def ready(self):
+        """
+        Returns True if the in-memory state is up to date and can be used
+        to answer the queries.
+        """
+
+        if not self.connected:
+            return False
+
+        try:
+            self.refresh()
+            return True
+        except TmuxCommandError as exc:
+            self.debug("Could not refresh the tmux state: %s", exc)
+            return False
+
+    def snapshot(self):
+        """
+        Returns the current TmuxSnapshot. Without the control mode, tmux is
+        queried at most once per evaluation round.
+        """
+
+        if not self.ready() and self.state_tick != self.context.tick:
+            self.query()
+
+        self.state_tick = self.context.tick
+        return self.state
+
+    def active_processes(self):
+        """
+        Returns a list of psutil.Process objects of the processes running in
+        the active panes, together with their direct children. Computed at
+        most once per evaluation round.
+        """
+
+        if self.processes_tick == self.context.tick:
+            return self.processes
+
+        self.processes = []
+
+        for pane in self.snapshot().active_panes:
+            try:
+                process = psutil.Process(pane.pane_pid)
+                self.processes.append(process)
+                self.processes.extend(process.children())
+            except psutil.NoSuchProcess:
+                pass
+
+        self.processes_tick = self.context.tick
+        return self.processes
+
+    def command(self, *args):
+        """
+        Runs a tmux command, over the control connection if possible.
+        """
+
+        self.commands += 1
+
+        if self.connected:
+            return self.client.command(*args)
+
+        return run(self.client.tmux_args() + list(args))[0].splitlines()
+
+    def latest_client(self):
+        """
+        Returns the most recently active client, or None if there is none.
+        Available only in the control mode.
+        """
+
+        if self.clients:
+            return max(self.clients, key=lambda client: client.activity)
+
+    def counters(self):
+        return {
+            'tmux_connected': self.client.alive,
+            'tmux_notifications': self.notifications,
+            'tmux_refreshes': self.refreshes,
+            'tmux_queries': self.queries,
+            'tmux_commands': self.commands,
+        }
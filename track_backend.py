@@ -0,0 +1,287 @@
+"""
+Provides indexed access to the values recorded by the trackers.
+
+Each tracker stores its values in the CONFIG_DIR/<ident>.act file, one
+'key: value' line per record. If a key is recorded more than once, the first
+record wins. The file is read into an in-memory index, and new records are
+appended to it in batches, at the end of the evaluation round. The file is
+read again only if it was changed by someone else, which is checked at most
+once per round.
+
+Files with many superseded records are compacted after we append to them,
+never when they are only read; other lines (i.e. comments) are kept as they
+are.
+"""
+
+import bisect
+import os
+
+from config import CONFIG_DIR
+from plugins import Backend
+
+
+class TrackStore(object):
+    """
+    The records of a single tracker. Lookups are answered from the index,
+    new records are kept in the journal until flushed to the file.
+    """
+
+    # Compact the file if it contains at least COMPACT_MIN_LINES lines and
+    # more than COMPACT_RATIO times as many lines as there are distinct keys
+    COMPACT_MIN_LINES = 100
+    COMPACT_RATIO = 2
+
+    def __init__(self, path):
+        self.path = path
+        self.index = {}
+        self.keys = []      # Sorted, for prefix lookups
+        self.journal = []
+        self.lines = 0
+
+        # (mtime, size, inode) of the file, as last read or written by us
+        self.stat = None
+
+        # Incremented on each change of the index
+        self.version = 0
+
+        self.load()
+
+    def file_stat(self):
+        try:
+            stat = os.stat(self.path)
+            return (stat.st_mtime, stat.st_size, stat.st_ino)
+        except OSError:
+            return None
+
+    def ends_with_newline(self):
+        """
+        Returns False if the last line of the file is not terminated.
+        """
+
+        try:
+            with open(self.path, 'rb') as fil:
+                fil.seek(-1, os.SEEK_END)
+                return fil.read(1) == '\n'
+        except IOError:
+            # The file does not exist or is empty
+            return True
+
+    def read(self):
+        """
+        Yields the lines of the file, each together with its parsed key and
+        value, or None if the line is not a record.
+        """
+
+        try:
+            with open(self.path, 'r') as fil:
+                for line in fil:
+                    key, separator, value = (line.decode('utf-8', 'replace')
+                                             .partition(':'))
+                    if separator:
+                        yield line, (key.strip(), value.strip())
+                    else:
+                        yield line, None
+        except IOError:
+            pass
+
+    def load(self):
+        # Taken before reading, so that changes made meanwhile are noticed
+        self.stat = self.file_stat()
+        self.index = {}
+        self.lines = 0
+
+        for _, record in self.read():
+            if record is not None:
+                self.index.setdefault(*record)
+                self.lines += 1
+
+        # The records that were not written yet
+        for key, value in self.journal:
+            self.index.setdefault(key, value)
+
+        self.keys = sorted(self.index)
+
+    def compaction_needed(self):
+        return (self.lines >= self.COMPACT_MIN_LINES and
+                self.lines > self.COMPACT_RATIO * len(self.index))
+
+    def refresh(self):
+        """
+        Reads the file again, if it was changed by someone else.
+        """
+
+        if self.file_stat() != self.stat:
+            self.load()
+            self.version += 1
+
+    def get(self, key):
+        """
+        Returns the value recorded for the given key. If there is no such key,
+        the value of the first key (in the sorted order) starting with the
+        given key is returned, i.e. '2024-05-01' matches '2024-05-01 10.00'.
+        """
+
+        value = self.index.get(key)
+        if value is not None:
+            return value
+
+        position = bisect.bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position].startswith(key):
+            return self.index[self.keys[position]]
+
+    def record(self, key, value):
+        """
+        Records the value. The value of a key recorded already is written
+        out, but does not replace the first one.
+        """
+
+        key, value = unicode(key).strip(), unicode(value).strip()
+
+        if key not in self.index:
+            bisect.insort(self.keys, key)
+            self.index[key] = value
+            self.version += 1
+
+        self.journal.append((key, value))
+
+    def flush(self):
+        """
+        Appends the journal to the file, and compacts the file if needed.
+        Returns the number of written records.
+        """
+
+        if not self.journal:
+            return 0
+
+        changed = self.file_stat() != self.stat
+        separated = self.ends_with_newline()
+
+        with open(self.path, 'a') as fil:
+            # The last line of a hand-edited file might not be terminated
+            if not separated:
+                fil.write('\n')
+
+            for key, value in self.journal:
+                fil.write(u"{0}: {1}\n".format(key, value).encode('utf-8'))
+
+        written = len(self.journal)
+        self.lines += written
+        self.journal = []
+
+        if changed:
+            self.load()
+            self.version += 1
+        else:
+            self.stat = self.file_stat()
+
+        if self.compaction_needed():
+            self.compact()
+
+        return written
+
+    def compact(self):
+        """
+        Rewrites the file to contain one line per key, at the place of its
+        first record. Lines that are not records are kept. The file is
+        replaced atomically, so that a crash cannot lose the records.
+        """
+
+        temporary = self.path + '.tmp'
+        written = set()
+
+        with open(temporary, 'w') as fil:
+            for line, record in self.read():
+                if record is not None and record[0] in self.index:
+                    key = record[0]
+                    if key in written:
+                        continue
+
+                    written.add(key)
+                    line = u"{0}: {1}\n".format(key, self.index[key])
+                    line = line.encode('utf-8')
+                elif not line.endswith('\n'):
+                    line += '\n'
+
+                fil.write(line)
+
+            for key in self.keys:
+                if key not in written:
+                    line = u"{0}: {1}\n".format(key, self.index[key])
+                    fil.write(line.encode('utf-8'))
+
+        os.rename(temporary, self.path)
+        self.stat = self.file_stat()
+
+        self.lines = len(self.keys)
+        self.journal = []
+
+
+class TrackBackend(Backend):
+    """
+    Keeps the TrackStores of all the trackers, loaded on first access.
+    """
+
+    directory = CONFIG_DIR
+
+    def __init__(self, context):
+        super(TrackBackend, self).__init__(context)
+
+        self.stores = {}
+        self.checked_tick = None
+
+        self.lookups = 0
+        self.records = 0
+        self.written = 0
+
+    def store(self, ident):
+        store = self.stores.get(ident)
+
+        if store is None:
+            path = os.path.join(self.directory, ident + ".act")
+            store = self.stores[ident] = TrackStore(path)
+
+        return store
+
+    def refresh(self):
+        """
+        Reloads the stores changed by someone else. Performed at most once
+        per evaluation round.
+        """
+
+        if self.checked_tick == self.context.tick:
+            return
+
+        self.checked_tick = self.context.tick
+
+        for store in self.stores.values():
+            store.refresh()
+
+    def get(self, ident, key):
+        self.lookups += 1
+        self.refresh()
+        return self.store(ident).get(key)
+
+    def record(self, ident, key, value):
+        self.records += 1
+        self.refresh()
+        self.store(ident).record(key, value)
+
+    def flush(self):
+        for store in self.stores.values():
+            try:
+                self.written += store.flush()
+            except (IOError, OSError) as exc:
+                self.warning("Could not write %s: %s", store.path, exc)
+
+    def compact(self):
+        self.flush()
+
+        for store in self.stores.values():
+            store.compact()
+
+    def counters(self):
+        return {
+            'track_lookups': self.lookups,
+            'track_records': self.records,
+            'track_lines_written': self.written,
+        }
@@ -1,5 +1,3 @@
-import datetime
-
 from plugins import Plugin, PluginMount
 from util import Periodic
 
@@ -19,6 +17,7 @@ class Tracker(Plugin):
         super(Tracker, self).__init__(*args, **kwargs)
 
         self.prompt = self.factory_fix('prompt')
+        self.availability_second = None
 
     @property
     def recorded(self):
@@ -26,12 +25,15 @@ class Tracker(Plugin):
 
     @property
     def obtainable(self):
-        line = datetime.datetime.strptime(self.availability, "%H:%M").time()
-        return datetime.datetime.now().time() > line
+        if self.availability_second is None:
+            hours, minutes = self.availability.split(':')
+            self.availability_second = int(hours) * 3600 + int(minutes) * 60
+
+        return self.context.clock.second_of_day > self.availability_second
 
     @property
     def key(self):
-        return datetime.datetime.now().strftime("%Y-%m-%d")
+        return self.context.clock.today.isoformat()
 
     def process_value(self, value):
         return value
@@ -109,7 +111,7 @@ class IntervalTracker(Tracker):
 
     @property
     def key(self):
-        return datetime.datetime.now().strftime("%Y-%m-%d %H.%M")
+        return self.context.clock.now.strftime("%Y-%m-%d %H.%M")
 
     def run(self):
         if self.obtainable:
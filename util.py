@@ -1,7 +1,86 @@
+import bisect
+import ctypes
+import ctypes.util
 import datetime
 import dbus
-import subprocess
+import os
 import sys
+import time
+
+
+class timespec(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+
+# Boot time clock is monotonic, but unlike CLOCK_MONOTONIC, it keeps running
+# while the system is suspended
+CLOCK_MONOTONIC = 1
+CLOCK_BOOTTIME = 7
+
+
+def monotonic_source():
+    """
+    Returns a function returning the seconds on a monotonic clock. Falls
+    back to the wall clock if clock_gettime is not available.
+    """
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = libc.clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+
+    value = timespec()
+
+    for clock_id in (CLOCK_BOOTTIME, CLOCK_MONOTONIC):
+        if clock_gettime(clock_id, ctypes.byref(value)) == 0:
+            break
+    else:
+        return time.time
+
+    def monotonic():
+        clock_gettime(clock_id, ctypes.byref(value))
+        return value.tv_sec + value.tv_nsec * 1e-9
+
+    return monotonic
+
+
+monotonic = monotonic_source()
+
+
+class Clock(object):
+    """
+    A snapshot of the current time, taken once per evaluation round, so that
+    all the plugins work with the same moment and do not need to query and
+    convert the time on their own.
+
+    Provides the monotonic time (for measuring durations, unaffected by
+    the changes of the system clock) and the wall time, pre-split into the
+    commonly used parts.
+    """
+
+    def __init__(self):
+        self.update()
+
+    def update(self):
+        self.monotonic = monotonic()
+        self.now = datetime.datetime.now()
+        self.today = self.now.date()
+        self.weekday = self.now.weekday()    # Monday is 0
+        self.minute_of_day = self.now.hour * 60 + self.now.minute
+        self.second_of_day = (self.minute_of_day * 60 + self.now.second +
+                              self.now.microsecond / 1e6)
+
+    def moment(self, seconds):
+        """
+        Converts the given point on the monotonic clock to the wall time.
+        """
+
+        return self.now + datetime.timedelta(seconds=seconds - self.monotonic)
+
+
+# The clock shared by the whole Actor, updated by the Context
+CLOCK = Clock()
 
 
 class Periodic(object):
@@ -16,13 +95,14 @@ class Periodic(object):
     """
 
     def __init__(self, minutes, automatic_intervals=True):
-        self.period = datetime.timedelta(minutes=minutes)
-        self.last_execution = datetime.datetime.fromtimestamp(0)
+        self.period = minutes * 60
+        self.last_execution = None
         self.automatic = automatic_intervals
 
     def __nonzero__(self):
-        now = datetime.datetime.now()
-        if now - self.period >= self.last_execution:
+        now = CLOCK.monotonic
+        if (self.last_execution is None or
+                now - self.period >= self.last_execution):
             # Mark the start of a new interval if automatic intervals are
             # desired
             if self.automatic:
@@ -32,7 +112,17 @@ class Periodic(object):
             return False
 
     def start_new_interval(self):
-        self.last_execution = datetime.datetime.now()
+        self.last_execution = CLOCK.monotonic
+
+    def next_change(self):
+        """
+        Returns the moment when the object evaluates to True again.
+        """
+
+        if self.last_execution is None:
+            return CLOCK.now
+
+        return CLOCK.moment(self.last_execution + self.period)
 
 
 class Expiration(object):
@@ -40,16 +130,24 @@ class Expiration(object):
     A helper class to abstract away handling of expiring time intervals.
 
     Returns False until 'minutes' have passed since its initialization.
+    The expiration is measured on the monotonic clock, and evaluated against
+    the clock snapshot of the current round. Objects created after the
+    snapshot was taken (i.e. from the D-Bus methods, or in the middle of the
+    round) consider the snapshot to be the moment of their creation.
     """
 
     def __init__(self, minutes=0):
         self.interval = datetime.timedelta(minutes=minutes)
-        self.expiration_point = datetime.datetime.now() + self.interval
+        self.started = monotonic()
+        self.expiration_point = self.started + self.duration
         self.expiration_notified = False
 
+    @property
+    def now(self):
+        return max(CLOCK.monotonic, self.started)
+
     def __nonzero__(self):
-        now = datetime.datetime.now()
-        return now >= self.expiration_point
+        return self.now >= self.expiration_point
 
     def just_expired(self):
         """
@@ -68,34 +166,207 @@ class Expiration(object):
 
     @property
     def passed(self):
-        delta = datetime.datetime.now() + self.interval - self.expiration_point
-        return delta.total_seconds()
+        return self.duration - self.remaining
 
     @property
     def remaining(self):
-        delta =  self.expiration_point - datetime.datetime.now()
-        return delta.total_seconds()
+        return self.expiration_point - self.now
 
     @property
     def duration(self):
         return self.interval.total_seconds()
 
+    def next_change(self):
+        """
+        Returns the moment of the expiration, or None if the object has
+        already expired.
+        """
 
-def run(args):
-    child = subprocess.Popen(
-        [str(arg) for arg in args],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE
-    )
-    stdout, stderr = child.communicate()
-    code = child.returncode
+        if not self:
+            return CLOCK.moment(self.expiration_point)
+
+
+def earliest(*moments):
+    """
+    Returns the earliest of the given moments, ignoring None values. Returns
+    None if no moment was given.
+    """
+
+    moments = [moment for moment in moments if moment is not None]
+    return min(moments) if moments else None
+
+
+def seconds_since_midnight(timestamp):
+    """
+    Converts timestamp ("%H.%M" string, datetime.time or datetime.datetime
+    object) to the number of seconds since midnight.
+    """
+
+    if isinstance(timestamp, basestring):
+        timestamp = datetime.datetime.strptime(timestamp, "%H.%M")
+
+    return (timestamp.hour * 3600 + timestamp.minute * 60 +
+            timestamp.second + timestamp.microsecond / 1e6)
+
+
+class IntervalIndex(object):
+    """
+    An index of the daily time windows used by the checkers. Provides the
+    next moment when any of the windows starts or ends, i.e. the moment
+    when a time-based check can change its value.
+
+    The sorted list of boundaries is recompiled only when a new window is
+    added, which happens during the first evaluation of each check.
+    """
 
-    return stdout, stderr, code
+    def __init__(self):
+        self.windows = set()
+        self.boundaries = []
+
+    def add(self, start, end):
+        """
+        Adds the window given by start and end, in seconds since midnight.
+        """
+
+        if (start, end) in self.windows:
+            return
+
+        self.windows.add((start, end))
+        self.boundaries = sorted(set(boundary
+                                     for window in self.windows
+                                     for boundary in window))
+
+    def next_boundary(self, now=None):
+        """
+        Returns the first window boundary after the given moment (now by
+        default) as a datetime object, or None if there are no windows.
+        """
+
+        if not self.boundaries:
+            return None
+
+        now = now or CLOCK.now
+        midnight = datetime.datetime.combine(now.date(), datetime.time())
+        position = bisect.bisect_right(self.boundaries,
+                                       seconds_since_midnight(now))
+
+        if position < len(self.boundaries):
+            offset = self.boundaries[position]
+        else:
+            offset = self.boundaries[0] + 24 * 3600
+
+        return midnight + datetime.timedelta(seconds=offset)
+
+
+class VerdictCache(object):
+    """
+    A helper class that remembers the verdict reached for a particular
+    process, so that long-lived processes are judged only once per activity.
+
+    Verdicts are keyed by the identity of the process (pid, creation time,
+    and the inode of its executable, which changes on exec) and the activity
+    identifier. The key is cheaper to compute than the judgement, i.e.
+    reading the command line of the process.
+    Entries of processes that were not seen during the last round are dropped
+    by calling prune().
+    """
+
+    def __init__(self):
+        self.verdicts = {}
+        self.seen = set()
+        self.checks_avoided = 0
+        self.checks_performed = 0
+
+    @staticmethod
+    def executable(pid):
+        """
+        Returns the device and inode of the executable of the process, or
+        None if it cannot be determined.
+        """
+
+        try:
+            stat = os.stat('/proc/%d/exe' % pid)
+            return (stat.st_dev, stat.st_ino)
+        except OSError:
+            return None
+
+    def key(self, process, activity):
+        # The creation time is cached by psutil.Process
+        return (process.pid, process.create_time(),
+                self.executable(process.pid), activity)
+
+    def get(self, process, activity, judge):
+        """
+        Returns the verdict for the given process. The judge callable is
+        invoked only if no verdict has been cached for the process yet.
+        """
+
+        key = self.key(process, activity)
+        self.seen.add(key)
+
+        if key in self.verdicts:
+            self.checks_avoided += 1
+            return self.verdicts[key]
+
+        self.checks_performed += 1
+        self.verdicts[key] = verdict = judge(process)
+        return verdict
+
+    def prune(self):
+        """
+        Drops verdicts for processes that were not seen since the last prune.
+        """
+
+        for key in set(self.verdicts) - self.seen:
+            del self.verdicts[key]
+
+        self.seen.clear()
+
+    def clear(self):
+        self.verdicts.clear()
+        self.seen.clear()
+
+    def counters(self):
+        return {
+            'verdicts_cached': len(self.verdicts),
+            'verdict_checks_avoided': self.checks_avoided,
+            'verdict_checks_performed': self.checks_performed,
+        }
+
+
+def run(args, timeout=None):
+    """
+    Runs the command and returns its stdout, stderr and return code. The
+    command is killed after the timeout (RUN_TIMEOUT seconds by default).
+    """
+
+    # Imported here, since process_manager depends on this module
+    from process_manager import PROCESSES, RUN_TIMEOUT
+
+    return PROCESSES.run(args,
+                         timeout if timeout is not None else RUN_TIMEOUT)
+
+
+def run_async(args, timeout=None, callback=None):
+    """
+    Runs the command in the background, and returns the Process. The
+    callback, if given, is called with the return code, stdout and stderr.
+    """
+
+    from process_manager import PROCESSES
+
+    return PROCESSES.spawn(args, timeout=timeout, callback=callback)
+
+
+def run_detached(args):
+    """
+    Starts the long-lived command (i.e. an application) in the background,
+    and returns the Process, or None if it could not be started.
+    """
 
+    from process_manager import PROCESSES
 
-def run_async(args):
-    child = subprocess.Popen([str(arg) for arg in args])
-    return child
+    return PROCESSES.detach(args)
 
 
 def convert_timestamp(timestamp):
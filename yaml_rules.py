@@ -0,0 +1,461 @@
+"""
+Provides the rules defined in the YAML rule files.
+
+Each rule file contains a list of rules in the following form:
+
+    - Morning exercise break:
+        reporters:
+        - active_window_name:
+        checkers:
+        - TimeIntervalChecker:
+            start: "9.30"
+            end: "10.00"
+        - regular_expression:
+            regexp: "Firefox"
+            string: $active_window_name
+        fixers:
+        - LockScreenFixer:
+
+Plugins are referred to either by their identifiers or by their class names.
+The values of the reporters listed in a rule can be passed to the checkers
+and fixers of the rule as '$<reporter>' arguments. Fixers are run if all the
+checkers evaluate to True. The checkers are evaluated lazily, in the order
+given by their measured cost and selectivity (see the CostBackend).
+
+Rules can also declare the activation guards of the Rule class (activities,
+flows, weekdays, time_windows and session_locked) as keys of the rule.
+
+The rule file is compiled into a plan: the list of the distinct reporter and
+checker invocations (nodes), and the rules referring to them. The nodes are
+evaluated at most once per round, and shared between all the rules using
+the same invocation, even across the rule files. Only the nodes of the
+stateful plugins are kept separate for each rule. The compiled plans are
+cached on disk, keyed by the hash of the rule file. A cached plan is used
+only if the plugins it refers to still resolve to the same identifiers and
+flags.
+"""
+
+import datetime
+import hashlib
+import marshal
+import os
+import re
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from cost_backend import CostBackend
+from manifest import MANIFEST
+from plugins import Backend, Checker, Fixer, Reporter, Rule
+
+# Version of the plan format, part of the key of the cached plans
+PLAN_VERSION = 3
+
+REFERENCE_PREFIX = '$'
+
+GUARDS = ('activities', 'flows', 'weekdays', 'time_windows', 'session_locked')
+
+# Arguments holding the times of the day, in the "%H.%M" format
+TIME_ARGUMENTS = ('start', 'end')
+
+MOUNTS = {
+    'reporters': Reporter,
+    'checkers': Checker,
+    'fixers': Fixer,
+}
+
+
+class RuleSyntaxError(Exception):
+    pass
+
+
+def find_plugin(mount, name):
+    """
+    Returns the plugin class of the given mount, identified either by its
+    identifier or by its class name, or None if there is no such plugin.
+    """
+
+    def lookup():
+        for plugin_class in mount.plugins:
+            if name in (plugin_class.identifier, plugin_class.__name__):
+                return plugin_class
+
+    plugin_class = lookup()
+
+    # The module defining the plugin might not have been imported yet
+    if plugin_class is None and MANIFEST.load(mount.package, name):
+        plugin_class = lookup()
+
+    return plugin_class
+
+
+def entries(body, section):
+    """
+    Returns the list of (name, arguments) of the plugins listed in the given
+    section of the rule.
+    """
+
+    result = []
+
+    for entry in body.get(section) or []:
+        if isinstance(entry, basestring):
+            entry = {entry: None}
+
+        if not isinstance(entry, dict) or len(entry) != 1:
+            raise RuleSyntaxError("Invalid {0} entry: {1!r}"
+                                  .format(section, entry))
+
+        name, arguments = list(entry.items())[0]
+        arguments = arguments or {}
+
+        if not isinstance(arguments, dict):
+            raise RuleSyntaxError("Arguments of {0} must be a mapping"
+                                  .format(name))
+
+        result.append((name, arguments))
+
+    return result
+
+
+def freeze(value, time=False):
+    """
+    Converts the lists in the argument value into tuples, so that the value
+    can be used as a key. Times of the day must be given as strings, since
+    YAML reads unquoted 9.30 as a float and 10:00 as an integer.
+    """
+
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item, time) for item in value)
+    elif isinstance(value, dict):
+        raise RuleSyntaxError("Mappings are not supported as argument values")
+    elif isinstance(value, (datetime.date, datetime.datetime)):
+        raise RuleSyntaxError("Dates are not supported as argument values, "
+                              "quote {0}".format(value))
+    elif time and not isinstance(value, basestring):
+        raise RuleSyntaxError('Times must be quoted, i.e. "9.30", not {0!r}'
+                              .format(value))
+
+    return value
+
+
+def compile_rules(document):
+    """
+    Compiles the parsed YAML document into a plan, a dictionary of:
+      - nodes - list of (kind, identifier, arguments, shared) tuples, where
+        arguments is a tuple of (key, value, reference) and reference is
+        the index of the node providing the value, or None
+      - rules - list of (name, checks, fixes, guards) tuples, where checks
+        are the indexes of the checker nodes, fixes are (identifier,
+        arguments) and guards is the dictionary of the activation guards
+      - plugins - list of (section, name, identifier, shared) tuples, the
+        resolution of the plugin names the plan depends on
+    """
+
+    if isinstance(document, dict):
+        document = [{name: body} for name, body in sorted(document.items())]
+
+    nodes = []
+    indexes = {}
+
+    def add_node(node):
+        if node not in indexes:
+            indexes[node] = len(nodes)
+            nodes.append(node)
+
+        return indexes[node]
+
+    def compile_arguments(arguments, references):
+        compiled = []
+
+        for key, value in sorted(arguments.items()):
+            reference = None
+
+            if (isinstance(value, basestring) and
+                    value.startswith(REFERENCE_PREFIX)):
+                reference = references.get(value[len(REFERENCE_PREFIX):])
+                if reference is None:
+                    raise RuleSyntaxError("Unknown reporter {0}".format(value))
+                value = None
+
+            compiled.append((str(key), freeze(value, key in TIME_ARGUMENTS),
+                             reference))
+
+        return tuple(compiled)
+
+    plugins = set()
+
+    def resolve(section, name):
+        identifier, shared = resolve_plugin(section, name)
+        plugins.add((section, name, identifier, shared))
+        return identifier, shared
+
+    rules = []
+
+    for item in document or []:
+        if not isinstance(item, dict) or len(item) != 1:
+            raise RuleSyntaxError("Invalid rule: {0!r}".format(item))
+
+        name, body = list(item.items())[0]
+        body = body or {}
+        references = {}
+
+        for reporter, arguments in entries(body, 'reporters'):
+            identifier, shared = resolve('reporters', reporter)
+            index = add_node(('reporters', identifier,
+                              compile_arguments(arguments, references),
+                              shared))
+            references[reporter] = references[identifier] = index
+
+        checks = []
+        for checker, arguments in entries(body, 'checkers'):
+            identifier, shared = resolve('checkers', checker)
+            checks.append(add_node(('checkers', identifier,
+                                    compile_arguments(arguments, references),
+                                    shared)))
+
+        fixes = []
+        for fixer, arguments in entries(body, 'fixers'):
+            identifier, _ = resolve('fixers', fixer)
+            fixes.append((identifier,
+                          compile_arguments(arguments, references)))
+
+        guards = dict((guard, freeze(body[guard], guard == 'time_windows'))
+                      for guard in GUARDS if body.get(guard) is not None)
+
+        rules.append((unicode(name), tuple(checks), tuple(fixes), guards))
+
+    return {'nodes': nodes, 'rules': rules, 'plugins': sorted(plugins)}
+
+
+def resolve_plugin(section, name):
+    """
+    Returns the identifier of the plugin with the given name, and whether
+    its invocations can be shared between the rules.
+    """
+
+    plugin_class = find_plugin(MOUNTS[section], name)
+
+    if plugin_class is None:
+        raise RuleSyntaxError("No such {0}: {1}".format(section[:-1], name))
+
+    # Invocations of the stateless plugins can be shared between rules
+    shared = plugin_class.stateless and not plugin_class.side_effects
+    return plugin_class.identifier, shared
+
+
+def plan_valid(plan):
+    """
+    Returns True if the plugins of the cached plan still resolve the same,
+    i.e. they were not renamed and their flags did not change.
+    """
+
+    try:
+        return all(resolve_plugin(section, name) == (identifier, shared)
+                   for section, name, identifier, shared in plan['plugins'])
+    except RuleSyntaxError:
+        return False
+
+
+def load_plan(path, cache_dir=None):
+    """
+    Returns the compiled plan of the given rule file, from the cache if
+    possible. The cached plans are named by the rule file and the hash of
+    its content; the stale plans of the rule file are removed once a new
+    one is written.
+    """
+
+    with open(path, 'rb') as fil:
+        content = fil.read()
+
+    prefix = os.path.basename(path) + '.'
+    digest = hashlib.sha1('{0}:'.format(PLAN_VERSION) + content).hexdigest()
+    cache_path = (os.path.join(cache_dir, prefix + digest + '.plan')
+                  if cache_dir else None)
+
+    if cache_path is not None and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'rb') as fil:
+                plan = marshal.load(fil)
+
+            if plan_valid(plan):
+                return plan
+        except (EOFError, ValueError, TypeError, KeyError):
+            pass
+
+    if yaml is None:
+        raise RuleSyntaxError("PyYAML is required to load {0}".format(path))
+
+    try:
+        plan = compile_rules(yaml.safe_load(content))
+    except yaml.YAMLError as exc:
+        raise RuleSyntaxError(str(exc))
+
+    if cache_path is not None:
+        if not os.path.exists(cache_dir):
+            os.mkdir(cache_dir)
+
+        # Write atomically, so that an interrupted write is never loaded
+        with open(cache_path + '.tmp', 'wb') as fil:
+            marshal.dump(plan, fil)
+        os.rename(cache_path + '.tmp', cache_path)
+
+        # Plans of the previous versions of the rule file
+        stale = re.compile(re.escape(prefix) + '[0-9a-f]{40}\\.plan$')
+        for name in os.listdir(cache_dir):
+            stale_path = os.path.join(cache_dir, name)
+            if stale.match(name) and stale_path != cache_path:
+                os.remove(stale_path)
+
+    return plan
+
+
+class PlanNode(object):
+    """
+    A reporter or checker invocation. The key identifies the invocation
+    across all the plans.
+    """
+
+    __slots__ = ('kind', 'identifier', 'arguments', 'key')
+
+    def __init__(self, kind, identifier, arguments, key):
+        self.kind = kind
+        self.identifier = identifier
+        self.arguments = arguments
+        self.key = key
+
+
+def build_nodes(plan, rule_name):
+    """
+    Returns the list of the PlanNodes of the plan, as seen by the given rule.
+    Nodes of the stateful plugins are keyed by the rule as well.
+    """
+
+    nodes = []
+
+    for kind, identifier, arguments, shared in plan['nodes']:
+        arguments = tuple((key, value,
+                           nodes[reference] if reference is not None else None)
+                          for key, value, reference in arguments)
+
+        key = (kind, identifier,
+               tuple((key, value, node.key if node is not None else None)
+                     for key, value, node in arguments))
+
+        if not shared:
+            key += (rule_name,)
+
+        nodes.append(PlanNode(kind, identifier, arguments, key))
+
+    return nodes
+
+
+class PlanBackend(Backend):
+    """
+    Keeps the results of the plan nodes evaluated in the current round.
+    """
+
+    def __init__(self, context):
+        super(PlanBackend, self).__init__(context)
+
+        self.results = {}
+        self.tick = None
+
+        self.evaluations = 0
+        self.hits = 0
+
+    def arguments(self, arguments, rule_name):
+        return dict((key, self.evaluate(node, rule_name)
+                     if node is not None else value)
+                    for key, value, node in arguments)
+
+    def evaluate(self, node, rule_name):
+        if self.tick != self.context.tick:
+            self.results.clear()
+            self.tick = self.context.tick
+
+        try:
+            result = self.results[node.key]
+            self.hits += 1
+        except KeyError:
+            self.evaluations += 1
+            cache = getattr(self.context, node.kind)
+            result = cache.get(node.identifier, (),
+                               self.arguments(node.arguments, rule_name),
+                               rule_name=rule_name)
+            self.results[node.key] = result
+
+        return result
+
+    def counters(self):
+        return {
+            'plan_node_evaluations': self.evaluations,
+            'plan_node_hits': self.hits,
+        }
+
+
+class YamlRule(Rule):
+    """
+    Rule defined in a YAML rule file. Runs the fixers if all the checkers
+    evaluate to True.
+    """
+
+    noplugin = True
+
+    name = None
+    checks = ()
+    fixes = ()
+
+    @property
+    def identifier(self):
+        return self.name
+
+    def run(self):
+        plan = self.context.backend(PlanBackend)
+        costs = self.context.backend(CostBackend)
+
+        # Checkers form a conjunction, cheap and likely False ones go first
+        checks = costs.order(self.checks, key=lambda node: node.key)
+
+        for position, node in enumerate(checks):
+            if not costs.evaluate(node.key, plan.evaluate, node, self.name):
+                costs.skip(len(checks) - position - 1)
+                return
+
+        for identifier, arguments in self.fixes:
+            self.context.fixers.get(identifier, (),
+                                    plan.arguments(arguments, self.name),
+                                    rule_name=self.name)
+
+
+def load_rules(path, module_name, cache_dir=None):
+    """
+    Creates the YamlRule classes for the rules in the given file. The
+    classes are registered in the Rule plugin mount.
+    """
+
+    plan = load_plan(path, cache_dir)
+    rule_classes = []
+
+    for name, checks, fixes, guards in plan['rules']:
+        nodes = build_nodes(plan, name)
+        class_name = re.sub('[^0-9A-Za-z]', '', name.title())
+
+        attributes = dict(guards)
+        attributes.update({
+            '__module__': module_name,
+            'name': name,
+            'checks': tuple(nodes[index] for index in checks),
+            'fixes': tuple(
+                (identifier, tuple((key, value,
+                                    nodes[reference]
+                                    if reference is not None else None)
+                                   for key, value, reference in arguments))
+                for identifier, arguments in fixes),
+        })
+
+        rule_classes.append(type(str(class_name or 'YamlRule'), (YamlRule,),
+                                 attributes))
+
+    return rule_classes